@@ -0,0 +1,179 @@
+# benchmarks/callback_builds.py
+#
+# Replays interaction sequences on the temperature page through the Dash
+# callback endpoint, the way the browser sends them, and checks how many
+# figures update_graph builds, patches and skips for each. Exits with
+# status 1 when a count differs from the expected one:
+#
+#     python benchmarks/callback_builds.py
+
+import os
+import sys
+import uuid
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRAPH_OUTPUTS = [
+    ("temperature-graph", "figure"),
+    ("temperature-graph", "style"),
+    ("temperature-insights", "children"),
+    ("temperature-insights", "is_open"),
+    ("temperature-figure-key", "data"),
+    ("temperature-job", "data"),
+    ("temperature-job-poll", "disabled"),
+]
+GRAPH_INPUTS = [
+    ("year-slider", "value"),
+    ("graph-tabs", "value"),
+    ("country-dropdown", "value"),
+    ("tab-clicked-store", "data"),
+    ("choropleth-mode", "value"),
+    ("period-range", "value"),
+    ("baseline-range", "value"),
+]
+GRAPH_STATE = [("temperature-figure-key", "data"), ("temperature-job", "data"), ("play-button", "disabled"),
+               ("page-instance", "data")]
+
+
+class TemperatureSession:
+    """Component values of one browser tab on the temperature page."""
+
+    def __init__(self, client, temperature):
+        self.client = client
+        self.values = {
+            "year-slider.value": temperature.max_year,
+            "graph-tabs.value": None,
+            "country-dropdown.value": None,
+            "tab-clicked-store.data": False,
+            "choropleth-mode.value": "year",
+            "period-range.value": [temperature.max_year - 29, temperature.max_year],
+            "baseline-range.value": temperature.default_baseline,
+            "temperature-figure-key.data": None,
+            "temperature-job.data": None,
+            "temperature-job-poll.disabled": True,
+            "play-button.disabled": None,
+            "page-instance.data": uuid.uuid4().hex,
+        }
+
+    def set(self, **changes):
+        """
+        Changes inputs (id_property=value, e.g. year_slider_value=2000) and
+        runs update_graph like the browser would, keeping its outputs.
+        """
+        changed = []
+        for name, value in changes.items():
+            component, prop = name.rsplit("_", 1)
+            prop_id = f"{component.replace('_', '-')}.{prop}"
+            self.values[prop_id] = value
+            changed.append(prop_id)
+
+        def spec(props):
+            return [{"id": i, "property": p, "value": self.values[f"{i}.{p}"]} for i, p in props]
+
+        body = {
+            "output": "..{}..".format("...".join(f"{i}.{p}" for i, p in GRAPH_OUTPUTS)),
+            "outputs": [{"id": i, "property": p} for i, p in GRAPH_OUTPUTS],
+            "inputs": spec(GRAPH_INPUTS),
+            "state": spec(GRAPH_STATE),
+            "changedPropIds": changed,
+        }
+        response = self.client.post("/_dash-update-component", json=body)
+        if response.status_code == 204:
+            return
+        if response.status_code != 200:
+            raise RuntimeError(f"update_graph failed ({response.status_code}): {response.get_data(as_text=True)[:500]}")
+        for component, props in response.get_json()["response"].items():
+            for prop, value in props.items():
+                if prop != "figure":
+                    self.values[f"{component}.{prop}"] = value
+
+    def click_tab(self, tab):
+        """Tab change, followed by the tab-clicked-store update it chains."""
+        self.set(graph_tabs_value=tab)
+        self.set(tab_clicked_store_data=True)
+
+
+def sequences(temperature):
+    """(name, steps(session), expected {builds, patches, skipped})"""
+    year = temperature.max_year
+    country = temperature.countries_with_geo[0] if temperature.countries_with_geo else None
+
+    def first_tab(s):
+        s.click_tab("choropleth")
+
+    def switch_tabs(s):
+        s.click_tab("choropleth")
+        s.click_tab("scatter")
+        s.click_tab("choropleth")
+
+    def global_country_change(s):
+        s.click_tab("choropleth")
+        s.set(country_dropdown_value=country)
+        s.set(country_dropdown_value=None)
+
+    def year_steps(s):
+        s.click_tab("choropleth")
+        for y in range(year - 5, year):
+            s.set(year_slider_value=y)
+
+    def ranking_year_steps(s):
+        s.click_tab("scatter")
+        for y in range(year - 3, year):
+            s.set(year_slider_value=y)
+
+    def period_year_steps(s):
+        s.click_tab("choropleth")
+        s.set(choropleth_mode_value="period")
+        s.set(year_slider_value=year - 1)
+        s.set(year_slider_value=year - 2)
+        s.set(period_range_value=[year - 9, year])
+
+    def regional(s):
+        s.click_tab("state-choropleth")
+        s.set(country_dropdown_value=country)
+        s.set(year_slider_value=year - 1)
+        s.set(year_slider_value=year - 2)
+
+    cases = [
+        ("first tab click", first_tab, {"builds": 1, "patches": 0, "skipped": 0}),
+        ("switch tabs", switch_tabs, {"builds": 3, "patches": 0, "skipped": 2}),
+        ("country on global view", global_country_change, {"builds": 1, "patches": 0, "skipped": 2}),
+        ("choropleth year steps", year_steps, {"builds": 1, "patches": 5, "skipped": 0}),
+        ("ranking year steps", ranking_year_steps, {"builds": 4, "patches": 0, "skipped": 0}),
+        ("period choropleth", period_year_steps, {"builds": 3, "patches": 0, "skipped": 2}),
+    ]
+    if country:
+        cases.append(("regional year steps", regional, {"builds": 1, "patches": 2, "skipped": 0}))
+    return cases
+
+
+def main():
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    # Cache hits would replace the builds being counted, and the
+    # regional map is built inline instead of in a polled background job
+    os.environ["CLIMATE_FIGURE_CACHE"] = "0"
+    os.environ["CLIMATE_BACKGROUND_WORKERS"] = "0"
+    import index
+    from pages import temperature
+    from utils import metrics
+
+    client = index.app.server.test_client()
+    failed = False
+    print(f"{'Sequence':<26} {'Builds':>7} {'Patches':>8} {'Skipped':>8}")
+    for name, steps, expected in sequences(temperature):
+        metrics.reset("callbacks.temperature")
+        steps(TemperatureSession(client, temperature))
+        counts = {k: metrics.counter(f"callbacks.temperature.{k}") for k in expected}
+        ok = counts == expected
+        failed |= not ok
+        print(f"{name:<26} {counts['builds']:>7} {counts['patches']:>8} {counts['skipped']:>8}"
+              + ("" if ok else f"   expected {expected}"))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/figure_builds.py
+#
+# Builds every figure of the temperature page's slider views (global
+# choropleth and ranking for each year, period and anomaly maps, regional
+# maps) with Plotly Express and from the compiled templates of
+# utils/figure_factory.py, checks that both serialize to the same JSON,
+# and prints the build and encode time of each. Exits with status 1 when
+# a figure differs:
+#
+#     python benchmarks/figure_builds.py
+#     python benchmarks/figure_builds.py --countries 10 --year-step 1
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def views(temperature, countries, year_step):
+    """(kind, render_view arguments) of the views to compare."""
+    years = range(temperature.min_year, temperature.max_year + 1, year_step)
+    for year in years:
+        yield "choropleth", ("choropleth", year, None, "year", None, None)
+        yield "ranking", ("scatter", year, None, "year", None, None)
+    baseline = temperature.default_baseline
+    for start in range(temperature.min_year, temperature.max_year, 25 * year_step):
+        period = [start, min(start + 30, temperature.max_year)]
+        yield "period", ("choropleth", None, None, "period", period, baseline)
+        yield "anomaly", ("choropleth", None, None, "anomaly", period, baseline)
+    for country in temperature.countries_with_geo[:countries]:
+        for year in range(temperature.max_year - 100, temperature.max_year + 1, 5 * year_step):
+            yield "regional", ("state-choropleth", year, country, "year", None, None)
+
+
+def build(temperature, args, fast):
+    """(figure JSON, build ms, encode ms) of a view, built the way update_graph does."""
+    from plotly.io.json import to_json_plotly
+    from utils.figure_factory import FAST_FIGURES_ENV_VAR
+    from utils.typed_arrays import compact_figure, typed_arrays_enabled
+
+    os.environ[FAST_FIGURES_ENV_VAR] = "1" if fast else "0"
+    start = time.perf_counter()
+    fig = temperature.render_view(*args)[0]
+    if typed_arrays_enabled() and not isinstance(fig, dict):
+        compact_figure(fig)
+    built = time.perf_counter()
+    encoded = to_json_plotly(fig)
+    end = time.perf_counter()
+    return encoded, (built - start) * 1000, (end - built) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare figures built with Plotly Express and from templates.")
+    parser.add_argument("--countries", type=int, default=5, help="Countries with regional maps to compare")
+    parser.add_argument("--year-step", type=int, default=1, help="Compare every n-th year")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    # Build in this process, without the cache or the pool
+    os.environ["CLIMATE_FIGURE_CACHE"] = "0"
+    os.environ["CLIMATE_PROCESS_POOL"] = "0"
+    from pages import temperature
+
+    templates = [temperature.choropleth_template, temperature.ranking_template,
+                 temperature.regional_template, *temperature.period_templates.values()]
+    start = time.perf_counter()
+    compiled = [json.dumps(t.figure, default=str, sort_keys=True) for t in templates]
+    print(f"Templates compiled in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    timings = {}
+    mismatches = 0
+    for kind, view in views(temperature, args.countries, args.year_step):
+        express, express_build, express_encode = build(temperature, view, fast=False)
+        fast, fast_build, fast_encode = build(temperature, view, fast=True)
+        if json.loads(express) != json.loads(fast):
+            mismatches += 1
+            print(f"Differs: {view}")
+        timings.setdefault(kind, []).append((express_build, express_encode, fast_build, fast_encode))
+
+    # Rendered figures share the template's values, which must stay untouched
+    if compiled != [json.dumps(t.figure, default=str, sort_keys=True) for t in templates]:
+        mismatches += 1
+        print("A template was modified by a render")
+
+    print(f"{'View':<12} {'Figures':>8} {'Express build':>14} {'encode':>8} {'Template build':>15} {'encode':>8}  (median ms)")
+    for kind, rows in timings.items():
+        medians = [statistics.median(column) for column in zip(*rows)]
+        print(f"{kind:<12} {len(rows):>8} {medians[0]:>14.2f} {medians[1]:>8.2f} {medians[2]:>15.2f} {medians[3]:>8.2f}")
+    print(f"{sum(map(len, timings.values()))} figures compared, {mismatches} differ")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# benchmarks/figure_encoding.py
+#
+# Measures how long each page's figures take to encode for a Dash response
+# and how large the payload is, before (JSON number lists, json module)
+# and after (typed arrays, orjson):
+#
+#     python benchmarks/figure_encoding.py
+#     python benchmarks/figure_encoding.py --repeat 50
+
+import argparse
+import gzip
+import inspect
+import os
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def page_figures():
+    """
+    (page, view, build) for representative outputs of every page's figure
+    callback; build() returns a fresh, unconverted figure.
+    """
+    from pages import correlation, emissions, sea_level, temperature
+
+    def figure(callback, *args):
+        # Undecorated callback, first output is the figure
+        return lambda: inspect.unwrap(callback)(*args)[0]
+
+    t = temperature
+    cases = [
+        ("temperature", "choropleth", figure(t.update_graph, 2000, "choropleth", None, True)),
+        ("temperature", "scatter", figure(t.update_graph, 2000, "scatter", None, True)),
+        ("temperature", "anomaly", figure(
+            t.update_graph, 2000, "choropleth", None, True, "anomaly", [1991, 2010], t.default_baseline)),
+    ]
+    if t.countries_with_geo:
+        country = t.countries_with_geo[0]
+        cases.append(("temperature", f"regional ({country})",
+                      figure(t.update_graph, 2000, "state-choropleth", country, True)))
+    for view in ["country", "trend", "region"]:
+        cases.append(("emissions", view, figure(
+            emissions.update_emissions_chart, 1, view, emissions.top_emitters[:5], [1990, 2018])))
+    for view in ["time", "matrix", "scatter", "dashboard"]:
+        cases.append(("correlation", view, figure(correlation.update_correlation_viz, 1, view, [1990, 2018])))
+    years = [int(sea_level.df["year"].min()), int(sea_level.df["year"].max())]
+    cases.append(("sea_level", "time series", figure(sea_level.update_time_series, years)))
+    return cases
+
+
+def measure(fig, engine, repeat):
+    """Mean encode seconds and the encoded payload of one figure."""
+    from plotly.io.json import to_json_plotly
+
+    payload = to_json_plotly(fig, engine=engine)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        to_json_plotly(fig, engine=engine)
+    return (time.perf_counter() - start) / repeat, payload.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark figure encoding per page.")
+    parser.add_argument("--repeat", type=int, default=20, help="Encodes per measurement")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    from utils.typed_arrays import compact_figure
+    from _plotly_utils.optional_imports import get_module
+    after_engine = "orjson" if get_module("orjson") else "json"
+
+    header = (f"{'Page':<12} {'View':<22} {'Before KB':>10} {'After KB':>9} {'gzip before':>12} "
+              f"{'gzip after':>11} {'Before ms':>10} {'After ms':>9}")
+    print(header)
+    print("-" * len(header))
+    totals = [0, 0, 0, 0, 0.0, 0.0]
+    for page, view, build in page_figures():
+        before_s, before = measure(build(), "json", args.repeat)
+        after_s, after = measure(compact_figure(build()), after_engine, args.repeat)
+        row = [len(before), len(after), len(gzip.compress(before)), len(gzip.compress(after)), before_s, after_s]
+        totals = [a + b for a, b in zip(totals, row)]
+        print(f"{page:<12} {view[:22]:<22} {row[0] / 1024:>10.1f} {row[1] / 1024:>9.1f} {row[2] / 1024:>12.1f} "
+              f"{row[3] / 1024:>11.1f} {row[4] * 1000:>10.2f} {row[5] * 1000:>9.2f}")
+    print("-" * len(header))
+    print(f"{'Total':<35} {totals[0] / 1024:>10.1f} {totals[1] / 1024:>9.1f} {totals[2] / 1024:>12.1f} "
+          f"{totals[3] / 1024:>11.1f} {totals[4] * 1000:>10.2f} {totals[5] * 1000:>9.2f}")
+    print(f"\nBefore: JSON number lists, json engine. After: typed arrays, {after_engine} engine.")
+
+
+if __name__ == "__main__":
+    main()
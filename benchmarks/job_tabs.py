@@ -0,0 +1,136 @@
+# benchmarks/job_tabs.py
+#
+# Opens the same regional map in two browser tabs at once through the Dash
+# callback endpoint, with the map rendered in background jobs, polls both
+# tabs like the page does and checks that each of them draws the map.
+# Then checks that one tab leaving the page cancels only its own job.
+# Exits with status 1 when a check fails:
+#
+#     python benchmarks/job_tabs.py
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds added to every figure cache read and regional render, so the two
+# tabs' requests overlap and the jobs are still running when polled
+DELAY = 0.5
+
+
+def poll_until_done(session, app, timeout=60):
+    """Polls the tab's job like the page's interval does; True when its figure arrived."""
+    name = next(k for k in app.callback_map if "temperature-job-progress.value" in k)
+    outputs = [dict(zip(("id", "property"), o.split(".", 1))) for o in name.strip(".").split("...")]
+    drawn = False
+    deadline = time.monotonic() + timeout
+    while session.values["temperature-job.data"] and time.monotonic() < deadline:
+        time.sleep(0.1)
+        response = session.client.post("/_dash-update-component", json={
+            "output": name,
+            "outputs": outputs,
+            "inputs": [{"id": "temperature-job-poll", "property": "n_intervals", "value": 1}],
+            "state": [{"id": "temperature-job", "property": "data", "value": session.values["temperature-job.data"]}],
+            "changedPropIds": ["temperature-job-poll.n_intervals"],
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"poll_job failed ({response.status_code})")
+        for component, props in response.get_json()["response"].items():
+            for prop, value in props.items():
+                drawn = drawn or prop == "figure"
+                session.values[f"{component.split('@')[0]}.{prop}"] = value
+    return drawn
+
+
+def open_regional(session, country, year):
+    """Shows the regional map of `country` in `year` with the tab's first click."""
+    session.values.update({"graph-tabs.value": "state-choropleth", "country-dropdown.value": country,
+                           "year-slider.value": year})
+    session.set(tab_clicked_store_data=True)
+    return session.values["temperature-job.data"]
+
+
+def leave_page(session, app):
+    """Navigates the tab to the homepage, which cancels its job."""
+    name = next(k for k in app.callback_map if k.startswith("page-content."))
+    response = session.client.post("/_dash-update-component", json={
+        "output": name,
+        "outputs": {"id": "page-content", "property": "children"},
+        "inputs": [{"id": "url", "property": "pathname", "value": "/"}],
+        "state": [{"id": "page-instance", "property": "data", "value": session.values["page-instance.data"]}],
+        "changedPropIds": ["url.pathname"],
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f"display_page failed ({response.status_code})")
+
+
+def main():
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    warnings.filterwarnings("ignore")
+    os.environ["CLIMATE_BACKGROUND_WORKERS"] = "2"
+    os.environ["CLIMATE_PROCESS_POOL"] = "0"
+    import index
+    from callback_builds import TemperatureSession
+    from pages import temperature
+    from utils import metrics
+
+    if not temperature.countries_with_geo:
+        print("No country with regional data")
+        return 1
+    country = temperature.countries_with_geo[0]
+    # Poll every job instead of waiting for it in the request
+    temperature.JOB_INLINE_WAIT = 0
+    read, render = temperature.figure_cache.get, temperature.render_view
+    temperature.figure_cache.get = lambda view: (time.sleep(DELAY), read(view))[1]
+    temperature.render_view = lambda *args: (time.sleep(DELAY), render(*args))[1]
+
+    app = index.app
+    client = app.server.test_client()
+    client.get("/")
+    client.get("/_dash-dependencies")
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok' if ok else 'FAILED':<7} {label}")
+
+    default_cache_dir = temperature.figure_cache.cache_dir
+    with tempfile.TemporaryDirectory() as cache_dir:
+        temperature.figure_cache.cache_dir = cache_dir
+        tabs = [TemperatureSession(app.server.test_client(), temperature) for _ in range(2)]
+
+        # Both tabs ask for the same view at the same time
+        metrics.reset("single_flight")
+        with ThreadPoolExecutor(2) as pool:
+            jobs = list(pool.map(lambda tab: open_regional(tab, country, temperature.max_year), tabs))
+        check("the two requests were coalesced", metrics.counter("single_flight.coalesced") == 1)
+        check("each tab has its own job", all(jobs) and jobs[0]["id"] != jobs[1]["id"])
+        with ThreadPoolExecutor(2) as pool:
+            drawn = list(pool.map(poll_until_done, tabs, [app] * 2))
+        check("both tabs drew the map", all(drawn))
+
+        # The second tab leaves the page while both jobs run (another year,
+        # rendered in full as on a fresh page rather than patched)
+        for tab in tabs:
+            tab.values["temperature-figure-key.data"] = None
+            open_regional(tab, country, temperature.max_year - 1)
+        second = tabs[1].values["temperature-job.data"]
+        leave_page(tabs[1], app)
+        time.sleep(DELAY)
+        check("leaving cancels the tab's own job",
+              temperature.regional_jobs.status(second["id"])["state"] == "cancelled")
+        check("the other tab's job still draws its map", poll_until_done(tabs[0], app))
+        temperature.figure_cache.cache_dir = default_cache_dir
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# benchmarks/offload_throughput.py
+#
+# Sends the callbacks whose heavy views are offloaded (regional map,
+# correlation scatter matrix, emissions regional analysis) through the
+# Dash callback endpoint from a growing number of threads, with the
+# figures built in the request threads and in the process pool, and
+# prints the requests per second of each:
+#
+#     python benchmarks/offload_throughput.py
+#     python benchmarks/offload_throughput.py --threads 1 2 4 8 --processes 4 --requests 48
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def callback_request(app, output, values):
+    """
+    Body of a callback request.
+
+    :param output: A component.property among the callback's outputs
+    :param values: Input and state values by "component.property"
+    """
+    name = next(k for k in app.callback_map if f"{output}." in k or k.endswith(output))
+    spec = app.callback_map[name]
+
+    def props(items):
+        return [{**item, "value": values[f"{item['id']}.{item['property']}"]} for item in items]
+
+    outputs = name.strip(".").split("...")
+    return {
+        "output": name,
+        "outputs": [dict(zip(("id", "property"), o.split(".", 1))) for o in outputs],
+        "inputs": props(spec["inputs"]),
+        "state": props(spec["state"]),
+        "changedPropIds": [f"{i['id']}.{i['property']}" for i in spec["inputs"]],
+    }
+
+
+def workloads(app, temperature):
+    """
+    (name, function(i) -> request body); i varies the inputs so calls
+    aren't coalesced, and the page instance so they aren't sequenced as
+    requests of one browser tab.
+    """
+    countries = temperature.countries_with_geo
+    years = range(temperature.max_year - 40, temperature.max_year + 1)
+
+    def regional(i):
+        return callback_request(app, "temperature-graph.figure", {
+            "year-slider.value": years[i % len(years)],
+            "graph-tabs.value": "state-choropleth",
+            "country-dropdown.value": countries[i % len(countries)],
+            "tab-clicked-store.data": True,
+            "choropleth-mode.value": "year",
+            "period-range.value": None,
+            "baseline-range.value": None,
+            "temperature-figure-key.data": None,
+            "temperature-job.data": None,
+            "play-button.disabled": None,
+            "page-instance.data": f"bench-{i}",
+        })
+
+    def correlation_scatter(i):
+        return callback_request(app, "correlation-visualization.figure", {
+            "update-correlation-btn.n_clicks": i,
+            "correlation-viz-type.value": "scatter",
+            "correlation-year-range.value": [1900 + i % 40, 2013],
+            "page-instance.data": f"bench-{i}",
+        })
+
+    def emissions_region(i):
+        return callback_request(app, "emissions-chart.figure", {
+            "update-emissions-btn.n_clicks": i,
+            "emissions-viz-type.value": "region",
+            "emissions-country-selector.value": [],
+            "emissions-year-range.value": [1990 + i % 10, 2018],
+            "page-instance.data": f"bench-{i}",
+        })
+
+    return [("regional map", regional), ("correlation scatter", correlation_scatter),
+            ("emissions region", emissions_region)]
+
+
+def throughput(server, body, threads, requests):
+    """Requests per second of `requests` calls sent from `threads` threads."""
+    def send(i):
+        response = server.test_client().post("/_dash-update-component", json=body(i))
+        if response.status_code != 200:
+            raise RuntimeError(f"Callback failed ({response.status_code})")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(send, range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Callback throughput with and without the process pool.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--requests", type=int, default=32, help="Requests per measurement")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    # Measure the builds themselves, inside the requests
+    os.environ["CLIMATE_FIGURE_CACHE"] = "0"
+    os.environ["CLIMATE_BACKGROUND_WORKERS"] = "0"
+    import index
+    from pages import temperature
+    from utils import offload
+
+    server = index.app.server
+    client = server.test_client()
+    client.get("/")
+    client.get("/_dash-dependencies")
+
+    print(f"{os.cpu_count()} CPUs, {args.requests} requests per cell, requests/s")
+    print(f"{'Workload':<22} {'Mode':<14}" + "".join(f"{f'{t} threads':>12}" for t in args.threads))
+    for name, body in workloads(index.app, temperature):
+        for mode, processes in [("threads", 0), (f"{args.processes} processes", args.processes)]:
+            os.environ[offload.PROCESS_POOL_ENV_VAR] = str(processes)
+            if processes:
+                # Start the pool outside the measurement
+                throughput(server, body, processes, processes)
+            rates = [throughput(server, body, t, args.requests) for t in args.threads]
+            print(f"{name:<22} {mode:<14}" + "".join(f"{r:>12.1f}" for r in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/prefetch_hits.py
+#
+# Scrubs the year slider of the temperature ranking tab step by step, with
+# a pause between steps like a user (or the animation), against an empty
+# figure cache, once without and once with neighbor prefetch. Prints the
+# step latency, cache hit rate and how many prefetched views were used:
+#
+#     python benchmarks/prefetch_hits.py
+#     python benchmarks/prefetch_hits.py --steps 40 --pause 0.3
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scrub(client, temperature, steps, pause, direction):
+    """Latencies (ms) of `steps` one-year slider moves on the ranking tab."""
+    from callback_builds import TemperatureSession
+
+    session = TemperatureSession(client, temperature)
+    start_year = temperature.max_year - steps if direction > 0 else temperature.max_year
+    session.values["year-slider.value"] = start_year
+    session.click_tab("scatter")
+    latencies = []
+    for i in range(1, steps + 1):
+        time.sleep(pause)
+        start = time.perf_counter()
+        session.set(year_slider_value=start_year + direction * i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the hit rate of neighbor prefetch.")
+    parser.add_argument("--steps", type=int, default=30, help="Year steps per run")
+    parser.add_argument("--pause", type=float, default=0.25, help="Seconds between steps")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    warnings.filterwarnings("ignore")
+    import index
+    from pages import temperature
+    from utils import metrics
+
+    client = index.app.server.test_client()
+    years = temperature.prefetcher.years or 3
+    print(f"{'Run':<22} {'Median ms':>10} {'Mean ms':>9} {'Cache hits':>11} {'Prefetched':>11} {'Used':>6}")
+    for label, prefetch_years, direction in [("no prefetch", 0, 1), ("prefetch forward", years, 1),
+                                             ("prefetch backward", years, -1)]:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            temperature.figure_cache.cache_dir = cache_dir
+            temperature.prefetcher.years = prefetch_years
+            metrics.reset("figure_cache")
+            metrics.reset("prefetch")
+            latencies = scrub(client, temperature, args.steps, args.pause, direction)
+            hits = metrics.counter("figure_cache.temperature.hits")
+            built = metrics.counter("prefetch.built")
+            used = metrics.counter("prefetch.hits") + metrics.counter("prefetch.joined")
+            print(f"{label:<22} {statistics.median(latencies):>10.1f} {statistics.mean(latencies):>9.1f} "
+                  f"{hits:>5}/{args.steps:<5} {built:>11} {used:>6}")
+            # Let queued prefetches finish before their cache directory goes away
+            temperature.prefetcher.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/startup_profile.py
+#
+# Boots the dashboard the same way a gunicorn worker does (importing every
+# page module and then index.py) and prints where the time and memory go.
+# Exits with status 1 when the boot exceeds the budget in
+# startup_budget.json, so it can gate deployments:
+#
+#     python benchmarks/startup_profile.py
+#     python benchmarks/startup_profile.py --no-memory --budget my_budget.json
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(ROOT, "benchmarks", "startup_budget.json")
+
+# Imported up front so their cost isn't charged to whichever page happens
+# to import them first
+DEPENDENCIES = [
+    "pandas",
+    "numpy",
+    "scipy.stats",
+    "plotly.express",
+    "plotly.graph_objects",
+    "dash",
+    "dash_bootstrap_components",
+]
+
+# Same order index.py imports them in
+PAGE_MODULES = [
+    "pages.temperature",
+    "pages.emissions",
+    "pages.sea_level",
+    "pages.homepage",
+    "pages.correlation",
+]
+
+
+def profile_boot(trace_memory=True):
+    """
+    Imports every page module and index.py, recording one step per module.
+
+    :param trace_memory: Whether to trace allocations (slower, more detail)
+    :return: Dict with the recorded steps and boot totals
+    """
+    # Data paths in the pages are relative to the repository root
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    from utils import compaction, profiling
+    if trace_memory:
+        profiling.enable_memory_tracing()
+
+    module_seconds = {}
+    start = time.perf_counter()
+    with profiling.startup_step("import dependencies") as step:
+        for name in DEPENDENCIES:
+            importlib.import_module(name)
+    module_seconds["dependencies"] = step["seconds"]
+    for name in PAGE_MODULES + ["index"]:
+        with profiling.startup_step(f"import {name}") as step:
+            importlib.import_module(name)
+        module_seconds[name] = step["seconds"]
+    boot_seconds = time.perf_counter() - start
+
+    return {
+        "boot_seconds": boot_seconds,
+        "peak_rss_mb": profiling.peak_rss_mb(),
+        "module_seconds": module_seconds,
+        "steps": profiling.startup_records(),
+        "report": profiling.format_startup_report(),
+        "memory_report": compaction.format_memory_report(),
+    }
+
+
+def check_budget(result, budget):
+    """
+    Compares a boot profile against a budget.
+
+    :param result: Output of profile_boot()
+    :param budget: Parsed startup_budget.json
+    :return: List of human readable violations (empty when within budget)
+    """
+    violations = []
+    if result["boot_seconds"] > budget.get("boot_seconds", float("inf")):
+        violations.append(
+            f"boot took {result['boot_seconds']:.2f}s, budget is {budget['boot_seconds']:.2f}s"
+        )
+    # NaN (no RSS available) never exceeds the budget
+    if result["peak_rss_mb"] > budget.get("peak_memory_mb", float("inf")):
+        violations.append(
+            f"peak RSS was {result['peak_rss_mb']:.0f} MB, budget is {budget['peak_memory_mb']:.0f} MB"
+        )
+    for module, limit in budget.get("module_seconds", {}).items():
+        seconds = result["module_seconds"].get(module)
+        if seconds is not None and seconds > limit:
+            violations.append(f"import {module} took {seconds:.2f}s, budget is {limit:.2f}s")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile dashboard startup against a budget.")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET, help="Budget JSON file")
+    parser.add_argument("--no-memory", action="store_true", help="Skip allocation tracing")
+    parser.add_argument("--json", dest="json_out", help="Also write the raw profile to this file")
+    args = parser.parse_args()
+
+    with open(args.budget, encoding="utf-8") as f:
+        budget = json.load(f)
+
+    result = profile_boot(trace_memory=not args.no_memory)
+    print(result["report"])
+    print()
+    print(result["memory_report"])
+    print(f"\nBoot: {result['boot_seconds']:.2f}s, peak RSS: {result['peak_rss_mb']:.0f} MB")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in result.items() if not k.endswith("report")}, f, indent=2)
+
+    violations = check_budget(result, budget)
+    if violations:
+        print("\nStartup budget exceeded:")
+        for v in violations:
+            print(f" - {v}")
+        sys.exit(1)
+    print("Startup within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@
 
 from dash import Dash, dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from utils import artifacts, compaction, compression, figure_cache, geojson_assets, jobs, metrics, offload, profiling, readonly, request_sequencing
+
+# Refuse to serve preprocessed data that no longer matches its inputs
+artifacts.check_artifacts()
+
 from pages import temperature, emissions, sea_level, homepage, correlation
 
 
@@ -15,18 +20,48 @@ external_stylesheets = [
 
 
 # Initialize app
-app = Dash(__name__, external_stylesheets=external_stylesheets, suppress_callback_exceptions=True)
-server = app.server
+with profiling.startup_step("index: create Dash app"):
+    app = Dash(__name__, external_stylesheets=external_stylesheets, suppress_callback_exceptions=True)
+    server = app.server
+    # Regional figures reference their geometry by URL (see utils/geojson_assets.py)
+    geojson_assets.register_geojson_route(server)
+    # gzip/brotli for callback payloads, layout and bundles (CLIMATE_COMPRESSION*)
+    compression.register_compression(server)
+    metrics.register_metrics_route(server)
+    # Session id for dropping superseded slider requests (CLIMATE_DROP_SUPERSEDED),
+    # the fallback of callbacks that don't pass the page instance
+    request_sequencing.register_session_cookie(server)
+    # CLIMATE_AUDIT_MUTATIONS=1: fail requests that modified a shared dataset
+    readonly.register_mutation_audit(server)
+    # Render every temperature view to disk in the background (CLIMATE_WARM_FIGURE_CACHE)
+    figure_cache.start_background_warm(temperature.figure_cache, temperature.cacheable_views(),
+                                       temperature.warm_view)
+
+# Print the per-step startup breakdown when CLIMATE_PROFILE_STARTUP=1
+# (once: the process pool's workers import this script again)
+if profiling.startup_report_requested() and not offload.in_pool_worker():
+    print(profiling.format_startup_report())
+    print(compaction.format_memory_report())
+
+# Define layout; a function, so every page load (browser tab) gets its
+# own page-instance id for request sequencing and background jobs
+def serve_layout():
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        request_sequencing.page_instance_store(),
+        dbc.Container(id='page-content', fluid=True, className="mt-0 p-0"),
+    ])
+
 
-# Define layout
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    dbc.Container(id='page-content', fluid=True, className="mt-0 p-0"),
-])
+app.layout = serve_layout
 
 # Callback to update pages
-@app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
-def display_page(pathname):
+@app.callback(Output('page-content', 'children'), Input('url', 'pathname'),
+              State(request_sequencing.PAGE_INSTANCE_STORE, 'data'))
+def display_page(pathname, page_instance):
+    # Background renders of the page this tab is leaving won't be shown;
+    # jobs are per page instance, so other tabs keep theirs
+    jobs.cancel_session(page_instance or request_sequencing.session_id())
     if pathname == '/temperature':
         return temperature.layout
     elif pathname == '/emissions':
@@ -37,5 +72,7 @@ def display_page(pathname):
         return correlation.layout
     return homepage.layout  # Default page
 
+# The guard is required: with CLIMATE_PROCESS_POOL set, every pool
+# process imports this script again (see utils/offload.py)
 if __name__ == '__main__':
     app.run(debug=True)
@@ -11,47 +11,61 @@ from dash.dependencies import ALL, MATCH
 import json
 from dash import callback_context
 
+from utils.offload import offloaded
+from utils.profiling import startup_step
+from utils.readonly import freeze
+from utils.request_sequencing import PAGE_INSTANCE_STORE, sequenced
+from utils.single_flight import single_flight
+from utils.temperature_matrix import load_country_matrix
+from utils.typed_arrays import typed_figures
+
 
 # Load datasets
-df_temp = pd.read_csv("data/GlobalLandTemperaturesByCountry.csv")
-df_sea = pd.read_csv("data/Global_Sea_Level_Rise.csv")
-df_emissions = pd.read_csv("data/Historical_Emissions.csv")
+# The country temperatures are shared with the temperature page
+country_matrix = load_country_matrix()
+with startup_step("correlation: read CSVs"):
+    df_sea = pd.read_csv("data/Global_Sea_Level_Rise.csv")
+    df_emissions = pd.read_csv("data/Historical_Emissions.csv")
 
 # Process temperature data
-df_temp["dt"] = pd.to_datetime(df_temp["dt"])
-df_temp["year"] = df_temp["dt"].dt.year
-# Calculate global average temperature by year
-global_temp = df_temp.groupby("year")["AverageTemperature"].mean().reset_index()
-# Filter for years that we'll have across all datasets
-global_temp = global_temp[global_temp["year"] >= 1990]
-global_temp = global_temp[global_temp["year"] <= 2018]
+with startup_step("correlation: global temperature by year"):
+    # Calculate global average temperature by year
+    global_temp = country_matrix.global_yearly_means()
+    # Filter for years that we'll have across all datasets
+    global_temp = global_temp[global_temp["year"] >= 1990]
+    global_temp = global_temp[global_temp["year"] <= 2018]
 
 # Process sea level data
-df_sea["date"] = pd.to_datetime(df_sea["date"], format="%m/%d/%Y")
-df_sea["year"] = df_sea["date"].dt.year
-# Rename for clarity and calculate yearly average
-df_sea.rename(columns={"mmfrom1993-2008average": "Sea Level (mm)"}, inplace=True)
-sea_level_yearly = df_sea.groupby("year")["Sea Level (mm)"].mean().reset_index()
-# Filter for common years
-sea_level_yearly = sea_level_yearly[sea_level_yearly["year"] >= 1990]
-sea_level_yearly = sea_level_yearly[sea_level_yearly["year"] <= 2018]
+with startup_step("correlation: sea level by year"):
+    df_sea["date"] = pd.to_datetime(df_sea["date"], format="%m/%d/%Y")
+    df_sea["year"] = df_sea["date"].dt.year
+    # Rename for clarity and calculate yearly average
+    df_sea.rename(columns={"mmfrom1993-2008average": "Sea Level (mm)"}, inplace=True)
+    sea_level_yearly = df_sea.groupby("year")["Sea Level (mm)"].mean().reset_index()
+    # Filter for common years
+    sea_level_yearly = sea_level_yearly[sea_level_yearly["year"] >= 1990]
+    sea_level_yearly = sea_level_yearly[sea_level_yearly["year"] <= 2018]
 
 # Process emissions data
-# Get yearly total global emissions
-year_columns = [str(year) for year in range(1990, 2019)]
-# Convert columns to numeric
-df_emissions_yearly = df_emissions.copy()
-df_emissions_yearly[year_columns] = df_emissions_yearly[year_columns].apply(pd.to_numeric, errors="coerce")
-# Calculate total global emissions per year
-global_emissions = pd.DataFrame({
-    "year": range(1990, 2019),
-    "Global Emissions": [df_emissions_yearly[str(year)].sum() for year in range(1990, 2019)]
-})
+with startup_step("correlation: global emissions by year"):
+    # Get yearly total global emissions
+    year_columns = [str(year) for year in range(1990, 2019)]
+    # Convert columns to numeric
+    df_emissions_yearly = df_emissions.copy()
+    df_emissions_yearly[year_columns] = df_emissions_yearly[year_columns].apply(pd.to_numeric, errors="coerce")
+    # Calculate total global emissions per year
+    global_emissions = pd.DataFrame({
+        "year": range(1990, 2019),
+        "Global Emissions": [df_emissions_yearly[str(year)].sum() for year in range(1990, 2019)]
+    })
 
 # Create combined dataset for correlation analysis
-# Merge on year
-corr_data = global_temp.merge(sea_level_yearly, on="year", how="inner")
-corr_data = corr_data.merge(global_emissions, on="year", how="inner")
+with startup_step("correlation: merge indicators"):
+    # Merge on year
+    corr_data = global_temp.merge(sea_level_yearly, on="year", how="inner")
+    corr_data = corr_data.merge(global_emissions, on="year", how="inner")
+    # Shared by every request thread from here on
+    freeze(corr_data, "correlation indicators")
 
 # Layout with modern UI
 layout = dbc.Container([
@@ -212,8 +226,13 @@ def update_selected_viz(n_clicks, ids):
     Input("update-correlation-btn", "n_clicks"),
     State("correlation-viz-type", "value"),
     State("correlation-year-range", "value"),
+    State(PAGE_INSTANCE_STORE, "data"),
     prevent_initial_call=False
 )
+@sequenced
+@single_flight
+@typed_figures
+@offloaded(when=lambda n_clicks, viz_type, year_range: viz_type == "scatter")
 def update_correlation_viz(n_clicks, viz_type, year_range):
     # Filter for selected years
     start_year, end_year = year_range
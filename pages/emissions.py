@@ -9,30 +9,49 @@ import numpy as np
 import dash
 from dash.exceptions import PreventUpdate
 
+from utils.offload import offloaded
+from utils.profiling import startup_step
+from utils.readonly import freeze
+from utils.request_sequencing import PAGE_INSTANCE_STORE, sequenced
+from utils.single_flight import single_flight
+from utils.typed_arrays import typed_figures
+
 
 # Load dataset
-df = pd.read_csv("data/Historical_Emissions.csv")
+with startup_step("emissions: read emissions CSV"):
+    df = pd.read_csv("data/Historical_Emissions.csv")
 
 # Keep only relevant columns: Country + yearly emissions (1990-2018)
 year_columns = [str(year) for year in range(1990, 2019)]
-df_filtered = df[["Country"] + year_columns]
 
-# Convert year columns to numeric
-df_filtered[year_columns] = df_filtered[year_columns].apply(pd.to_numeric, errors="coerce")
+with startup_step("emissions: totals and rankings"):
+    # A copy: the year columns are converted in place below
+    df_filtered = df[["Country"] + year_columns].copy()
+
+    # Convert year columns to numeric
+    df_filtered[year_columns] = df_filtered[year_columns].apply(pd.to_numeric, errors="coerce")
+
+    # Calculate total emissions and sort
+    df_filtered["Total Emissions"] = df_filtered[year_columns].sum(axis=1)
+    df_filtered = df_filtered.dropna(subset=["Total Emissions"])
+    df_filtered = df_filtered.sort_values(by="Total Emissions", ascending=False)
 
-# Calculate total emissions and sort
-df_filtered["Total Emissions"] = df_filtered[year_columns].sum(axis=1)
-df_filtered = df_filtered.dropna(subset=["Total Emissions"])
-df_filtered = df_filtered.sort_values(by="Total Emissions", ascending=False)
+    # Get top emitters for quick filter options
+    top_emitters = df_filtered.head(10)["Country"].tolist()
+
+    # Calculate global total emissions per year for trend analysis
+    yearly_totals = pd.DataFrame({
+        "Year": [int(year) for year in year_columns],
+        "Global Emissions": [df_filtered[year].sum() for year in year_columns]
+    })
 
-# Get top emitters for quick filter options
-top_emitters = df_filtered.head(10)["Country"].tolist()
+# Callbacks only read the aggregates, so the raw table isn't kept. The
+# aggregates stay float64 so range sums match the full-precision values.
+del df
 
-# Calculate global total emissions per year for trend analysis
-yearly_totals = pd.DataFrame({
-    "Year": [int(year) for year in year_columns],
-    "Global Emissions": [df_filtered[year].sum() for year in year_columns]
-})
+# Shared by every request thread from here on
+for name, frame in [("emissions by country", df_filtered), ("emissions yearly", yearly_totals)]:
+    freeze(frame, name)
 
 # Layout with modern UI
 layout = dbc.Container([
@@ -224,10 +243,15 @@ def update_country_selection(top10_clicks, g7_clicks, brics_clicks, clear_clicks
     [
         State("emissions-viz-type", "value"),
         State("emissions-country-selector", "value"),
-        State("emissions-year-range", "value")
+        State("emissions-year-range", "value"),
+        State(PAGE_INSTANCE_STORE, "data")
     ],
     prevent_initial_call=False
 )
+@sequenced
+@single_flight
+@typed_figures
+@offloaded(when=lambda n_clicks, viz_type, selected_countries, year_range: viz_type == "region")
 def update_emissions_chart(n_clicks, viz_type, selected_countries, year_range):
     # Filter for selected years
     start_year, end_year = year_range
@@ -1,6 +1,6 @@
 # pages/sea_level.py
 
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, callback, Input, Output, State
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
@@ -8,50 +8,59 @@ import plotly.graph_objects as go
 import numpy as np
 from scipy import stats
 
+from utils.profiling import startup_step
+from utils.readonly import freeze
+from utils.request_sequencing import PAGE_INSTANCE_STORE, checkpoint, sequenced
+from utils.single_flight import single_flight
+from utils.typed_arrays import typed_figures
+
 # Load dataset
-df = pd.read_csv("data/Global_Sea_Level_Rise.csv")
+with startup_step("sea level: read sea level CSV"):
+    df = pd.read_csv("data/Global_Sea_Level_Rise.csv")
 
-# Convert 'year' to integer
-df["year"] = df["year"].astype(int)
+with startup_step("sea level: parse dates and derive columns"):
+    # Convert 'year' to integer
+    df["year"] = df["year"].astype(int)
 
-# Convert 'date' to datetime format
-df["date"] = pd.to_datetime(df["date"], format="%m/%d/%Y")
+    # Convert 'date' to datetime format
+    df["date"] = pd.to_datetime(df["date"], format="%m/%d/%Y")
 
-# Rename the sea level column for clarity
-df.rename(columns={"mmfrom1993-2008average": "Sea Level (mm)"}, inplace=True)
+    # Rename the sea level column for clarity
+    df.rename(columns={"mmfrom1993-2008average": "Sea Level (mm)"}, inplace=True)
 
-# Calculate additional metrics
-df["year_decade"] = (df["year"] // 10) * 10  # Group by decade
-df["month"] = df["date"].dt.month
+    # Calculate additional metrics
+    df["year_decade"] = (df["year"] // 10) * 10  # Group by decade
+    df["month"] = df["date"].dt.month
 
-# Calculate yearly and decadal averages
-yearly_avg = df.groupby("year")["Sea Level (mm)"].mean().reset_index()
-decadal_avg = df.groupby("year_decade")["Sea Level (mm)"].mean().reset_index()
+with startup_step("sea level: averages, regression and projection"):
+    # Calculate yearly and decadal averages
+    yearly_avg = df.groupby("year")["Sea Level (mm)"].mean().reset_index()
+    decadal_avg = df.groupby("year_decade")["Sea Level (mm)"].mean().reset_index()
 
-# Calculate the rate of change (first derivative)
-yearly_avg["rate_of_change"] = yearly_avg["Sea Level (mm)"].diff()
+    # Calculate the rate of change (first derivative)
+    yearly_avg["rate_of_change"] = yearly_avg["Sea Level (mm)"].diff()
 
-# Fit linear regression to predict future trend
-x = yearly_avg["year"].values
-y = yearly_avg["Sea Level (mm)"].values
-slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+    # Fit linear regression to predict future trend
+    x = yearly_avg["year"].values
+    y = yearly_avg["Sea Level (mm)"].values
+    slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
 
-# Create projection dataframe
-projection_years = list(range(max(yearly_avg["year"]) + 1, max(yearly_avg["year"]) + 51))
-projection_df = pd.DataFrame({
-    "year": projection_years,
-    "Sea Level (mm)_predicted": [intercept + slope * year for year in projection_years],
-    "type": "Projection"
-})
+    # Create projection dataframe
+    projection_years = list(range(max(yearly_avg["year"]) + 1, max(yearly_avg["year"]) + 51))
+    projection_df = pd.DataFrame({
+        "year": projection_years,
+        "Sea Level (mm)_predicted": [intercept + slope * year for year in projection_years],
+        "type": "Projection"
+    })
 
-# Add type to original data for plotting
-yearly_avg["type"] = "Historical"
+    # Add type to original data for plotting
+    yearly_avg["type"] = "Historical"
 
-# Combine historical and projection data
-combined_df = pd.concat([
-    yearly_avg[["year", "Sea Level (mm)", "type"]].rename(columns={"Sea Level (mm)": "Sea Level (mm)_predicted"}),
-    projection_df
-])
+    # Combine historical and projection data
+    combined_df = pd.concat([
+        yearly_avg[["year", "Sea Level (mm)", "type"]].rename(columns={"Sea Level (mm)": "Sea Level (mm)_predicted"}),
+        projection_df
+    ])
 
 # Define seasonal pattern analysis function
 # Fix seasonal pattern analysis
@@ -81,7 +90,13 @@ def analyze_seasonal_patterns():
     
     return monthly_stats.sort_values("month")
 
-seasonal_df = analyze_seasonal_patterns()
+with startup_step("sea level: seasonal patterns"):
+    seasonal_df = analyze_seasonal_patterns()
+
+# Shared by every request thread from here on
+for name, frame in [("sea level", df), ("sea level yearly", yearly_avg), ("sea level decadal", decadal_avg),
+                    ("sea level projection", combined_df), ("sea level seasonal", seasonal_df)]:
+    freeze(frame, name)
 
 
 # Define layout
@@ -293,8 +308,12 @@ layout = dbc.Container([
 @callback(
     Output("sea-level-time-series", "figure"),
     Output("sea-level-insights", "children"),
-    Input("sea-level-year-range", "value")
+    Input("sea-level-year-range", "value"),
+    State(PAGE_INSTANCE_STORE, "data")
 )
+@sequenced
+@single_flight
+@typed_figures
 def update_time_series(year_range):
     # Filter data by selected year range
     filtered_df = df[(df["year"] >= year_range[0]) & (df["year"] <= year_range[1])]
@@ -319,16 +338,19 @@ def update_time_series(year_range):
     ))
     
     # Add rolling average for trend line
-    filtered_df["Rolling Avg"] = filtered_df["Sea Level (mm)"].rolling(window=12, min_periods=1).mean()
+    rolling_avg = filtered_df["Sea Level (mm)"].rolling(window=12, min_periods=1).mean()
     fig.add_trace(go.Scatter(
         x=filtered_df["date"],
-        y=filtered_df["Rolling Avg"],
+        y=rolling_avg,
         mode="lines",
         name="12-Month Moving Average",
         line=dict(width=3, color="rgba(220, 53, 69, 0.8)"),
         hovertemplate="Date: %{x|%b %Y}<br>12-Month Avg: %{y:.1f} mm<extra></extra>"
     ))
     
+    # A newer slider position may have arrived meanwhile
+    checkpoint()
+    
     # Add trend line (linear regression)
     x_numeric = np.array((filtered_df["date"] - filtered_df["date"].min()).dt.days)
     y = filtered_df["Sea Level (mm)"].values
@@ -1,25 +1,79 @@
 # pages/temperature.py
 
-from dash import html, dcc, callback, Output, Input, State, no_update
+from dash import html, dcc, callback, Output, Input, State, Patch, no_update
 import dash_bootstrap_components as dbc
+from flask import has_request_context
+import numpy as np
 import pandas as pd
 import plotly.express as px
-import json
 import os
 from datetime import datetime
 import time
 
+from utils import metrics
+from utils.animation import AnimationScheduler
+from utils.figure_cache import FigureCache, figure_cache_enabled
+from utils.figure_factory import FigureTemplate, fast_figures_enabled
+from utils.geojson_assets import geojson_url
+from utils.insight_tables import build_insight_table
+from utils.jobs import JobCancelled, JobManager, in_job, report_progress
+from utils.offload import offloaded, serialize_outputs
+from utils.prefetch import Prefetcher
+from utils.regional_aggregates import load_area_weighted_table
+from utils.request_sequencing import PAGE_INSTANCE_STORE, checkpoint, sequenced, session_id
+from utils.single_flight import single_flight
+from utils.spatial import load_spatial_index
+from utils.state_data import load_state_frame
+from utils.temperature_matrix import load_country_matrix
+from utils.typed_arrays import typed_array, typed_figures
+
 # — Load global data —
-df_countries = pd.read_csv("data/GlobalLandTemperaturesByCountry.csv")
-df_countries["dt"] = pd.to_datetime(df_countries["dt"])
-df_countries["year"] = df_countries["dt"].dt.year
+# Countries x months matrix shared with the correlation page; yearly
+# country means are slices of it instead of a groupby
+country_matrix = load_country_matrix()
 
-# Optimize data loading by pre-aggregating by year and country
-df_agg = df_countries.groupby(['Country', 'year'])['AverageTemperature'].mean().reset_index()
+# Global mean, coldest/hottest country and the temperature ranking of
+# every year, so the insights panel and comparison chart are lookups
+year_insights = build_insight_table(country_matrix)
 
-min_year = int(df_countries["year"].min())
-max_year = int(df_countries["year"].max())
+min_year = country_matrix.min_year
+max_year = country_matrix.max_year
 year_marks = {y: str(y) for y in range(min_year, max_year + 1, 10)}
+period_marks = {y: str(y) for y in range(1750, max_year + 1, 50)}
+
+# Default comparison period: the 1951-1980 climate normal
+default_baseline = [max(min_year, 1951), min(max_year, 1980)]
+
+# Graph tabs update_graph builds a figure for
+VIEW_TABS = ("choropleth", "mapbox", "scatter", "state-choropleth")
+
+# Paces the year animation by update_graph's latency, shared by all sessions
+animation_scheduler = AnimationScheduler()
+
+# Rendered single-year views on disk, keyed by the data and code they're built from
+figure_cache = FigureCache("temperature", [
+    "data/GlobalLandTemperaturesByCountry.csv",
+    "data/by_country_temp/*",
+    "data/geojson/*.geojson",
+    "data/geojson_simplified/*.geojson",
+    "data/spatial_index/*",
+    "pages/temperature.py",
+    "utils/*.py",
+])
+
+GRAPH_STYLE = {"height": "600px", "display": "block"}
+
+# Regional maps rendered in background jobs the page polls, so large
+# countries don't hold a worker; ones finishing within JOB_INLINE_WAIT
+# seconds are returned by the request that started them
+regional_jobs = JobManager("temperature")
+JOB_INLINE_WAIT = 0.3
+JOB_POLL_MS = 400
+
+# Views rebuilt on every year step (the choropleth tabs are patched), so
+# the next years are worth rendering ahead while the user scrubs or
+# animates. Only the ranking: the layout offers no scatter-geo tab.
+PREFETCH_TABS = ("scatter",)
 
 # Add more frequent marks for recent years
 # for y in range(1900, max_year + 1, 20):
@@ -157,6 +211,48 @@ layout = dbc.Container([
                             width=6, className="mx-auto mt-3"
                         )
                     ], id="dropdown-row", style={"display": "none"}),
+
+                    # Period controls for the global choropleth - hidden by default
+                    dbc.Row([
+                        dbc.Col([
+                            html.Label("Map Shows:", className="fw-bold mb-2"),
+                            dbc.RadioItems(
+                                id="choropleth-mode",
+                                options=[
+                                    {"label": "Selected Year", "value": "year"},
+                                    {"label": "Period Average", "value": "period"},
+                                    {"label": "Period vs Baseline", "value": "anomaly"}
+                                ],
+                                value="year",
+                                inline=True,
+                                className="mb-3"
+                            )
+                        ], width=12),
+                        dbc.Col([
+                            html.Label("Period:", className="fw-bold mb-2"),
+                            dcc.RangeSlider(
+                                id="period-range",
+                                min=min_year,
+                                max=max_year,
+                                step=1,
+                                marks=period_marks,
+                                value=[max_year - 29, max_year],
+                                tooltip={"placement": "bottom", "always_visible": False}
+                            )
+                        ], id="period-range-col", width=6),
+                        dbc.Col([
+                            html.Label("Baseline:", className="fw-bold mb-2"),
+                            dcc.RangeSlider(
+                                id="baseline-range",
+                                min=min_year,
+                                max=max_year,
+                                step=1,
+                                marks=period_marks,
+                                value=default_baseline,
+                                tooltip={"placement": "bottom", "always_visible": False}
+                            )
+                        ], id="baseline-range-col", width=6)
+                    ], id="period-row", className="mt-3", style={"display": "none"}),
                 ]),
                 className="mb-4 shadow border-0"
             ),
@@ -169,6 +265,16 @@ layout = dbc.Container([
         dbc.Col(
             dbc.Card(
                 dbc.CardBody([
+                    # Progress of a regional map rendered in the background
+                    dbc.Progress(
+                        id="temperature-job-progress",
+                        value=0,
+                        striped=True,
+                        animated=True,
+                        className="mb-2",
+                        style={"display": "none"}
+                    ),
+
                     # Loading indicator for graph
                     dbc.Spinner(
                         dcc.Graph(
@@ -204,20 +310,24 @@ layout = dbc.Container([
 
     # Store to detect first tab‐click
     dcc.Store(id='tab-clicked-store', data=False),
+
+    # Which view and year the graph holds, so a year change can patch it
+    dcc.Store(id='temperature-figure-key', data=None),
+
+    # Background job rendering the graph, polled until its figure is ready
+    dcc.Store(id='temperature-job', data=None),
+    dcc.Interval(id='temperature-job-poll', interval=JOB_POLL_MS, disabled=True),
     
     # Animation interval
     dcc.Interval(
         id='animation-interval',
-        interval=1000,  # milliseconds between frame updates
-        max_intervals=0,  # stop at max_year
+        interval=1000,  # milliseconds between frame updates, adapted while playing
+        max_intervals=-1,  # control_animation stops it at max_year
         disabled=True
     ),
     
     # Current animation state
-    dcc.Store(id='animation-state', data={"is_playing": False, "current_year": max_year}),
-    
-    # Store for animation speed
-    dcc.Store(id='animation-speed', data=1000)  # milliseconds per frame
+    dcc.Store(id='animation-state', data={"is_playing": False, "current_year": max_year})
 
 ], fluid=True, className="p-4 bg-light")
 
@@ -243,6 +353,23 @@ def toggle_dropdown(selected_tab):
     return {"display": "none"}
 
 
+@callback(
+    Output("period-row", "style"),
+    Output("period-range-col", "style"),
+    Output("baseline-range-col", "style"),
+    Input("graph-tabs", "value"),
+    Input("choropleth-mode", "value")
+)
+def toggle_period_controls(selected_tab, choropleth_mode):
+    # The sliders only show for the modes that read them
+    shown, hidden = {"display": "block"}, {"display": "none"}
+    return (
+        {"display": "flex"} if selected_tab == "choropleth" else hidden,
+        shown if choropleth_mode in ("period", "anomaly") else hidden,
+        shown if choropleth_mode == "anomaly" else hidden,
+    )
+
+
 @callback(
     Output("year-display", "children"),
     Input("year-slider", "value")
@@ -254,6 +381,7 @@ def update_year_display(year):
 # Animation control callbacks
 @callback(
     Output("animation-interval", "disabled"),
+    Output("animation-interval", "interval"),
     Output("animation-state", "data"),
     Output("play-button", "disabled"),
     Output("stop-button", "disabled"),
@@ -269,34 +397,44 @@ def control_animation(play_clicks, stop_clicks, intervals, animation_state, curr
     # Get the ID of the component that triggered the callback
     ctx = dash.callback_context
     if not ctx.triggered:
-        return True, animation_state, False, True, current_year
+        return True, no_update, animation_state, False, True, current_year
     
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
     
     # Handle play button click
     if trigger_id == "play-button":
-        animation_state["is_playing"] = True
-        animation_state["current_year"] = current_year
-        return False, animation_state, True, False, current_year
+        interval = animation_scheduler.interval_ms()
+        state = {"is_playing": True, "current_year": current_year, "frame_at": time.time(), "interval": interval}
+        return False, interval, state, True, False, current_year
     
     # Handle stop button click
     elif trigger_id == "stop-button":
-        animation_state["is_playing"] = False
-        return True, animation_state, False, True, animation_state["current_year"]
+        state = {**animation_state, "is_playing": False}
+        return True, no_update, state, False, True, animation_state["current_year"]
     
     # Handle interval update (animation frame)
     elif trigger_id == "animation-interval":
         # If we've reached the max year, stop the animation
         if animation_state["current_year"] >= max_year:
-            animation_state["is_playing"] = False
-            return True, animation_state, False, True, max_year
+            state = {**animation_state, "is_playing": False}
+            return True, no_update, state, False, True, max_year
+        
+        frame = animation_scheduler.next_frame(animation_state)
+        if frame is None:
+            # Over the worker's animation frame rate: skip this tick, slow down
+            interval = animation_scheduler.backoff_ms(animation_state)
+            state = {**animation_state, "interval": interval}
+            return False, interval, state, True, False, no_update
         
-        # Otherwise, increment the year
-        animation_state["current_year"] += 1
-        return False, animation_state, True, False, animation_state["current_year"]
+        # Advance one year, or several when frames arrive late
+        interval, step = frame
+        year = min(max_year, animation_state["current_year"] + step)
+        state = {**animation_state, "current_year": year, "frame_at": time.time(), "interval": interval}
+        interval_out = interval if interval != animation_state.get("interval") else no_update
+        return False, interval_out, state, True, False, year
     
     # Default return
-    return True, animation_state, False, True, current_year
+    return True, no_update, animation_state, False, True, current_year
 
 
 @callback(
@@ -304,35 +442,605 @@ def control_animation(play_clicks, stop_clicks, intervals, animation_state, curr
     Output("temperature-graph", "style"),
     Output("temperature-insights", "children"),
     Output("temperature-insights", "is_open"),
+    Output("temperature-figure-key", "data"),
+    Output("temperature-job", "data"),
+    Output("temperature-job-poll", "disabled"),
     Input("year-slider", "value"),
     Input("graph-tabs", "value"),
     Input("country-dropdown", "value"),
-    Input("tab-clicked-store", "data")
+    Input("tab-clicked-store", "data"),
+    Input("choropleth-mode", "value"),
+    Input("period-range", "value"),
+    Input("baseline-range", "value"),
+    State("temperature-figure-key", "data"),
+    State("temperature-job", "data"),
+    # Disabled while the animation plays
+    State("play-button", "disabled"),
+    State(PAGE_INSTANCE_STORE, "data")
+)
+@sequenced
+def update_graph(selected_year, selected_tab, selected_country, tab_clicked,
+                 choropleth_mode="year", period_range=None, baseline_range=None,
+                 figure_key=None, job=None, playing=None):
+    # Only the animation's frames pace it, not other renders
+    with animation_scheduler.timing(is_animation_frame(playing)):
+        outputs = graph_outputs(selected_year, selected_tab, selected_country, tab_clicked,
+                                choropleth_mode, period_range, baseline_range, figure_key, job)
+        if isinstance(outputs, tuple):
+            return outputs
+
+        # A regional view to render in a background job. Submitted here, after
+        # the single-flight section: a job belongs to the tab that polls it,
+        # which collects its result and cancels it on navigation
+        key, job_data = outputs["key"], outputs["job_data"]
+        job_id = regional_jobs.submit(session_id(), render_regional_job, selected_country, selected_year,
+                                      outputs["view"])
+        if regional_jobs.wait(job_id, JOB_INLINE_WAIT):
+            job_result = job_outputs(job_id, key)
+            if job_result is not None:
+                return job_result + (job_data, no_update)
+        # Still rendering: poll_job shows its progress, then the figure
+        return no_update, no_update, no_update, no_update, no_update, {"id": job_id, "key": key}, False
+
+
+@single_flight
+@typed_figures
+def graph_outputs(selected_year, selected_tab, selected_country, tab_clicked,
+                  choropleth_mode, period_range, baseline_range, figure_key, job):
+    """
+    update_graph's outputs, shared by identical concurrent calls of any
+    tab. For a regional view rendered in a background job, a dict with
+    its "view", "key" and "job_data" instead, for the caller to submit.
+    """
+    if not tab_clicked or not selected_tab or selected_tab not in VIEW_TABS:
+        return no_update, {"display": "none"}, no_update, False, None, cancel_job(job), no_update
+    if selected_tab == "state-choropleth" and not selected_country:
+        return no_update, {"display": "none"}, no_update, False, None, cancel_job(job), no_update
+
+    period_range = period_range or [min_year, max_year]
+    baseline_range = baseline_range or default_baseline
+    key = view_key(selected_tab, selected_year, selected_country, choropleth_mode, period_range, baseline_range)
+
+    # The tab's background job is rendering this view already
+    if job and job["key"] == key:
+        return no_update, no_update, no_update, no_update, no_update, no_update, no_update
+    # Any other response replaces what the job would show
+    job_data = cancel_job(job)
+
+    # Triggers by inputs the view isn't built from (the country on a global
+    # view, the tab-clicked flag flipping again) would rebuild the same figure
+    if key == figure_key:
+        metrics.increment("callbacks.temperature.skipped")
+        return no_update, no_update, no_update, no_update, no_update, job_data, no_update
+
+    # Only the year moved: send the values that change instead of the whole figure
+    if figure_key and figure_key["view"] == key["view"]:
+        patch = year_patch(selected_tab, selected_country, figure_key["year"], selected_year)
+        if patch is not None:
+            metrics.increment("callbacks.temperature.patches")
+            return patch[0], no_update, patch[1], no_update, key, job_data, no_update
+
+    # Views of the finite (tab, country, year) space are read from disk
+    # when the warm-up (or an earlier request) rendered them
+    view = cache_view(selected_tab, selected_country, key)
+    if view is not None and figure_cache_enabled():
+        cached = figure_cache.get(view)
+        if cached is None and prefetcher.wait(view):
+            cached = figure_cache.get(view)
+        if cached is not None:
+            prefetcher.served(view)
+            prefetch_neighbors(view, figure_key)
+            return cached["figure"], GRAPH_STYLE, cached["insights"], True, key, job_data, no_update
+
+    if selected_tab == "state-choropleth" and regional_jobs.enabled:
+        return {"view": view, "key": key, "job_data": job_data}
+
+    fig, insights_html, ok = render_view(selected_tab, selected_year, selected_country,
+                                         choropleth_mode, period_range, baseline_range)
+    metrics.increment("callbacks.temperature.builds")
+    metrics.increment(f"callbacks.temperature.builds.{selected_tab}")
+    # A newer slider position may have arrived while the figure was built
+    checkpoint()
+
+    if not ok:
+        # Nothing to patch or skip on the next trigger
+        key = None
+    elif view is not None and figure_cache_enabled():
+        store_view(view, fig, insights_html)
+    prefetch_neighbors(view, figure_key)
+    return fig, GRAPH_STYLE, insights_html, True, key, job_data, no_update
+
+
+@callback(
+    Output("temperature-graph", "figure", allow_duplicate=True),
+    Output("temperature-graph", "style", allow_duplicate=True),
+    Output("temperature-insights", "children", allow_duplicate=True),
+    Output("temperature-insights", "is_open", allow_duplicate=True),
+    Output("temperature-figure-key", "data", allow_duplicate=True),
+    Output("temperature-job", "data", allow_duplicate=True),
+    Output("temperature-job-poll", "disabled", allow_duplicate=True),
+    Output("temperature-job-progress", "value"),
+    Output("temperature-job-progress", "label"),
+    Output("temperature-job-progress", "style"),
+    Input("temperature-job-poll", "n_intervals"),
+    State("temperature-job", "data"),
+    prevent_initial_call=True
 )
-def update_graph(selected_year, selected_tab, selected_country, tab_clicked):
-    if not tab_clicked or not selected_tab:
-        return no_update, {"display": "none"}, no_update, False
+@typed_figures
+def poll_job(n_intervals, job):
+    """Shows the progress of the graph's background job, then its figure."""
+    hidden = {"display": "none"}
+    status = regional_jobs.status(job["id"]) if job else None
+    if status is not None and status["state"] in ("queued", "running"):
+        percent = round(100 * status["progress"])
+        return (no_update, no_update, no_update, no_update, no_update, no_update, no_update,
+                percent, status["message"], {"height": "20px"})
+
+    # Finished, cancelled, or the job was replaced by update_graph; a
+    # status gone by now means another poll delivered the result
+    outputs = job_outputs(job["id"], job["key"]) if status is not None else None
+    if outputs is None:
+        outputs = no_update, no_update, no_update, no_update, no_update
+    return outputs + (None, True, 0, "", hidden)
+
+
+def is_animation_frame(playing):
+    """
+    True when the running update_graph request renders a frame of the
+    animation: the animation is playing and stepped the year slider.
+
+    :param playing: The play button's disabled state, set while it plays
+    """
+    return bool(playing) and has_request_context() and dash.ctx.triggered_id == "year-slider"
+
+
+def cancel_job(job):
+    """Cancels the graph's background job; the value for the job store."""
+    if not job:
+        return no_update
+    regional_jobs.cancel(job["id"])
+    return None
+
+
+def job_outputs(job_id, key):
+    """
+    Graph outputs of a finished background job (figure, style, insights,
+    is_open, figure key), None when it was cancelled or a concurrent poll
+    has collected it already.
+    """
+    status = regional_jobs.status(job_id)
+    if status is None:
+        return None
+    if status["state"] == "done":
+        try:
+            fig, insights_html, ok = regional_jobs.collect(job_id)
+        except FileNotFoundError:
+            return None
+        return fig, GRAPH_STYLE, insights_html, True, key if ok else None
+    regional_jobs.discard(job_id)
+    if status["state"] == "failed":
+        return no_update, no_update, no_update, no_update, None
+    return None
+
+
+@typed_figures
+def render_regional_job(selected_country, selected_year, view):
+    """
+    Background job of a regional view: renders it and writes it to the
+    figure cache. The render stays in the job's thread, never in the
+    process pool, so its progress is reported and a cancel stops it.
+    """
+    fig, insights_html, ok = render_view("state-choropleth", selected_year, selected_country, "year", None, None)
+    metrics.increment("callbacks.temperature.builds")
+    metrics.increment("callbacks.temperature.builds.state-choropleth")
+    if ok and figure_cache_enabled():
+        store_view(view, fig, insights_html)
+    return fig, insights_html, ok
+
+
+@offloaded(when=lambda selected_tab, *args: selected_tab == "state-choropleth" and not in_job())
+def render_view(selected_tab, selected_year, selected_country, choropleth_mode, period_range, baseline_range):
+    """
+    Builds the figure and insights of a view from scratch. Figures are
+    rendered from compiled templates as dicts (see utils/figure_factory.py)
+    unless CLIMATE_FAST_FIGURES=0, and regional maps are built in the
+    process pool when CLIMATE_PROCESS_POOL is set. Not from a background
+    job, though: report_progress() and JobCancelled only work in the
+    job's own thread, so the job renders there.
+
+    :return: (figure, insights component, False when the figure shows a load error)
+    """
+    ok = True
+    if selected_tab == "choropleth":
+        fig, insights_html = build_choropleth(selected_year, choropleth_mode, period_range, baseline_range)
+    elif selected_tab == "mapbox":
+        fig, insights_html = build_scatter_geo(selected_year)
+    elif selected_tab == "scatter":
+        fig, insights_html = build_ranking(selected_year)
+    else:
+        try:
+            fig, insights_html = build_regional_choropleth(selected_country, selected_year)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            fig = style_figure(px.scatter(
+                title=f"Error loading {selected_country}: {e}",
+                template="plotly_white"
+            ))
+            insights_html = global_insights(selected_year)
+            ok = False
+    return fig, insights_html, ok
+
+
+def style_figure(fig, colorbar_title="Temp (°C)"):
+    """Layout shared by every view of the page, applied last (in place)."""
+    fig.update_layout(
+        margin={"r":30,"t":50,"l":30,"b":30},
+        paper_bgcolor="white",
+        plot_bgcolor="rgba(0,0,0,0)",
+        title=dict(
+            font=dict(size=20),
+            x=0.5
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        coloraxis_colorbar=dict(title=colorbar_title)
+    )
+    return fig
+
+
+def cache_view(selected_tab, selected_country, key):
+    """
+    Figure cache entry of a view: (tab, country or "_", year) for the
+    single-year views, None for period views (any range can be chosen).
+    """
+    if key["year"] is None:
+        return None
+    return (selected_tab, selected_country if selected_tab == "state-choropleth" else "_", key["year"])
+
+
+def cacheable_views():
+    """Every view the warm-up renders: each year of the global tabs and of every regional map."""
+    years = range(min_year, max_year + 1)
+    # The scatter-geo ("mapbox") tab isn't offered in the layout
+    for tab in ("choropleth", "scatter"):
+        for year in years:
+            yield (tab, "_", year)
+    for country in countries_with_geo:
+        for year in years:
+            yield ("state-choropleth", country, year)
+
+
+def store_view(view, fig, insights_html):
+    """Writes a rendered view to the figure cache, returns its size in bytes."""
+    return figure_cache.put(view, {"figure": serialize_outputs(fig), "insights": insights_html})
+
+
+def warm_view(view):
+    """Renders and caches one view of cacheable_views(), returns its size (0: not cacheable)."""
+    tab, country, year = view
+    fig, insights_html, ok = render_view(tab, year, None if country == "_" else country, "year", None, None)
+    return store_view(view, fig, insights_html) if ok else 0
+
+
+# Renders the next years of the shown view into the figure cache
+prefetcher = Prefetcher(figure_cache, warm_view)
+
+
+def prefetch_neighbors(view, figure_key):
+    """
+    Prefetches the years after the shown one in the direction the slider
+    last moved, plus the year before it, for the session's new view. Any
+    other view (a patched tab, a period map) cancels the session's prefetches.
+    """
+    if not figure_cache_enabled():
+        return
+    views = []
+    if view is not None and view[0] in PREFETCH_TABS:
+        tab, country, year = view
+        direction = -1 if figure_key and figure_key["year"] is not None and figure_key["year"] > year else 1
+        years = [year + direction * i for i in range(1, prefetcher.years + 1)] + [year - direction]
+        views = [(tab, country, y) for y in years if min_year <= y <= max_year]
+    prefetcher.schedule(session_id(), views)
+
+
+def view_key(selected_tab, selected_year, selected_country, choropleth_mode, period_range, baseline_range):
+    """
+    The inputs the figure of a view is built from, stored next to the graph:
+    an equal key means an identical figure. "view" holds all of them but
+    the year, so figures that differ only in year can be patched.
+    """
+    if selected_tab == "choropleth" and choropleth_mode in ("period", "anomaly"):
+        view = ["choropleth", choropleth_mode, list(period_range)]
+        if choropleth_mode == "anomaly":
+            view.append(list(baseline_range))
+        return {"view": view, "year": None}
+    if selected_tab == "choropleth":
+        return {"view": ["choropleth", "year"], "year": selected_year}
+    if selected_tab == "state-choropleth":
+        return {"view": [selected_tab, selected_country], "year": selected_year}
+    return {"view": [selected_tab], "year": selected_year}
+
+
+def build_choropleth(selected_year, choropleth_mode, period_range, baseline_range):
+    """Global choropleth of one year, or of a multi-year period."""
+    if choropleth_mode in ("period", "anomaly"):
+        return build_period_choropleth(choropleth_mode, period_range, baseline_range)
+
+    # Annual mean of every country with data that year
+    df_year = year_insights.year_frame(selected_year)
+    title = f"Global Temperature Distribution ({selected_year})"
+    if fast_figures_enabled():
+        fig = choropleth_template.render(
+            arrays=("z",), title=title, locations=df_year["Country"], z=df_year["AverageTemperature"])
+    else:
+        fig = choropleth_figure(df_year, title)
+    return fig, global_insights(selected_year)
+
+
+def choropleth_figure(df_year, title):
+    """Plotly Express build of the global choropleth of one year."""
+    fig = px.choropleth(
+        df_year,
+        locations="Country",
+        locationmode="country names",
+        color="AverageTemperature",
+        title=title,
+        color_continuous_scale="RdBu_r",  # Blue (cold) to Red (hot)
+        template="plotly_white",
+        range_color=[-10, 30]  # Fixed temperature range for better comparison
+    )
+    fig.update_layout(
+        coloraxis_colorbar=dict(
+            title="Temp (°C)",
+            ticks="outside",
+            tickvals=[-10, 0, 10, 20, 30],
+            ticktext=["-10°C", "0°C", "10°C", "20°C", "30°C"]
+        ),
+        geo=dict(
+            showcoastlines=True,
+            coastlinecolor="Black",
+            showland=True,
+            landcolor="lightgray",
+            showcountries=True,
+            countrycolor="gray"
+        )
+    )
+    return style_figure(fig)
+
+
+def build_scatter_geo(selected_year):
+    """Global scatter-geo of one year."""
+    df_year = year_insights.year_frame(selected_year)
+    fig = px.scatter_geo(
+        df_year.dropna(subset=["AverageTemperature"]),
+        locations="Country",
+        locationmode="country names",
+        color="AverageTemperature",
+        size="AverageTemperature",
+        size_max=15,
+        hover_name="Country",
+        title=f"Global Temperature Distribution ({selected_year})",
+        color_continuous_scale="Plasma",
+        template="plotly_white",
+        range_color=[-10, 30]  # Fixed temperature range
+    )
+    fig.update_layout(
+        geo=dict(
+            showcoastlines=True,
+            coastlinecolor="Black",
+            showland=True,
+            landcolor="lightgray",
+            showcountries=True,
+            countrycolor="gray",
+            projection_type="natural earth"
+        )
+    )
+    return style_figure(fig), global_insights(selected_year)
+
+
+def build_ranking(selected_year):
+    """Bar chart of every country's temperature in one year."""
+    # Countries ranked by temperature for better visualization
+    sorted_df = year_insights.ranked_frame(selected_year)
+    title = f"Average Temperature by Country ({selected_year})"
+    if fast_figures_enabled():
+        temperatures = sorted_df["AverageTemperature"]
+        fig = ranking_template.render(
+            arrays=("y", "color"), title=title, x=sorted_df["Country"], y=temperatures, color=temperatures)
+    else:
+        fig = ranking_figure(sorted_df, title)
+    return fig, global_insights(selected_year)
+
+
+def ranking_figure(sorted_df, title):
+    """Plotly Express build of the temperature ranking of one year."""
+    fig = px.bar(
+        sorted_df,
+        x="Country",
+        y="AverageTemperature",
+        title=title,
+        template="plotly_white",
+        color="AverageTemperature",
+        color_continuous_scale="RdBu_r",
+        range_color=[-20, 40],
+        hover_data={"Country": True, "AverageTemperature": ":.2f"}
+    )
+    fig.update_layout(
+        xaxis=dict(
+            tickangle=45,
+            title="Country",
+            categoryorder="total ascending"
+        ),
+        yaxis=dict(
+            title="Temperature (°C)"
+        ),
+        height=600
+    )
+    return style_figure(fig)
+
+
+def build_regional_choropleth(selected_country, selected_year):
+    """State-level choropleth of one country and year."""
+    # Geometry is referenced by URL and fetched once by the browser;
+    # names and bounds come from the cached spatial index
+    report_progress(0.1, "Loading regions")
+    index = load_spatial_index(selected_country)
+    report_progress(0.3, "Aggregating regional temperatures")
+    dff, insights_html = regional_year(selected_country, selected_year)
+    report_progress(0.6, "Building the map")
+
+    title = f"{selected_country} - Regional Temperatures ({selected_year})"
+    bounds = country_bounds(index)
+    # The template is zoomed in on a country; one without regions keeps
+    # the default geo layout
+    if fast_figures_enabled() and bounds is not None:
+        fig = regional_template.render(
+            arrays=("locations", "z"),
+            title=title,
+            geojson=geojson_url(selected_country),
+            locations=dff["cartodb_id"],
+            z=dff["AverageTemperature"],
+            hovertext=dff["state_name"],
+            lat_range=bounds[0],
+            lon_range=bounds[1],
+        )
+    else:
+        fig = regional_figure(selected_country, dff, title, bounds)
+    return fig, insights_html
+
+
+def country_bounds(index):
+    """
+    Map bounds of a country from its regions' outer ring boxes.
 
-    # Filter data by year using the pre-aggregated data
-    df_year = df_agg[df_agg["year"] == selected_year]
+    :return: ([lat_min, lat_max], [lon_min, lon_max]), None when it has no regions
+    """
+    boxes = index.entry_boxes
+    if not len(boxes):
+        return None
+    # Add some padding
+    padding = 0.5  # reduced padding for tighter focus
+    lat_range = [float(boxes[:, 1].min() - padding), float(boxes[:, 3].max() + padding)]
+    lon_range = [float(boxes[:, 0].min() - padding), float(boxes[:, 2].max() + padding)]
+    return lat_range, lon_range
+
+
+def regional_figure(selected_country, dff, title, bounds):
+    """Plotly Express build of the regional map of one country and year."""
+    # Create choropleth with proper hover names
+    fig = px.choropleth(
+        dff,
+        geojson=geojson_url(selected_country),
+        locations="cartodb_id",
+        featureidkey="properties.cartodb_id",
+        color="AverageTemperature",
+        hover_name="state_name",  # Use the state name for hover
+        hover_data={"cartodb_id": False, "AverageTemperature": ":.1f", "state_name": False},
+        color_continuous_scale="RdBu_r",
+        range_color=[-10, 30],
+        title=title,
+        template="plotly_white"
+    )
+    
+    # Customize hover template; it reads nothing from customdata,
+    # so it's dropped rather than resent with every year
+    fig.update_traces(
+        hovertemplate="<b>%{hovertext}</b><br>Temp: %{z:.1f}°C<extra></extra>",
+        customdata=None
+    )
     
-    # Calculate insights for the alert panel - handle NaN values properly
-    df_year_clean = df_year.dropna(subset=["AverageTemperature"])
+    # Set geo layout to focus on country only
+    if bounds is not None:
+        lat_range, lon_range = bounds
+        fig.update_geos(
+            visible=False,  # Hide the base map
+            showcoastlines=False,
+            showland=False,
+            showocean=False,
+            showcountries=False,
+            # Set bounds to focus on country
+            lataxis=dict(range=lat_range, showgrid=False),
+            lonaxis=dict(range=lon_range, showgrid=False),
+            showframe=False,
+            bgcolor='rgba(0,0,0,0)'  # Transparent background
+        )
+        
+        # Add specific layout settings to restrict view
+        fig.update_layout(
+            geo=dict(
+                scope=None,  # Remove default scope
+                projection_scale=1.2,  # Zoom in slightly
+            )
+        )
+    return style_figure(fig)
+
+
+def regional_prototype():
+    """Regional map of the first country with regions, compiled into regional_template."""
+    for country in countries_with_geo:
+        bounds = country_bounds(load_spatial_index(country))
+        if bounds is not None:
+            dff, _ = regional_year(country, max_year)
+            return regional_figure(country, dff, f"{country} - Regional Temperatures ({max_year})", bounds)
+    raise ValueError("No country has regions to build the regional map template from")
+
+
+def year_patch(selected_tab, selected_country, shown_year, selected_year):
+    """
+    Patch turning the figure of a view from `shown_year` into the figure
+    of `selected_year`: colors and title, plus the locations and
+    hover names when the places with data differ between the two years.
+
+    :return: (Patch, insights component), or None when the view can't be patched
+    """
+    patch = Patch()
+    if selected_tab == "choropleth":
+        df_year = year_insights.year_frame(selected_year)
+        locations = df_year["Country"].to_numpy()
+        if not np.array_equal(locations, year_insights.year_frame(shown_year)["Country"].to_numpy()):
+            patch["data"][0]["locations"] = locations
+        patch["data"][0]["z"] = typed_array(df_year["AverageTemperature"].to_numpy())
+        patch["layout"]["title"]["text"] = f"Global Temperature Distribution ({selected_year})"
+        return patch, global_insights(selected_year)
+
+    if selected_tab == "state-choropleth":
+        try:
+            dff, insights_html = regional_year(selected_country, selected_year)
+            df_state = load_state_frame(selected_country)
+        except Exception:
+            return None
+        locations = dff["cartodb_id"].to_numpy()
+        if not np.array_equal(locations, df_state.loc[df_state["year"] == shown_year, "cartodb_id"].to_numpy()):
+            patch["data"][0]["locations"] = typed_array(locations)
+            patch["data"][0]["hovertext"] = dff["state_name"].to_numpy()
+        patch["data"][0]["z"] = typed_array(dff["AverageTemperature"].to_numpy())
+        patch["layout"]["title"]["text"] = f"{selected_country} - Regional Temperatures ({selected_year})"
+        return patch, insights_html
+    return None
+
+
+def global_insights(selected_year):
+    """Insights panel of the global views for one year."""
+    # Insights for the alert panel come from the precomputed tables
+    summary = year_insights.summary(selected_year)
     
-    if len(df_year_clean) > 0:
-        global_avg = df_year_clean["AverageTemperature"].mean()
-        # Get the full row for min/max temperature
-        coldest_idx = df_year_clean["AverageTemperature"].idxmin()
-        hottest_idx = df_year_clean["AverageTemperature"].idxmax()
-        coldest_country = df_year_clean.loc[coldest_idx]
-        hottest_country = df_year_clean.loc[hottest_idx]
+    if summary["coldest"] is not None:
+        global_avg = summary["global_avg"]
+        coldest_country = summary["coldest"]
+        hottest_country = summary["hottest"]
     else:
         # Handle empty dataset gracefully
         global_avg = float('nan')
         coldest_country = {"Country": "No data", "AverageTemperature": float('nan')}
         hottest_country = {"Country": "No data", "AverageTemperature": float('nan')}
     
-    insights_html = html.Div([
+    return html.Div([
         html.H5(f"Temperature Insights for {selected_year}"),
         html.Ul([
             html.Li([
@@ -352,248 +1060,186 @@ def update_graph(selected_year, selected_tab, selected_country, tab_clicked):
         ])
     ])
 
-    # Global choropleth
-    if selected_tab == "choropleth":
-        fig = px.choropleth(
-            df_year,
-            locations="Country",
-            locationmode="country names",
-            color="AverageTemperature",
-            title=f"Global Temperature Distribution ({selected_year})",
-            color_continuous_scale="RdBu_r",  # Blue (cold) to Red (hot)
-            template="plotly_white",
-            range_color=[-10, 30]  # Fixed temperature range for better comparison
-        )
-        fig.update_layout(
-            coloraxis_colorbar=dict(
-                title="Temp (°C)",
-                ticks="outside",
-                tickvals=[-10, 0, 10, 20, 30],
-                ticktext=["-10°C", "0°C", "10°C", "20°C", "30°C"]
-            ),
-            geo=dict(
-                showcoastlines=True,
-                coastlinecolor="Black",
-                showland=True,
-                landcolor="lightgray",
-                showcountries=True,
-                countrycolor="gray"
-            )
-        )
 
-    # Global scatter‐geo
-    elif selected_tab == "mapbox":
-        fig = px.scatter_geo(
-            df_year.dropna(subset=["AverageTemperature"]),
-            locations="Country",
-            locationmode="country names",
-            color="AverageTemperature",
-            size="AverageTemperature",
-            size_max=15,
-            hover_name="Country",
-            title=f"Global Temperature Distribution ({selected_year})",
-            color_continuous_scale="Plasma",
-            template="plotly_white",
-            range_color=[-10, 30]  # Fixed temperature range
-        )
-        fig.update_layout(
-            geo=dict(
-                showcoastlines=True,
-                coastlinecolor="Black",
-                showland=True,
-                landcolor="lightgray",
-                showcountries=True,
-                countrycolor="gray",
-                projection_type="natural earth"
-            )
-        )
+def regional_year(selected_country, selected_year):
+    """
+    State rows of one country and year with their region names, and the
+    insights panel for them.
 
-    # Global temperature‐by‐country scatter
-    elif selected_tab == "scatter":
-        # Sort by temperature for better visualization
-        sorted_df = df_year.sort_values("AverageTemperature")
-        
-        fig = px.bar(
-            sorted_df,
-            x="Country",
-            y="AverageTemperature",
-            title=f"Average Temperature by Country ({selected_year})",
-            template="plotly_white",
-            color="AverageTemperature",
-            color_continuous_scale="RdBu_r",
-            range_color=[-20, 40],
-            hover_data={"Country": True, "AverageTemperature": ":.2f"}
-        )
-        fig.update_layout(
-            xaxis=dict(
-                tickangle=45,
-                title="Country",
-                categoryorder="total ascending"
-            ),
-            yaxis=dict(
-                title="Temperature (°C)"
-            ),
-            height=600
-        )
+    :return: (DataFrame, insights component)
+    """
+    index = load_spatial_index(selected_country)
+    df_state = load_state_frame(selected_country)
+    dff = df_state[df_state["year"] == selected_year]
+    
+    # Get state names from geojson and create hover data
+    hover_data = pd.DataFrame({
+        'cartodb_id': index.feature_ids,
+        # Placeholder for features without a name field
+        'state_name': [name or f"Region {state_id}"
+                       for name, state_id in zip(index.feature_names, index.feature_ids)],
+    })
+    
+    # Merge with temperature data
+    dff = dff.merge(hover_data, on='cartodb_id', how='left')
 
-    # State‐level choropleth for one country
-    elif selected_tab == "state-choropleth" and selected_country:
-        try:
-            # load geojson & CSV
-            with open(f"data/geojson/{selected_country}.geojson", encoding='utf-8') as f:
-                gj = json.load(f)
-            df_state = pd.read_csv(f"data/by_country_temp/{selected_country}.csv")
-            df_state["dt"] = pd.to_datetime(df_state["dt"])
-            df_state["year"] = df_state["dt"].dt.year
-            dff = df_state[df_state["year"] == selected_year]
-            
-            # Get state names from geojson and create hover data
-            hover_data = pd.DataFrame()
-            for feature in gj['features']:
-                state_id = feature['properties']['cartodb_id']
-                # Try different property fields for state name
-                for name_field in ['name', 'NAME', 'state', 'STATE', 'province', 'PROVINCE']:
-                    if name_field in feature['properties']:
-                        feature['properties']['state_name'] = feature['properties'][name_field]
-                        break
-                # If no name found, use a placeholder
-                if 'state_name' not in feature['properties']:
-                    feature['properties']['state_name'] = f"Region {state_id}"
-                
-                # Add to hover data frame
-                hover_data = pd.concat([
-                    hover_data, 
-                    pd.DataFrame({'cartodb_id': [state_id], 'state_name': [feature['properties']['state_name']]})
-                ])
-            
-            # Merge with temperature data
-            dff = dff.merge(hover_data, on='cartodb_id', how='left')
-            
-            # Create choropleth with proper hover names
-            fig = px.choropleth(
-                dff,
-                geojson=gj,
-                locations="cartodb_id",
-                featureidkey="properties.cartodb_id",
-                color="AverageTemperature",
-                hover_name="state_name",  # Use the state name for hover
-                hover_data={"cartodb_id": False, "AverageTemperature": ":.1f", "state_name": False},
-                color_continuous_scale="RdBu_r",
-                range_color=[-10, 30],
-                title=f"{selected_country} - Regional Temperatures ({selected_year})",
-                template="plotly_white"
-            )
-            
-            # Customize hover template
-            fig.update_traces(
-                hovertemplate="<b>%{hovertext}</b><br>Temp: %{z:.1f}°C<extra></extra>"
-            )
-            
-            # Calculate country bounds
-            lats = []
-            lons = []
-            for feature in gj['features']:
-                if feature['geometry']['type'] == 'Polygon':
-                    for coord in feature['geometry']['coordinates'][0]:
-                        lons.append(coord[0])
-                        lats.append(coord[1])
-                elif feature['geometry']['type'] == 'MultiPolygon':
-                    for polygon in feature['geometry']['coordinates']:
-                        for coord in polygon[0]:
-                            lons.append(coord[0])
-                            lats.append(coord[1])
-            
-            # Set geo layout to focus on country only
-            if lats and lons:
-                # Add some padding
-                padding = 0.5  # reduced padding for tighter focus
-                lat_min, lat_max = min(lats) - padding, max(lats) + padding
-                lon_min, lon_max = min(lons) - padding, max(lons) + padding
-                
-                fig.update_geos(
-                    visible=False,  # Hide the base map
-                    showcoastlines=False,
-                    showland=False,
-                    showocean=False,
-                    showcountries=False,
-                    # Set bounds to focus on country
-                    lataxis=dict(range=[lat_min, lat_max], showgrid=False),
-                    lonaxis=dict(range=[lon_min, lon_max], showgrid=False),
-                    showframe=False,
-                    bgcolor='rgba(0,0,0,0)'  # Transparent background
-                )
-                
-                # Add specific layout settings to restrict view
-                fig.update_layout(
-                    geo=dict(
-                        scope=None,  # Remove default scope
-                        projection_scale=1.2,  # Zoom in slightly
-                    )
-                )
-                
-            # Update insights with state/region level data - handle NaN values
-            dff_clean = dff.dropna(subset=["AverageTemperature"])
-            
-            if len(dff_clean) > 0:
-                state_avg = dff_clean["AverageTemperature"].mean()
-                # Get the full row with min/max temperature
-                coldest_idx = dff_clean["AverageTemperature"].idxmin()
-                hottest_idx = dff_clean["AverageTemperature"].idxmax()
-                coldest_state = dff_clean.loc[coldest_idx]
-                hottest_state = dff_clean.loc[hottest_idx]
-            else:
-                # Handle empty dataset
-                state_avg = float('nan')
-                coldest_state = {"state_name": "No data", "AverageTemperature": float('nan')}
-                hottest_state = {"state_name": "No data", "AverageTemperature": float('nan')}
-            
-            insights_html = html.Div([
-                html.H5(f"Temperature Insights for {selected_country} ({selected_year})"),
-                html.Ul([
-                    html.Li([
-                        html.Strong("Country Average Temperature: "),
-                        f"{state_avg:.2f}°C" if not pd.isna(state_avg) else "No data"
-                    ]),
-                    html.Li([
-                        html.Strong("Coldest Region: "),
-                        f"{coldest_state['state_name']} ({coldest_state['AverageTemperature']:.2f}°C)"
-                        if not pd.isna(coldest_state['AverageTemperature']) else "No data"
-                    ]),
-                    html.Li([
-                        html.Strong("Hottest Region: "),
-                        f"{hottest_state['state_name']} ({hottest_state['AverageTemperature']:.2f}°C)"
-                        if not pd.isna(hottest_state['AverageTemperature']) else "No data"
-                    ])
-                ])
+    # Update insights with state/region level data - handle NaN values
+    dff_clean = dff.dropna(subset=["AverageTemperature"])
+    
+    if len(dff_clean) > 0:
+        # Weighted by state area, so small regions don't count as much as large ones
+        weighted = load_area_weighted_table(selected_country)
+        state_avg = weighted.national_mean(selected_year)
+        coverage = weighted.area_coverage(selected_year)
+        # Get the full row with min/max temperature
+        coldest_idx = dff_clean["AverageTemperature"].idxmin()
+        hottest_idx = dff_clean["AverageTemperature"].idxmax()
+        coldest_state = dff_clean.loc[coldest_idx]
+        hottest_state = dff_clean.loc[hottest_idx]
+    else:
+        # Handle empty dataset
+        state_avg = float('nan')
+        coverage = float('nan')
+        coldest_state = {"state_name": "No data", "AverageTemperature": float('nan')}
+        hottest_state = {"state_name": "No data", "AverageTemperature": float('nan')}
+    
+    insights_html = html.Div([
+        html.H5(f"Temperature Insights for {selected_country} ({selected_year})"),
+        html.Ul([
+            html.Li([
+                html.Strong("Country Average Temperature (area-weighted): "),
+                f"{state_avg:.2f}°C" if not pd.isna(state_avg) else "No data"
+            ]),
+            html.Li([
+                html.Strong("Area With Data: "),
+                f"{coverage:.0%} of the mapped regions" if not pd.isna(coverage) else "No data"
+            ]),
+            html.Li([
+                html.Strong("Coldest Region: "),
+                f"{coldest_state['state_name']} ({coldest_state['AverageTemperature']:.2f}°C)"
+                if not pd.isna(coldest_state['AverageTemperature']) else "No data"
+            ]),
+            html.Li([
+                html.Strong("Hottest Region: "),
+                f"{hottest_state['state_name']} ({hottest_state['AverageTemperature']:.2f}°C)"
+                if not pd.isna(hottest_state['AverageTemperature']) else "No data"
             ])
-                        
-        except Exception as e:
-            fig = px.scatter(
-                title=f"Error loading {selected_country}: {e}",
-                template="plotly_white"
-            )
+        ])
+    ])
+    return dff, insights_html
+
+
+def build_period_choropleth(mode, period_range, baseline_range):
+    """
+    Builds the global choropleth for a multi-year period from the country
+    matrix prefix sums, so any period costs the same as a single year.
+
+    :param mode: "period" for the period average, "anomaly" for period minus baseline
+    :param period_range: [start_year, end_year] of the period, inclusive
+    :param baseline_range: [start_year, end_year] of the baseline, inclusive
+    :return: (figure, insights component)
+    """
+    start, end = period_range
+    values = country_matrix.period_mean(start, end)
+    period_label = f"{start}-{end}"
+
+    if mode == "anomaly":
+        base_start, base_end = baseline_range
+        values = values - country_matrix.period_mean(base_start, base_end)
+        period_label = f"{period_label} vs {base_start}-{base_end}"
+        title = f"Temperature Change ({period_label})"
+    else:
+        title = f"Average Temperature ({period_label})"
+
+    df_period = pd.DataFrame({"Country": country_matrix.labels, "AverageTemperature": values})
+    df_period = df_period.dropna(subset=["AverageTemperature"])
+
+    if fast_figures_enabled():
+        fig = period_templates[mode].render(
+            arrays=("z",), title=title, locations=df_period["Country"], z=df_period["AverageTemperature"])
+    else:
+        fig = period_figure(df_period, title, mode)
+
+    if len(df_period) > 0:
+        lowest = df_period.loc[df_period["AverageTemperature"].idxmin()]
+        highest = df_period.loc[df_period["AverageTemperature"].idxmax()]
+        items = [
+            ("Average Across Countries: ", f"{df_period['AverageTemperature'].mean():+.2f}°C"
+             if mode == "anomaly" else f"{df_period['AverageTemperature'].mean():.2f}°C"),
+        ]
+        if mode == "anomaly":
+            items += [
+                ("Most Cooling: ", f"{lowest['Country']} ({lowest['AverageTemperature']:+.2f}°C)"),
+                ("Most Warming: ", f"{highest['Country']} ({highest['AverageTemperature']:+.2f}°C)"),
+            ]
+        else:
+            items += [
+                ("Coldest Country: ", f"{lowest['Country']} ({lowest['AverageTemperature']:.2f}°C)"),
+                ("Hottest Country: ", f"{highest['Country']} ({highest['AverageTemperature']:.2f}°C)"),
+            ]
     else:
-        return no_update, {"display": "none"}, no_update, False
+        items = [("No data: ", "no country has measurements in this period")]
+
+    insights_html = html.Div([
+        html.H5(f"Temperature Insights for {period_label}"),
+        html.Ul([html.Li([html.Strong(label), text]) for label, text in items])
+    ])
+    return fig, insights_html
+
 
+def period_figure(df_period, title, mode):
+    """Plotly Express build of the global choropleth of a period, or of its change for mode "anomaly"."""
+    range_color = [-3, 3] if mode == "anomaly" else [-10, 30]
+    fig = px.choropleth(
+        df_period,
+        locations="Country",
+        locationmode="country names",
+        color="AverageTemperature",
+        title=title,
+        color_continuous_scale="RdBu_r",
+        template="plotly_white",
+        range_color=range_color
+    )
     fig.update_layout(
-        margin={"r":30,"t":50,"l":30,"b":30},
-        paper_bgcolor="white",
-        plot_bgcolor="rgba(0,0,0,0)",
-        title=dict(
-            font=dict(size=20),
-            x=0.5
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        ),
-        coloraxis_colorbar=dict(title="Temp (°C)")
+        geo=dict(
+            showcoastlines=True,
+            coastlinecolor="Black",
+            showland=True,
+            landcolor="lightgray",
+            showcountries=True,
+            countrycolor="gray"
+        )
     )
-    
-    return fig, {"height":"600px", "display":"block"}, insights_html, True
+    return style_figure(fig, "Change (°C)" if mode == "anomaly" else "Temp (°C)")
+
+
+# Figures of the views rebuilt on every year step or period change,
+# compiled once from their Plotly Express build; the slots are what
+# changes between years
+choropleth_template = FigureTemplate(
+    lambda: choropleth_figure(year_insights.year_frame(max_year), "Global Temperature Distribution"),
+    {"title": "layout.title.text", "locations": "data.0.locations", "z": "data.0.z"},
+)
+ranking_template = FigureTemplate(
+    lambda: ranking_figure(year_insights.ranked_frame(max_year), "Average Temperature by Country"),
+    {"title": "layout.title.text", "x": "data.0.x", "y": "data.0.y", "color": "data.0.marker.color"},
+)
+regional_template = FigureTemplate(regional_prototype, {
+    "title": "layout.title.text",
+    "geojson": "data.0.geojson",
+    "locations": "data.0.locations",
+    "z": "data.0.z",
+    "hovertext": "data.0.hovertext",
+    "lat_range": "layout.geo.lataxis.range",
+    "lon_range": "layout.geo.lonaxis.range",
+})
+period_templates = {
+    mode: FigureTemplate(
+        lambda mode=mode: period_figure(year_insights.year_frame(max_year), "Average Temperature", mode),
+        {"title": "layout.title.text", "locations": "data.0.locations", "z": "data.0.z"},
+    )
+    for mode in ("period", "anomaly")
+}
 
 # Fix missing dash import
 import dash
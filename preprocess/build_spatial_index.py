@@ -0,0 +1,49 @@
+# preprocess/build_spatial_index.py
+#
+# Builds and persists the R-tree (utils/spatial.py) of every GeoJSON in
+# data/geojson/, so the app loads it instead of scanning polygons. Run
+# from the repository root:
+#
+#     python -m preprocess.build_spatial_index
+#     python -m preprocess.build_spatial_index --geojson data/geojson --out data/spatial_index
+
+import argparse
+import os
+import sys
+
+from utils.geojson import GEOJSON_DIR, geojson_countries, load_geojson
+from utils.spatial import SPATIAL_INDEX_DIR, SpatialIndex, index_path
+
+
+def build_index_file(country, geojson_dir=GEOJSON_DIR, out_dir=SPATIAL_INDEX_DIR):
+    """
+    Writes <out_dir>/<country>.npz, the spatial index of the country's GeoJSON.
+
+    :return: Dict with "country", "features", "parts", "levels" and "path"
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = SpatialIndex.from_geojson(load_geojson(country, geojson_dir))
+    path = index_path(country, out_dir)
+    index.save(path)
+    return {
+        "country": country,
+        "features": len(index.feature_ids),
+        "parts": len(index.part_feature),
+        "levels": len(index.levels),
+        "path": path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the spatial index of every GeoJSON file.")
+    parser.add_argument("--geojson", default=GEOJSON_DIR, help="Directory of <country>.geojson files")
+    parser.add_argument("--out", default=SPATIAL_INDEX_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    for country in geojson_countries(args.geojson):
+        r = build_index_file(country, args.geojson, args.out)
+        print(f"{country}: {r['features']} features, {r['parts']} polygons, {r['levels']} levels -> {r['path']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+# Superseded by preprocess/join_cartodb.py, which joins every country in data/geojson/.
+
 # import os
 # import json
 # import pandas as pd
@@ -0,0 +1,267 @@
+# preprocess/join_cartodb.py
+#
+# Joins the per-country state temperatures written by split_states.py to
+# the cartodb_id of every GeoJSON in data/geojson/, one worker process per
+# country. Run from the repository root after split_states:
+#
+#     python -m preprocess.join_cartodb
+#     python -m preprocess.join_cartodb --states data/by_country_states \
+#         --geojson data/geojson --out data/by_country_temp --workers 4
+#
+# Writes <out>/<country>.npz (the format utils/state_data.py loads) for
+# every country with both a GeoJSON and temperatures, plus
+# <out>/unmatched_states.csv listing states without a matching feature.
+#
+# States are matched by name first. When data/state_points.csv gives a
+# state a representative coordinate (columns Country, State, Latitude,
+# Longitude; decimal degrees or Berkeley Earth style "57.05N"), states
+# left unmatched are assigned to the feature containing that point.
+# Replaces the hard-coded single-country join in data_processing.py.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.geojson import GEOJSON_DIR, feature_name, geojson_countries, load_geojson
+from utils.spatial import SpatialIndex
+from utils.state_data import (
+    NO_CARTODB_ID, STATE_DATA_DIR, country_file_stem, read_state_file, write_state_file,
+)
+
+SPLIT_DIR = "data/by_country_states"
+UNMATCHED_REPORT = "unmatched_states.csv"
+STATE_POINTS = "data/state_points.csv"
+
+# Source state name -> GeoJSON feature name, per country file stem, for
+# regions the two datasets spell differently (lower case)
+STATE_ALIASES = {
+    "china": {
+        "heilongjiang": "heilongjian",
+        "nei mongol": "inner mongolia",
+        "ningxia hui": "ningxia",
+        "xinjiang uygur": "xinjiang",
+        "xizang": "tibet",
+    },
+}
+
+
+def normalize_names(names):
+    """Lower-cased, whitespace-trimmed names so "Nei Mongol " matches "nei mongol"."""
+    return pd.Index(names, dtype=object).astype(str).str.strip().str.lower()
+
+
+def build_lookup(geojson):
+    """
+    Normalized feature name -> cartodb_id of one GeoJSON. Duplicate names
+    keep their first feature.
+
+    :param geojson: Parsed GeoJSON FeatureCollection
+    :return: pandas Series indexed by normalized name
+    """
+    props = [f.get("properties") or {} for f in geojson["features"]]
+    pairs = [(feature_name(p), p.get("cartodb_id")) for p in props]
+    pairs = [(name, cid) for name, cid in pairs if name is not None and cid is not None]
+    lookup = pd.Series(
+        np.array([cid for _, cid in pairs], dtype=np.int32),
+        index=normalize_names([name for name, _ in pairs]),
+    )
+    return lookup[~lookup.index.duplicated()]
+
+
+def parse_coordinates(values):
+    """
+    Decimal degrees from numbers or Berkeley Earth strings like "57.05N"
+    and "10.33W" (south and west negative).
+    """
+    text = pd.Series(values, dtype=object).astype(str).str.strip().str.upper()
+    sign = np.where(text.str.endswith(("S", "W")), -1.0, 1.0)
+    return pd.to_numeric(text.str.rstrip("NSEW"), errors="coerce").to_numpy() * sign
+
+
+def load_state_points(country, path=STATE_POINTS):
+    """
+    Representative points of a country's states from the optional points
+    file, as a DataFrame indexed by normalized state name with lon/lat
+    columns (empty when the file or the country is missing).
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["lon", "lat"])
+    points = pd.read_csv(path, dtype=str)
+    points = points[points["Country"].astype(str).map(country_file_stem) == country]
+    frame = pd.DataFrame({
+        "lon": parse_coordinates(points["Longitude"]),
+        "lat": parse_coordinates(points["Latitude"]),
+    }, index=normalize_names(points["State"]))
+    return frame.dropna()[lambda f: ~f.index.duplicated()]
+
+
+def assign_cartodb_ids(index, lons, lats):
+    """
+    cartodb_id of the feature containing each point (vectorized, fast
+    enough for millions of station records).
+
+    :param index: SpatialIndex of the country's GeoJSON
+    :return: int32 array, NO_CARTODB_ID for points outside every feature
+    """
+    features = index.locate_many(lons, lats)
+    return np.where(features >= 0, index.feature_ids[features], NO_CARTODB_ID).astype(np.int32)
+
+
+def locate_unmatched(cartodb_id, names, points, index):
+    """
+    Fills the unmatched entries of cartodb_id (in place) with the feature
+    containing the state's representative point. A feature already
+    claimed, by name or by an earlier point, is not assigned twice.
+
+    :param cartodb_id: Per-state ids, NO_CARTODB_ID where unmatched
+    :param names: Normalized state names
+    :param points: Output of load_state_points()
+    :param index: SpatialIndex of the country's GeoJSON
+    :return: Number of states assigned
+    """
+    todo = np.flatnonzero((cartodb_id == NO_CARTODB_ID) & np.asarray(names.isin(points.index)))
+    if not len(todo):
+        return 0
+    located = points.loc[names[todo]]
+    found = assign_cartodb_ids(index, located["lon"].to_numpy(), located["lat"].to_numpy())
+    claimed = set(cartodb_id[cartodb_id != NO_CARTODB_ID].tolist())
+    assigned = 0
+    for state, cid in zip(todo, found):
+        if cid != NO_CARTODB_ID and cid not in claimed:
+            cartodb_id[state] = cid
+            claimed.add(cid)
+            assigned += 1
+    return assigned
+
+
+def join_country(country, states_dir=SPLIT_DIR, geojson_dir=GEOJSON_DIR, out_dir=STATE_DATA_DIR,
+                 points_path=STATE_POINTS):
+    """
+    Attaches cartodb_id to one country's states and writes <out_dir>/<country>.npz.
+
+    :param country: Country file stem shared by the .npz and .geojson files
+    :param points_path: Optional representative points of states (see module comment)
+    :return: Dict with "country", "rows", "states", "matched", "located"
+             and "unmatched" (list of (state, rows) pairs)
+    """
+    arrays = read_state_file(os.path.join(states_dir, f"{country}.npz"))
+    geojson = load_geojson(country, geojson_dir)
+    lookup = build_lookup(geojson)
+
+    source_names = normalize_names(arrays["states"])
+    aliases = STATE_ALIASES.get(country, {})
+    names = source_names.map(lambda name: aliases.get(name, name))
+    positions = lookup.index.get_indexer(names)
+    cartodb_id = np.where(positions >= 0, lookup.to_numpy()[positions], NO_CARTODB_ID)
+    matched = int((positions >= 0).sum())
+
+    located = 0
+    points = load_state_points(country, points_path)
+    if matched < len(names) and len(points):
+        located = locate_unmatched(cartodb_id, source_names, points, SpatialIndex.from_geojson(geojson))
+    state_rows = np.bincount(arrays["state"], minlength=len(arrays["states"]))
+
+    os.makedirs(out_dir, exist_ok=True)
+    write_state_file(
+        os.path.join(out_dir, f"{country}.npz"),
+        str(arrays["country"]), arrays["states"],
+        arrays["state"], arrays["year"], arrays["month"],
+        arrays["temperature"], arrays["uncertainty"],
+        cartodb_id=cartodb_id,
+    )
+    unmatched = cartodb_id == NO_CARTODB_ID
+    return {
+        "country": str(arrays["country"]),
+        "rows": int(len(arrays["state"])),
+        "states": int(len(arrays["states"])),
+        "matched": matched,
+        "located": located,
+        "unmatched": [(str(s), int(n)) for s, n in zip(arrays["states"][unmatched], state_rows[unmatched])],
+    }
+
+
+def join_all(states_dir=SPLIT_DIR, geojson_dir=GEOJSON_DIR, out_dir=STATE_DATA_DIR, workers=None,
+             points_path=STATE_POINTS, log=print):
+    """
+    Joins every country that has both a GeoJSON and split temperatures,
+    in parallel, and writes the unmatched-state report.
+
+    :param workers: Worker processes, defaults to one per CPU; 1 runs in-process
+    :param points_path: Optional representative points of states
+    :param log: Progress callback taking a string
+    :return: Dict with "results" (one per country), "missing" (GeoJSON
+             countries without temperatures), "report" and "seconds"
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    countries = geojson_countries(geojson_dir)
+    available = [c for c in countries if os.path.exists(os.path.join(states_dir, f"{c}.npz"))]
+    missing = [c for c in countries if c not in available]
+
+    args = (available, [states_dir] * len(available), [geojson_dir] * len(available),
+            [out_dir] * len(available), [points_path] * len(available))
+    if workers == 1:
+        results = list(map(join_country, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(join_country, *args))
+
+    for r in results:
+        log(f"{r['country']}: {r['matched']}/{r['states']} states matched by name, "
+            f"{r['located']} by location, {r['rows']:,} rows")
+    for country in missing:
+        log(f"{country}: no temperatures in {states_dir}, skipped")
+
+    return {
+        "results": results,
+        "missing": missing,
+        "report": write_unmatched_report(available, out_dir),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def write_unmatched_report(countries, out_dir=STATE_DATA_DIR):
+    """
+    Lists the states of the joined countries that have no GeoJSON feature
+    in <out_dir>/unmatched_states.csv (Country, State, rows).
+
+    :param countries: Country file stems joined into out_dir
+    :return: Path of the report
+    """
+    rows = []
+    for country in countries:
+        arrays = read_state_file(os.path.join(out_dir, f"{country}.npz"))
+        state_rows = np.bincount(arrays["state"], minlength=len(arrays["states"]))
+        unmatched = arrays["cartodb_id"] == NO_CARTODB_ID
+        rows += [(str(arrays["country"]), str(s), int(n))
+                 for s, n in zip(arrays["states"][unmatched], state_rows[unmatched])]
+
+    report_path = os.path.join(out_dir, UNMATCHED_REPORT)
+    pd.DataFrame(rows, columns=["Country", "State", "rows"]).to_csv(report_path, index=False)
+    return report_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join state temperatures to GeoJSON cartodb_ids.")
+    parser.add_argument("--states", default=SPLIT_DIR, help="Directory written by split_states")
+    parser.add_argument("--geojson", default=GEOJSON_DIR, help="Directory of <country>.geojson files")
+    parser.add_argument("--out", default=STATE_DATA_DIR, help="Output directory")
+    parser.add_argument("--points", default=STATE_POINTS, help="Optional representative points of states")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    result = join_all(args.states, args.geojson, args.out, args.workers, args.points)
+    unmatched = sum(len(r["unmatched"]) for r in result["results"])
+    print(
+        f"Joined {len(result['results'])} countries in {result['seconds']:.1f}s, "
+        f"{unmatched} unmatched states listed in {result['report']}"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# preprocess/pipeline.py
+#
+# Builds every preprocessed artifact the app uses, rebuilding only what is
+# stale. Run from the repository root:
+#
+#     python -m preprocess.pipeline            # rebuild stale steps
+#     python -m preprocess.pipeline --dry-run  # list what would run
+#     python -m preprocess.pipeline --force    # rebuild everything
+#
+# A step is stale when the content of its inputs or of the code that
+# produces it changed, or when its outputs are missing or were modified.
+# Steps whose dependencies are done run in parallel worker processes. The
+# result is recorded in data/pipeline_manifest.json, which the app checks
+# at startup (see utils/artifacts.py).
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+from preprocess.build_spatial_index import build_index_file
+from preprocess.join_cartodb import (
+    SPLIT_DIR, STATE_POINTS, UNMATCHED_REPORT, join_country, write_unmatched_report,
+)
+from preprocess.simplify_geometry import simplify_file
+from preprocess.split_states import SOURCE_CSV, split_states
+from utils.artifacts import MANIFEST_PATH, fingerprint, load_manifest, save_manifest, step_staleness
+from utils.geojson import GEOJSON_DIR, SIMPLIFIED_DIR, geojson_countries
+from utils.spatial import SPATIAL_INDEX_DIR
+from utils.state_data import STATE_DATA_DIR
+
+
+class Step:
+    """
+    One pipeline step: func(*args) turns the files matching `inputs` into
+    the files matching `outputs`. Every pattern is a glob relative to the
+    repository root; `code` lists the modules whose changes invalidate
+    the outputs. `when`, called once the steps in `after` are done,
+    returns False when the step has nothing to build (e.g. a GeoJSON
+    country without temperatures).
+    """
+
+    def __init__(self, name, func, args=(), inputs=(), code=(), outputs=(), after=(), when=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        self.code = list(code)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.when = when
+
+    def record(self, code_hash, input_hash, output_hash):
+        """Manifest entry of a finished run of this step."""
+        return {
+            "inputs": self.inputs,
+            "code": self.code,
+            "outputs": self.outputs,
+            "input_hash": input_hash,
+            "code_hash": code_hash,
+            "output_hash": output_hash,
+        }
+
+
+def _split(source, out_dir):
+    split_states(source, out_dir, log=lambda _: None)
+
+
+def _unmatched_report(countries, states_dir, out_dir):
+    # Only the countries the join steps wrote, like join_all()
+    joined = [c for c in countries if os.path.exists(os.path.join(states_dir, f"{c}.npz"))]
+    return write_unmatched_report(joined, out_dir)
+
+
+def build_steps(geojson_dir=GEOJSON_DIR):
+    """
+    Declares every step: split, then per GeoJSON a cartodb join (skipped
+    for countries the split wrote no temperatures for), a geometry
+    simplification and a spatial index.
+    """
+    countries = geojson_countries(geojson_dir)
+    steps = [Step(
+        "split_states", _split, (SOURCE_CSV, SPLIT_DIR),
+        inputs=[SOURCE_CSV],
+        code=["preprocess/split_states.py", "utils/state_data.py"],
+        outputs=[f"{SPLIT_DIR}/*.npz"],
+    )]
+    for country in countries:
+        geojson = f"{geojson_dir}/{country}.geojson"
+        steps.append(Step(
+            f"join_cartodb:{country}", join_country,
+            (country, SPLIT_DIR, geojson_dir, STATE_DATA_DIR, STATE_POINTS),
+            inputs=[f"{SPLIT_DIR}/{country}.npz", geojson, STATE_POINTS],
+            code=["preprocess/join_cartodb.py", "utils/geojson.py", "utils/spatial.py", "utils/state_data.py"],
+            outputs=[f"{STATE_DATA_DIR}/{country}.npz"],
+            after=["split_states"],
+            when=partial(os.path.exists, f"{SPLIT_DIR}/{country}.npz"),
+        ))
+        steps.append(Step(
+            f"simplify_geometry:{country}", simplify_file, (country, geojson_dir, SIMPLIFIED_DIR),
+            inputs=[geojson],
+            code=["preprocess/simplify_geometry.py", "utils/geojson.py"],
+            outputs=[f"{SIMPLIFIED_DIR}/{country}.geojson"],
+        ))
+        steps.append(Step(
+            f"spatial_index:{country}", build_index_file, (country, geojson_dir, SPATIAL_INDEX_DIR),
+            inputs=[geojson],
+            code=["preprocess/build_spatial_index.py", "utils/spatial.py", "utils/geojson.py"],
+            outputs=[f"{SPATIAL_INDEX_DIR}/{country}.npz"],
+        ))
+    steps.append(Step(
+        "unmatched_report", _unmatched_report, (countries, SPLIT_DIR, STATE_DATA_DIR),
+        inputs=[f"{STATE_DATA_DIR}/{country}.npz" for country in countries],
+        code=["preprocess/join_cartodb.py", "preprocess/pipeline.py"],
+        outputs=[f"{STATE_DATA_DIR}/{UNMATCHED_REPORT}"],
+        after=[f"join_cartodb:{country}" for country in countries],
+    ))
+    return steps
+
+
+def _is_current(step, entry, code_hash, input_hash, cache):
+    """True when the recorded run of a step matches its declaration, code and inputs."""
+    return (
+        entry is not None
+        and entry == step.record(code_hash, input_hash, entry["output_hash"])
+        and step_staleness(entry, cache) is None
+    )
+
+
+def run_pipeline(steps=None, manifest_path=MANIFEST_PATH, workers=None, force=False, dry_run=False, log=print):
+    """
+    Runs every stale step once its dependencies are done, independent
+    steps in parallel. The manifest is saved after each step, so an
+    interrupted run resumes where it stopped.
+
+    :param steps: Steps to run, defaults to build_steps()
+    :param manifest_path: Where hashes of the finished steps are recorded
+    :param workers: Worker processes, defaults to one per CPU
+    :param force: Rebuild every step even when it is current
+    :param dry_run: Only report which steps are stale
+    :param log: Progress callback taking a string
+    :return: Dict with "built", "skipped", "missing" (step names with
+             nothing to build) and "seconds"
+    """
+    steps = build_steps() if steps is None else steps
+    manifest = load_manifest(manifest_path) or {"steps": {}, "files": {}}
+    cache = manifest["files"]
+    pending = {step.name: step for step in steps}
+    unknown = {dep for step in steps for dep in step.after} - set(pending)
+    if unknown:
+        raise ValueError(f"Unknown step dependencies: {sorted(unknown)}")
+
+    start = time.perf_counter()
+    done, built, skipped, missing = set(), [], [], []
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            ready = [s for s in pending.values() if all(dep in done for dep in s.after)]
+            for step in ready:
+                del pending[step.name]
+                if step.when is not None and not step.when():
+                    log(f"{step.name}: nothing to build, skipped")
+                    missing.append(step.name)
+                    done.add(step.name)
+                    continue
+                code_hash = fingerprint(step.code, cache)
+                input_hash = fingerprint(step.inputs, cache)
+                if not force and _is_current(step, manifest["steps"].get(step.name), code_hash, input_hash, cache):
+                    skipped.append(step.name)
+                    done.add(step.name)
+                elif dry_run:
+                    log(f"{step.name}: stale")
+                    built.append(step.name)
+                    done.add(step.name)
+                else:
+                    log(f"{step.name}: building")
+                    running[pool.submit(step.func, *step.args)] = (step, code_hash, input_hash, time.perf_counter())
+            if ready:
+                # Skipped steps may have unblocked others
+                continue
+            if not running:
+                raise ValueError(f"Dependency cycle between {sorted(pending)}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step, code_hash, input_hash, step_start = running.pop(future)
+                future.result()
+                manifest["steps"][step.name] = step.record(code_hash, input_hash, fingerprint(step.outputs, cache))
+                save_manifest(manifest, manifest_path)
+                log(f"{step.name}: built in {time.perf_counter() - step_start:.1f}s")
+                built.append(step.name)
+                done.add(step.name)
+
+    # Forget steps that are no longer declared (e.g. a removed GeoJSON) or
+    # had nothing to build, so the app doesn't find their outputs missing
+    declared = {step.name for step in steps} - set(missing)
+    if not dry_run and set(manifest["steps"]) - declared:
+        manifest["steps"] = {k: v for k, v in manifest["steps"].items() if k in declared}
+        save_manifest(manifest, manifest_path)
+
+    return {"built": built, "skipped": skipped, "missing": missing, "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild stale preprocessed data.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every step")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stale steps")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Manifest file")
+    args = parser.parse_args()
+
+    if not os.path.exists(SOURCE_CSV):
+        sys.exit(f"{SOURCE_CSV} not found; download it first (see README)")
+    result = run_pipeline(manifest_path=args.manifest, workers=args.workers, force=args.force,
+                          dry_run=args.dry_run)
+    verb = "stale" if args.dry_run else "built"
+    print(
+        f"{len(result['built'])} steps {verb}, {len(result['skipped'])} up to date, "
+        f"{len(result['missing'])} with nothing to build ({result['seconds']:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+# Superseded by preprocess/split_states.py, which splits every country in one pass.
+
 import pandas as pd
 import os
 
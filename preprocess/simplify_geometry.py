@@ -0,0 +1,123 @@
+# preprocess/simplify_geometry.py
+#
+# Writes a simplified copy of every GeoJSON in data/geojson/ for display.
+# The regional choropleth ships its whole GeoJSON to the browser on every
+# update, and at country scale most vertices are below a pixel. Run from
+# the repository root:
+#
+#     python -m preprocess.simplify_geometry
+#     python -m preprocess.simplify_geometry --tolerance 0.02 --out data/geojson_simplified
+#
+# Rings are simplified with Douglas-Peucker and coordinates rounded, which
+# keeps every feature and its properties. Spatial lookups keep using the
+# full-resolution files.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from utils.geojson import GEOJSON_DIR, SIMPLIFIED_DIR, geojson_countries, load_geojson
+
+# Largest distance, in degrees (~1 km at the equator), a removed vertex
+# may lie from the simplified outline
+DEFAULT_TOLERANCE = 0.01
+
+# Rounding of the written coordinates (~10 m)
+COORD_DECIMALS = 4
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Mask of the vertices of a polyline kept by Douglas-Peucker.
+
+    :param points: (n, 2) array of lon/lat
+    :param tolerance: Largest allowed distance of a dropped vertex
+    :return: Boolean array, True for kept vertices (always both ends)
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        rel = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            # Closed rings start and end on the same vertex
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(segment[0] * rel[:, 1] - segment[1] * rel[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack += [(start, split), (split, end)]
+    return keep
+
+
+def simplify_ring(ring, tolerance):
+    """Simplified, rounded copy of a linear ring; tiny rings are only rounded."""
+    points = np.asarray(ring, dtype=np.float64)[:, :2]
+    keep = douglas_peucker(points, tolerance) if len(points) > 4 else None
+    if keep is not None and keep.sum() >= 4:
+        points = points[keep]
+    return np.round(points, COORD_DECIMALS).tolist()
+
+
+def simplify_geometry(geometry, tolerance):
+    """Simplified copy of a Polygon or MultiPolygon geometry (others unchanged)."""
+    if geometry is None:
+        return None
+    if geometry["type"] == "Polygon":
+        coords = [simplify_ring(r, tolerance) for r in geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        coords = [[simplify_ring(r, tolerance) for r in poly] for poly in geometry["coordinates"]]
+    else:
+        return geometry
+    return {"type": geometry["type"], "coordinates": coords}
+
+
+def simplify_file(country, geojson_dir=GEOJSON_DIR, out_dir=SIMPLIFIED_DIR, tolerance=DEFAULT_TOLERANCE):
+    """
+    Writes <out_dir>/<country>.geojson, a simplified copy of the country's GeoJSON.
+
+    :return: Dict with "country", "bytes_before" and "bytes_after"
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    gj = load_geojson(country, geojson_dir)
+    simplified = dict(gj, features=[
+        dict(feature, geometry=simplify_geometry(feature.get("geometry"), tolerance))
+        for feature in gj["features"]
+    ])
+
+    out_path = os.path.join(out_dir, f"{country}.geojson")
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(simplified, f, separators=(",", ":"))
+    os.replace(tmp_path, out_path)
+    return {
+        "country": country,
+        "bytes_before": os.path.getsize(os.path.join(geojson_dir, f"{country}.geojson")),
+        "bytes_after": os.path.getsize(out_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write simplified display copies of the GeoJSON files.")
+    parser.add_argument("--geojson", default=GEOJSON_DIR, help="Directory of <country>.geojson files")
+    parser.add_argument("--out", default=SIMPLIFIED_DIR, help="Output directory")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Tolerance in degrees")
+    args = parser.parse_args()
+
+    for country in geojson_countries(args.geojson):
+        r = simplify_file(country, args.geojson, args.out, args.tolerance)
+        print(f"{country}: {r['bytes_before'] / 1024:,.0f} KB -> {r['bytes_after'] / 1024:,.0f} KB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
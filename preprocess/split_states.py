@@ -0,0 +1,162 @@
+# preprocess/split_states.py
+#
+# Splits GlobalLandTemperaturesByState.csv into one compact binary file per
+# country in a single streaming pass. Run from the repository root:
+#
+#     python -m preprocess.split_states
+#     python -m preprocess.split_states --source data/GlobalLandTemperaturesByState.csv \
+#         --out data/by_country_states --chunksize 200000
+#
+# The split files have no cartodb_ids yet, so by default the command then
+# runs the join of preprocess/join_cartodb.py, which writes the files the
+# app loads to data/by_country_temp/ (--no-join to skip it).
+#
+# Chunks are routed to per-country column files on disk as they are read,
+# so memory stays bounded by one chunk plus the largest single country
+# while the final .npz files are written. Unlike data_processing.py this
+# reads the source once instead of once per country.
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocess.join_cartodb import join_all
+from utils.profiling import peak_rss_mb
+from utils.state_data import STATE_DATA_DIR, country_file_stem, write_state_file
+
+SOURCE_CSV = "data/GlobalLandTemperaturesByState.csv"
+OUTPUT_DIR = "data/by_country_states"
+
+# (column name, dtype) of every per-row array spilled to disk
+SPILL_COLUMNS = (
+    ("state", np.int16),
+    ("year", np.int16),
+    ("month", np.int8),
+    ("temperature", np.float32),
+    ("uncertainty", np.float32),
+)
+
+
+class CountrySpill:
+    """Appends one country's rows to raw per-column files in a scratch directory."""
+
+    def __init__(self, country, scratch_dir):
+        self.country = country
+        self.dir = os.path.join(scratch_dir, country_file_stem(country))
+        os.makedirs(self.dir, exist_ok=True)
+        self.state_codes = {}
+        self.rows = 0
+
+    def append(self, group):
+        # Chunk-local codes mapped onto the codes of earlier chunks
+        local_codes, names = pd.factorize(group["State"])
+        mapping = np.array(
+            [self.state_codes.setdefault(name, len(self.state_codes)) for name in names], dtype=np.int16
+        )
+        codes = mapping[local_codes]
+
+        columns = {
+            "state": codes,
+            "year": group["year"].to_numpy(),
+            "month": group["month"].to_numpy(),
+            "temperature": group["AverageTemperature"].to_numpy(),
+            "uncertainty": group["AverageTemperatureUncertainty"].to_numpy(),
+        }
+        for name, dtype in SPILL_COLUMNS:
+            with open(os.path.join(self.dir, name), "ab") as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.rows += len(group)
+
+    def finish(self, out_dir):
+        arrays = {
+            name: np.fromfile(os.path.join(self.dir, name), dtype=dtype)
+            for name, dtype in SPILL_COLUMNS
+        }
+        states = sorted(self.state_codes, key=self.state_codes.get)
+        out_path = os.path.join(out_dir, f"{country_file_stem(self.country)}.npz")
+        write_state_file(out_path, self.country, states, **arrays)
+        shutil.rmtree(self.dir)
+        return out_path
+
+
+def split_states(source=SOURCE_CSV, out_dir=OUTPUT_DIR, chunksize=200_000, log=print):
+    """
+    Streams the state-level CSV once and writes <out_dir>/<country>.npz for
+    every country in it.
+
+    :param source: GlobalLandTemperaturesByState.csv
+    :param out_dir: Directory for the per-country binary files
+    :param chunksize: Rows read per chunk; bounds the memory used
+    :param log: Progress callback taking a string
+    :return: Dict with "rows", "seconds", "rows_per_second", "peak_rss_mb" and "files"
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    spills = {}
+    rows = 0
+
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".split-") as scratch:
+        reader = pd.read_csv(
+            source,
+            chunksize=chunksize,
+            usecols=["dt", "AverageTemperature", "AverageTemperatureUncertainty", "State", "Country"],
+            dtype={"AverageTemperature": np.float64, "AverageTemperatureUncertainty": np.float64},
+        )
+        for chunk in reader:
+            chunk = chunk.dropna(subset=["Country", "State"])
+            dt = pd.to_datetime(chunk["dt"], format="%Y-%m-%d")
+            chunk["year"] = dt.dt.year
+            chunk["month"] = dt.dt.month
+            for country, group in chunk.groupby("Country", sort=False):
+                if country not in spills:
+                    spills[country] = CountrySpill(country, scratch)
+                spills[country].append(group)
+            rows += len(chunk)
+            log(f"  {rows:>10,} rows read ({rows / (time.perf_counter() - start):,.0f} rows/s)")
+
+        files = []
+        for country, spill in sorted(spills.items()):
+            path = spill.finish(out_dir)
+            files.append(path)
+            log(f"Wrote {spill.rows} rows to {path}")
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else float("nan"),
+        "peak_rss_mb": peak_rss_mb(),
+        "files": files,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split state temperatures into per-country binary files.")
+    parser.add_argument("--source", default=SOURCE_CSV, help="State-level temperature CSV")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="Output directory")
+    parser.add_argument("--chunksize", type=int, default=200_000, help="Rows per chunk")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    parser.add_argument("--no-join", action="store_true",
+                        help=f"Don't join cartodb_ids into {STATE_DATA_DIR} (the app only loads joined files)")
+    args = parser.parse_args()
+    log = (lambda _: None) if args.quiet else print
+
+    result = split_states(args.source, args.out, args.chunksize, log=log)
+    print(
+        f"Split {result['rows']:,} rows into {len(result['files'])} countries in "
+        f"{result['seconds']:.1f}s ({result['rows_per_second']:,.0f} rows/s, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB)"
+    )
+    if not args.no_join:
+        joined = join_all(args.out, out_dir=STATE_DATA_DIR, log=log)
+        print(f"Joined {len(joined['results'])} countries into {STATE_DATA_DIR} in {joined['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# preprocess/warm_figure_cache.py
+#
+# Renders every single-year view of the temperature page (each year of the
+# choropleth and ranking tabs and of every regional map) into the on-disk
+# figure cache (utils/figure_cache.py). Resumable: views already cached for
+# the current data version are skipped. Run from the repository root:
+#
+#     python -m preprocess.warm_figure_cache
+#     python -m preprocess.warm_figure_cache --workers 4 --prune
+
+import argparse
+import sys
+import warnings
+
+from utils.figure_cache import format_report, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the temperature page's figures.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Rendering processes (1: render in this process)")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete the entries of older data versions")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    from pages import temperature
+
+    cache = temperature.figure_cache
+    if args.prune:
+        for path in cache.prune():
+            print(f"Removed {path}")
+    report = warm(cache, temperature.cacheable_views(), temperature.warm_view,
+                  workers=args.workers, processes=args.workers > 1)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# utils/animation.py
+
+import contextlib
+import os
+import threading
+import time
+
+from utils import metrics
+
+# Frames per second all animations of a worker process may request together
+MAX_FPS_ENV_VAR = "CLIMATE_ANIMATION_MAX_FPS"
+DEFAULT_MAX_FPS = 20
+
+DEFAULT_FRAME_MS = 1000
+MIN_FRAME_MS = 250
+MAX_FRAME_MS = 5000
+# Frames are never shown faster than this multiple of their server latency
+LATENCY_HEADROOM = 3.0
+# Most years one frame may advance when the animation is behind
+MAX_SKIP = 5
+
+
+class RateLimiter:
+    """Token bucket: `rate` acquisitions per second, bursts up to `rate`."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class AnimationScheduler:
+    """
+    Paces server-driven animations: the interval between frames follows the
+    measured latency of rendering a frame, frames skip years when the client
+    falls behind, and every animation of the process shares one frame rate
+    cap.
+    """
+
+    def __init__(self, max_fps=None, smoothing=0.2):
+        """
+        :param max_fps: Frame rate cap of the process, defaults to
+                        CLIMATE_ANIMATION_MAX_FPS or DEFAULT_MAX_FPS
+        :param smoothing: Weight of the newest sample in the latency average
+        """
+        if max_fps is None:
+            max_fps = float(os.environ.get(MAX_FPS_ENV_VAR) or DEFAULT_MAX_FPS)
+        self.limiter = RateLimiter(max_fps)
+        self.smoothing = smoothing
+        self.latency = None
+        self._lock = threading.Lock()
+
+    def record_latency(self, seconds):
+        """Adds one frame render time to the moving average."""
+        with self._lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.smoothing * (seconds - self.latency)
+
+    @contextlib.contextmanager
+    def timing(self, frame=True):
+        """
+        Context manager recording the duration of its block as a frame
+        latency, when the block renders an animation frame.
+
+        :param frame: False for renders that aren't animation frames
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if frame:
+                self.record_latency(time.perf_counter() - start)
+
+    def interval_ms(self, speed_ms=None):
+        """
+        Milliseconds between frames: the requested speed, slowed down to
+        LATENCY_HEADROOM times the measured frame latency.
+        """
+        interval = speed_ms or DEFAULT_FRAME_MS
+        if self.latency is not None:
+            interval = max(interval, LATENCY_HEADROOM * self.latency * 1000)
+        return int(min(MAX_FRAME_MS, max(MIN_FRAME_MS, interval)))
+
+    def next_frame(self, state, speed_ms=None, now=None):
+        """
+        Plans the frame for an interval tick of an animation.
+
+        :param state: Animation state with "frame_at" (epoch seconds of the
+                      previous frame) and "interval" (its interval in ms)
+        :param speed_ms: Requested milliseconds per frame
+        :return: (interval_ms, years to advance), or None when the process is
+                 over its frame rate cap and the tick should be skipped
+        """
+        if not self.limiter.try_acquire():
+            metrics.increment("animation.throttled")
+            return None
+        now = time.time() if now is None else now
+        interval = self.interval_ms(speed_ms)
+
+        step = 1
+        frame_at, previous = state.get("frame_at"), state.get("interval")
+        if frame_at is not None and previous:
+            # Ticks arriving late mean the client or server can't keep up:
+            # advance further instead of showing every year late
+            behind = (now - frame_at) * 1000 - previous
+            if behind >= previous:
+                step = min(MAX_SKIP, 1 + int(behind // previous))
+                metrics.increment("animation.skipped_years", step - 1)
+        metrics.increment("animation.frames")
+        return interval, step
+
+    def backoff_ms(self, state):
+        """Interval for an animation whose tick was throttled: twice as long."""
+        return int(min(MAX_FRAME_MS, 2 * (state.get("interval") or DEFAULT_FRAME_MS)))
@@ -0,0 +1,132 @@
+# utils/artifacts.py
+
+import glob
+import hashlib
+import json
+import os
+
+# Written by preprocess/pipeline.py next to the artifacts it describes
+MANIFEST_PATH = "data/pipeline_manifest.json"
+
+# Set CLIMATE_ALLOW_STALE_DATA=1 to start the app even when preprocessed
+# data is out of date
+ALLOW_STALE_ENV_VAR = "CLIMATE_ALLOW_STALE_DATA"
+
+_CHUNK_BYTES = 1 << 20
+
+
+class StaleArtifactsError(RuntimeError):
+    """Raised when preprocessed data no longer matches its inputs or code."""
+
+
+def expand(patterns):
+    """Sorted files matching any of the glob patterns (duplicates removed)."""
+    files = set()
+    for pattern in patterns:
+        files.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(files)
+
+
+def file_digest(path, cache=None):
+    """
+    SHA-256 of a file's content. With a cache (path -> {"size",
+    "mtime_ns", "sha256"}) a file whose size and mtime are unchanged is
+    not read again, so checking large inputs is cheap.
+    """
+    stat = os.stat(path)
+    key = path.replace(os.sep, "/")
+    entry = (cache or {}).get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    if cache is not None:
+        cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def fingerprint(patterns, cache=None):
+    """
+    One SHA-256 over the names and contents of every file matching the
+    patterns; changes when a file is edited, added or removed.
+    """
+    digest = hashlib.sha256()
+    for path in expand(patterns):
+        digest.update(path.replace(os.sep, "/").encode())
+        digest.update(file_digest(path, cache).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Parsed manifest, or None when the pipeline has never been run."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def step_staleness(entry, cache=None):
+    """
+    Why a recorded step is out of date, or None when it is current.
+
+    :param entry: The step's record in the manifest
+    :param cache: File digest cache (see file_digest)
+    :return: Reason as a string, or None
+    """
+    if not expand(entry["outputs"]):
+        return "outputs missing"
+    if fingerprint(entry["code"], cache) != entry["code_hash"]:
+        return "code changed"
+    if fingerprint(entry["inputs"], cache) != entry["input_hash"]:
+        return "inputs changed"
+    if fingerprint(entry["outputs"], cache) != entry["output_hash"]:
+        return "outputs modified"
+    return None
+
+
+def stale_steps(manifest):
+    """(step name, reason) of every out-of-date step in a manifest."""
+    cache = manifest.get("files", {})
+    stale = []
+    for name, entry in sorted(manifest["steps"].items()):
+        reason = step_staleness(entry, cache)
+        if reason:
+            stale.append((name, reason))
+    return stale
+
+
+def check_artifacts(path=MANIFEST_PATH):
+    """
+    Refuses to start against a stale artifact set. Trees without a
+    manifest (the committed CSVs only) are always accepted.
+
+    :param path: Manifest written by the pipeline
+    :raises StaleArtifactsError: When a step is out of date and
+        CLIMATE_ALLOW_STALE_DATA is not set
+    """
+    manifest = load_manifest(path)
+    if manifest is None:
+        return
+    stale = stale_steps(manifest)
+    if not stale:
+        return
+
+    details = "\n".join(f"  {name}: {reason}" for name, reason in stale)
+    message = (
+        f"Preprocessed data is out of date:\n{details}\n"
+        f"Run `python -m preprocess.pipeline` or set {ALLOW_STALE_ENV_VAR}=1 to start anyway."
+    )
+    if os.environ.get(ALLOW_STALE_ENV_VAR, "") not in ("", "0"):
+        print(f"Warning: {message}")
+        return
+    raise StaleArtifactsError(message)
@@ -0,0 +1,134 @@
+# utils/compaction.py
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Set CLIMATE_COMPACT_DATA=0 to keep the original pandas dtypes
+COMPACT_ENV_VAR = "CLIMATE_COMPACT_DATA"
+
+# Largest absolute change a float column may see when narrowed to float32.
+# Every value in the dashboard is displayed with at most two decimals.
+DEFAULT_TOLERANCE = 0.005
+
+# Object columns with fewer distinct values than this share of rows are
+# turned into categoricals even when not listed explicitly
+CATEGORY_RATIO = 0.5
+
+_reports = []
+
+
+def compaction_enabled():
+    return os.environ.get(COMPACT_ENV_VAR, "1") not in ("", "0")
+
+
+def float32_error(values):
+    """Largest absolute error of storing the values as float32 (0.0 without any value)."""
+    original = np.asarray(values, dtype=np.float64)
+    diff = np.abs(original.astype(np.float32).astype(np.float64) - original)
+    return float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+
+
+def _narrow_float(series, tolerance):
+    narrowed = series.astype(np.float32)
+    max_error = float32_error(series.to_numpy(dtype=np.float64))
+    if max_error > tolerance:
+        return series, max_error
+    return narrowed, max_error
+
+
+def compact_dataframe(df, name, categories=(), drop=(), tolerance=DEFAULT_TOLERANCE, register=True):
+    """
+    Returns a copy of df with narrower dtypes: float64 -> float32 (only when
+    every value stays within tolerance), integers -> smallest fitting int,
+    repeated strings -> categorical.
+
+    :param df: DataFrame to compact
+    :param name: Dataset name used in the memory report
+    :param categories: Columns that must become categorical
+    :param drop: Redundant columns to remove (e.g. a date already split into year/month)
+    :param tolerance: Largest absolute error allowed when narrowing floats
+    :param register: Whether to add the result to the memory report
+    :return: The compacted DataFrame
+    """
+    if not compaction_enabled():
+        return df
+
+    before = int(df.memory_usage(deep=True).sum())
+    compacted = df.drop(columns=list(drop))
+    changes = {col: {"from": str(df[col].dtype), "to": "dropped", "max_error": 0.0} for col in drop}
+
+    for col in compacted.columns:
+        series = compacted[col]
+        old_dtype = str(series.dtype)
+        max_error = 0.0
+
+        if pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            series, max_error = _narrow_float(series, tolerance)
+        elif pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast="integer")
+        elif series.dtype == object:
+            if col in categories or series.nunique() < CATEGORY_RATIO * max(len(series), 1):
+                series = series.astype("category")
+
+        if str(series.dtype) != old_dtype:
+            compacted[col] = series
+            changes[col] = {"from": old_dtype, "to": str(series.dtype), "max_error": max_error}
+        elif max_error > tolerance:
+            # Reported so a column silently staying wide is visible
+            changes[col] = {"from": old_dtype, "to": old_dtype, "max_error": max_error}
+
+    if register:
+        record_footprint(name, len(compacted), before, compacted.memory_usage(deep=True).sum(), changes)
+    return compacted
+
+
+def record_footprint(name, rows, before_bytes, after_bytes, changes=None):
+    """
+    Adds a dataset that was compacted into another representation (e.g. a
+    long frame turned into a matrix) to the memory report.
+    """
+    _reports.append({
+        "name": name,
+        "rows": rows,
+        "before_bytes": int(before_bytes),
+        "after_bytes": int(after_bytes),
+        "changes": changes or {},
+    })
+
+
+def memory_reports():
+    """Returns the before/after footprint of every registered dataset."""
+    return [dict(r) for r in _reports]
+
+
+def format_memory_report(reports=None):
+    """
+    Formats the registered datasets as a table of their memory footprint.
+
+    :param reports: Reports to format, defaults to every registered dataset
+    :return: The report as a string
+    """
+    reports = memory_reports() if reports is None else reports
+    lines = [f"{'Dataset':<34} {'Rows':>9} {'Before MB':>10} {'After MB':>9} {'Saved':>6}"]
+    lines.append("-" * len(lines[0]))
+    total_before = total_after = 0
+    for r in reports:
+        total_before += r["before_bytes"]
+        total_after += r["after_bytes"]
+        saved = 1 - r["after_bytes"] / r["before_bytes"] if r["before_bytes"] else 0
+        lines.append(
+            f"{r['name'][:34]:<34} {r['rows']:>9} {r['before_bytes'] / 1024 ** 2:>10.1f} "
+            f"{r['after_bytes'] / 1024 ** 2:>9.1f} {saved:>6.0%}"
+        )
+        for col, change in r["changes"].items():
+            error = f" (max error {change['max_error']:.2g})" if change["max_error"] else ""
+            lines.append(f"    {col}: {change['from']} -> {change['to']}{error}")
+    lines.append("-" * len(lines[0]))
+    saved = 1 - total_after / total_before if total_before else 0
+    lines.append(
+        f"{'Total':<34} {'':>9} {total_before / 1024 ** 2:>10.1f} "
+        f"{total_after / 1024 ** 2:>9.1f} {saved:>6.0%}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,159 @@
+# utils/compression.py
+
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+# CLIMATE_COMPRESSION: comma-separated encodings in order of preference
+# ("br,gzip" by default), "0" to turn compression off
+COMPRESSION_ENV_VAR = "CLIMATE_COMPRESSION"
+LEVEL_ENV_VAR = "CLIMATE_COMPRESSION_LEVEL"
+MIN_BYTES_ENV_VAR = "CLIMATE_COMPRESSION_MIN_BYTES"
+
+DEFAULT_ENCODINGS = ("br", "gzip")
+# gzip 6 / brotli 5 compress figure JSON about as well as the maximum
+# levels at a fraction of the CPU
+DEFAULT_LEVELS = {"gzip": 6, "br": 5}
+# Below this, headers and CPU outweigh the savings
+DEFAULT_MIN_BYTES = 1024
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+    "image/svg+xml",
+}
+
+# Compressed bodies of fingerprinted, long-cached responses (the Dash
+# component bundles), so plotly.min.js is not recompressed per page load
+_STATIC_CACHE_SIZE = 64
+_static_cache = OrderedDict()
+# Request threads share the cache; bodies are compressed outside the lock
+_static_cache_lock = threading.Lock()
+
+
+def compress_bytes(data, encoding, level=None):
+    """
+    Compresses data with "gzip" or "br" (brotli must be installed).
+
+    :param level: gzip 1-9 (higher is capped) / brotli 0-11, defaults to DEFAULT_LEVELS
+    """
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def configured_encodings():
+    """Encodings enabled by CLIMATE_COMPRESSION that can be produced here."""
+    value = os.environ.get(COMPRESSION_ENV_VAR, ",".join(DEFAULT_ENCODINGS)).strip()
+    if value in ("", "0"):
+        return ()
+    encodings = tuple(e.strip() for e in value.split(",") if e.strip())
+    return tuple(e for e in encodings if e in DEFAULT_LEVELS and (e != "br" or brotli is not None))
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, "")
+    return int(value) if value.strip() else default
+
+
+def _is_static(response):
+    return "max-age" in (response.headers.get("Cache-Control") or "") and request.method == "GET"
+
+
+def _compressed(response, encoding, level):
+    if not _is_static(response):
+        return compress_bytes(response.get_data(), encoding, level)
+    key = (request.full_path, encoding, level)
+    with _static_cache_lock:
+        body = _static_cache.get(key)
+        if body is not None:
+            _static_cache.move_to_end(key)
+    if body is not None:
+        metrics.increment("compression.static_cache_hits")
+        return body
+
+    body = compress_bytes(response.get_data(), encoding, level)
+    with _static_cache_lock:
+        _static_cache[key] = body
+        if len(_static_cache) > _STATIC_CACHE_SIZE:
+            _static_cache.popitem(last=False)
+    return body
+
+
+def register_compression(server, encodings=None, level=None, min_bytes=None):
+    """
+    Compresses the Flask server's responses (callback payloads, layout,
+    index page and component bundles) with the best encoding the client
+    accepts.
+
+    :param server: Flask server of the Dash app
+    :param encodings: Encodings in order of preference, defaults to CLIMATE_COMPRESSION
+    :param level: Compression level for every encoding, defaults to
+                  CLIMATE_COMPRESSION_LEVEL or DEFAULT_LEVELS
+    :param min_bytes: Smallest body worth compressing, defaults to
+                      CLIMATE_COMPRESSION_MIN_BYTES or DEFAULT_MIN_BYTES
+    :return: The after_request hook, or None when compression is off
+    """
+    encodings = configured_encodings() if encodings is None else tuple(encodings)
+    level = _env_int(LEVEL_ENV_VAR, None) if level is None else level
+    min_bytes = _env_int(MIN_BYTES_ENV_VAR, DEFAULT_MIN_BYTES) if min_bytes is None else min_bytes
+    if not encodings:
+        return None
+
+    @server.after_request
+    def compress_response(response):
+        if (
+            response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or "Content-Encoding" in response.headers
+            or response.is_streamed
+        ):
+            return response
+        encoding = next((e for e in encodings if request.accept_encodings[e]), None)
+        if encoding is None:
+            return response
+
+        # File responses stream from disk unless asked for their data
+        response.direct_passthrough = False
+        size = response.content_length or len(response.get_data())
+        if size < min_bytes:
+            return response
+        try:
+            body = _compressed(response, encoding, level)
+        except (OSError, ValueError, zlib.error):
+            return response
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        # The compressed body is a different representation
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        metrics.increment("compression.responses")
+        metrics.increment(f"compression.responses.{encoding}")
+        metrics.increment("compression.bytes_in", size)
+        metrics.increment("compression.bytes_out", len(body))
+        metrics.increment("compression.bytes_saved", size - len(body))
+        return response
+
+    return compress_response
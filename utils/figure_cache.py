@@ -0,0 +1,206 @@
+# utils/figure_cache.py
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from plotly.io.json import to_json_plotly
+
+from utils import metrics
+from utils.artifacts import fingerprint
+from utils.offload import in_pool_worker
+
+FIGURE_CACHE_DIR = "data/figure_cache"
+# Set CLIMATE_FIGURE_CACHE=0 to build every figure instead of reading the cache
+CACHE_ENV_VAR = "CLIMATE_FIGURE_CACHE"
+# Threads warming the cache in the background after boot (0 / unset: off)
+WARM_ENV_VAR = "CLIMATE_WARM_FIGURE_CACHE"
+
+# Content digests of the version inputs by size/mtime, so boot doesn't rehash
+_DIGESTS_FILE = "digests.json"
+
+
+def figure_cache_enabled():
+    return os.environ.get(CACHE_ENV_VAR, "1") not in ("", "0")
+
+
+class FigureCache:
+    """
+    Rendered callback outputs of one page on disk, one JSON file per view.
+    Entries live in a directory named after the data version: a hash of
+    the data files and code the figures are built from, so editing either
+    starts an empty cache instead of serving stale figures.
+    """
+
+    def __init__(self, name, inputs, cache_dir=FIGURE_CACHE_DIR):
+        """
+        :param name: Page name, the cache's subdirectory
+        :param inputs: Glob patterns of the files the figures depend on
+        :param cache_dir: Root directory of all figure caches
+        """
+        self.name = name
+        self.inputs = inputs
+        self.cache_dir = cache_dir
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return os.path.join(self.cache_dir, self.name)
+
+    @property
+    def version(self):
+        """Data version the entries are keyed by (computed once per process)."""
+        with self._lock:
+            if self._version is None:
+                digests_path = os.path.join(self.root, _DIGESTS_FILE)
+                try:
+                    with open(digests_path) as f:
+                        digests = json.load(f)
+                except (OSError, ValueError):
+                    digests = {}
+                self._version = fingerprint(self.inputs, digests)[:16]
+                os.makedirs(self.root, exist_ok=True)
+                tmp = f"{digests_path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(digests, f, indent=1, sort_keys=True)
+                os.replace(tmp, digests_path)
+            return self._version
+
+    def path(self, view):
+        """File of a view, given as a tuple of path parts, e.g. ("scatter", "_", 2000)."""
+        *dirs, last = [str(part) for part in view]
+        return os.path.join(self.root, self.version, *dirs, f"{last}.json")
+
+    def get(self, view):
+        """Cached outputs of a view as decoded JSON, None on a miss."""
+        try:
+            with open(self.path(view)) as f:
+                outputs = json.load(f)
+        except (OSError, ValueError):
+            metrics.increment(f"figure_cache.{self.name}.misses")
+            return None
+        metrics.increment(f"figure_cache.{self.name}.hits")
+        return outputs
+
+    def put(self, view, outputs):
+        """
+        Stores a view's outputs (figures and components are JSON-encoded
+        like Dash does). The write is atomic, so readers and an interrupted
+        warm-up never see a partial file.
+
+        :return: Size of the entry in bytes
+        """
+        path = self.path(view)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = to_json_plotly(outputs).encode()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def __contains__(self, view):
+        return os.path.exists(self.path(view))
+
+    def size(self):
+        """(entries, bytes) of the current version."""
+        entries, total = 0, 0
+        for dirpath, _, files in os.walk(os.path.join(self.root, self.version)):
+            for name in files:
+                if name.endswith(".json"):
+                    entries += 1
+                    total += os.path.getsize(os.path.join(dirpath, name))
+        return entries, total
+
+    def prune(self):
+        """Deletes the entries of every other data version, returns their directories."""
+        removed = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name != self.version:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed.append(entry.path)
+        return removed
+
+
+def warm(cache, views, render, workers=1, processes=False, log=print, log_failure=None):
+    """
+    Renders every view missing from the cache. Resumable: views already
+    cached are skipped, so an interrupted run continues where it stopped.
+
+    :param cache: FigureCache to fill
+    :param views: Views to cache (tuples, see FigureCache.path)
+    :param render: function(view) -> bytes stored, 0 when the view can't be
+                   cached; module-level when processes=True
+    :param workers: Parallel renders
+    :param processes: Render in a process pool instead of threads
+    :param log: Progress callback taking a string
+    :param log_failure: Callback for renders that raised, defaults to log
+    :return: Report dict (views, cached before, built, not cacheable,
+             failed, seconds, build seconds, bytes)
+    """
+    log_failure = log_failure or log
+    start = time.perf_counter()
+    views = list(views)
+    todo = [view for view in views if view not in cache]
+    report = {"views": len(views), "cached_before": len(views) - len(todo),
+              "built": 0, "not_cacheable": 0, "failed": 0, "build_seconds": 0.0}
+    log(f"{cache.name}: {len(todo)} of {len(views)} views to render (version {cache.version})")
+
+    pool = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=max(1, workers))
+    with pool:
+        renders = pool.map(_timed_render, [render] * len(todo), todo)
+        for i, (view, (size, seconds, error)) in enumerate(zip(todo, renders), 1):
+            report["build_seconds"] += seconds
+            if error is not None:
+                report["failed"] += 1
+                log_failure(f"{cache.name}: rendering {view} failed: {error}")
+            else:
+                report["built" if size else "not_cacheable"] += 1
+            if i % 100 == 0:
+                log(f"{cache.name}: {i}/{len(todo)} rendered")
+
+    report["seconds"] = time.perf_counter() - start
+    report["entries"], report["bytes"] = cache.size()
+    return report
+
+
+def _timed_render(render, view):
+    """(bytes stored, seconds, repr of the exception or None) of one render."""
+    start = time.perf_counter()
+    try:
+        size, error = render(view), None
+    except Exception as e:
+        size, error = 0, repr(e)
+    return size, time.perf_counter() - start, error
+
+
+def format_report(report):
+    return (f"{report['views']} views: {report['cached_before']} already cached, "
+            f"{report['built']} built, {report['not_cacheable']} not cacheable, {report['failed']} failed; "
+            f"{report['seconds']:.1f}s wall, {report['build_seconds']:.1f}s rendering; "
+            f"{report['entries']} entries, {report['bytes'] / 1e6:.1f} MB")
+
+
+def start_background_warm(cache, views, render, workers=None):
+    """
+    Warms the cache in a daemon thread after boot when
+    CLIMATE_WARM_FIGURE_CACHE is set to a number of threads. Not in the
+    processes of the offload pool, which re-run the main script.
+
+    :return: The thread, or None when warming is off
+    """
+    workers = int(os.environ.get(WARM_ENV_VAR) or 0) if workers is None else workers
+    if workers <= 0 or not figure_cache_enabled() or in_pool_worker():
+        return None
+
+    def run():
+        report = warm(cache, views, render, workers=workers, log=lambda _: None, log_failure=print)
+        print(f"Figure cache warm-up ({cache.name}): {format_report(report)}")
+
+    thread = threading.Thread(target=run, name=f"warm-{cache.name}", daemon=True)
+    thread.start()
+    return thread
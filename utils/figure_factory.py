@@ -0,0 +1,82 @@
+# utils/figure_factory.py
+
+import os
+import threading
+
+import numpy as np
+from _plotly_utils.utils import to_typed_array_spec
+
+from utils.typed_arrays import narrow_array, typed_arrays_enabled
+
+# Set CLIMATE_FAST_FIGURES=0 to build every figure with Plotly Express
+FAST_FIGURES_ENV_VAR = "CLIMATE_FAST_FIGURES"
+
+
+def fast_figures_enabled():
+    return os.environ.get(FAST_FIGURES_ENV_VAR, "1") not in ("", "0")
+
+
+def data_array(values):
+    """
+    Per-point values the way a Figure serializes them: numeric arrays as
+    base64 typed array specs (narrowed like compact_figure() unless
+    CLIMATE_TYPED_ARRAYS=0), other values as NumPy arrays.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iuf":
+        return to_typed_array_spec(narrow_array(arr) if typed_arrays_enabled() else arr)
+    return arr
+
+
+class FigureTemplate:
+    """
+    A figure compiled once into its JSON dict, with named slots for the
+    values that change between builds (data arrays, title, axis ranges).
+    render() copies only the dicts and lists on the way to each slot, so
+    a figure costs a few dict copies instead of a Plotly Express build
+    and the validation of every property. Rendered figures share all
+    other values with the template and must not be modified.
+    """
+
+    def __init__(self, build, slots):
+        """
+        :param build: function() -> go.Figure, the prototype, built on first use;
+                      its values in the slots are replaced by every render
+        :param slots: Path of each slot by name, e.g. {"z": "data.0.z"}
+        """
+        self.build = build
+        self.slots = {name: [int(k) if k.isdigit() else k for k in path.split(".")]
+                      for name, path in slots.items()}
+        self._figure = None
+        self._lock = threading.Lock()
+
+    @property
+    def figure(self):
+        """The compiled prototype (a dict)."""
+        with self._lock:
+            if self._figure is None:
+                self._figure = self.build().to_plotly_json()
+            return self._figure
+
+    def render(self, arrays=(), **values):
+        """
+        :param arrays: Names of the slots holding per-point data, passed through data_array()
+        :param values: Value of every slot
+        :return: Figure dict, which Dash, the figure cache and Patch accept like a Figure
+        """
+        missing = self.slots.keys() - values.keys()
+        if missing:
+            raise ValueError(f"No value for the slots {sorted(missing)}")
+        figure = dict(self.figure)
+        copies = {id(figure)}
+        for name, value in values.items():
+            *parents, last = self.slots[name]
+            node = figure
+            for key in parents:
+                child = node[key]
+                if id(child) not in copies:
+                    child = node[key] = child.copy()
+                    copies.add(id(child))
+                node = child
+            node[last] = data_array(value) if name in arrays else value
+        return figure
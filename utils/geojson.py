@@ -0,0 +1,42 @@
+# utils/geojson.py
+
+import json
+import os
+
+GEOJSON_DIR = "data/geojson"
+
+# Display copies written by preprocess/simplify_geometry.py
+SIMPLIFIED_DIR = "data/geojson_simplified"
+
+# Feature properties that may hold a region's display name, in order of
+# preference
+NAME_FIELDS = ["name", "NAME", "state", "STATE", "province", "PROVINCE"]
+
+
+def geojson_countries(geojson_dir=GEOJSON_DIR):
+    """Sorted file stems of every country with a regional GeoJSON file."""
+    return sorted(
+        os.path.splitext(f)[0] for f in os.listdir(geojson_dir) if f.endswith(".geojson")
+    )
+
+
+def load_geojson(country, geojson_dir=GEOJSON_DIR):
+    """Parses data/geojson/<country>.geojson."""
+    with open(os.path.join(geojson_dir, f"{country}.geojson"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def display_geojson_path(country, geojson_dir=GEOJSON_DIR, simplified_dir=SIMPLIFIED_DIR):
+    """Path of the simplified GeoJSON of a country when preprocessing wrote one, the original otherwise."""
+    simplified = os.path.join(simplified_dir, f"{country}.geojson")
+    if os.path.exists(simplified):
+        return simplified
+    return os.path.join(geojson_dir, f"{country}.geojson")
+
+
+def feature_name(properties):
+    """Display name of a feature, or None when no name field is present."""
+    for field in NAME_FIELDS:
+        if field in properties:
+            return properties[field]
+    return None
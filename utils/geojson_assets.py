@@ -0,0 +1,74 @@
+# utils/geojson_assets.py
+
+import hashlib
+from functools import lru_cache
+from urllib.parse import quote
+
+from flask import Response, abort, request
+
+from utils.compression import brotli, compress_bytes
+from utils.geojson import display_geojson_path, geojson_countries
+
+# Figures reference /geojson/<fingerprint>/<country>.geojson; the
+# fingerprint changes with the content, so responses can be cached forever
+GEOJSON_ROUTE = "/geojson"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@lru_cache(maxsize=None)
+def geojson_asset(country):
+    """
+    A country's display GeoJSON with its content fingerprint and
+    pre-compressed variants, read and compressed once per process.
+
+    :return: Dict with "fingerprint" and the bytes per content encoding
+             ("identity", "gzip" and, when brotli is installed, "br")
+    """
+    with open(display_geojson_path(country), "rb") as f:
+        data = f.read()
+    asset = {
+        "fingerprint": hashlib.sha256(data).hexdigest()[:16],
+        "identity": data,
+        "gzip": compress_bytes(data, "gzip", 9),
+    }
+    if brotli is not None:
+        asset["br"] = compress_bytes(data, "br", 11)
+    return asset
+
+
+def geojson_url(country):
+    """URL figures use as `geojson`, so the browser fetches each geometry once."""
+    return f"{GEOJSON_ROUTE}/{geojson_asset(country)['fingerprint']}/{quote(country)}.geojson"
+
+
+def _pick_encoding(asset):
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in asset and accepted[encoding]:
+            return encoding
+    return "identity"
+
+
+def register_geojson_route(server):
+    """Adds the fingerprinted GeoJSON route to the Flask server behind the Dash app."""
+
+    @server.route(f"{GEOJSON_ROUTE}/<fingerprint>/<country>.geojson")
+    def serve_geojson(fingerprint, country):
+        if country not in geojson_countries():
+            abort(404)
+        asset = geojson_asset(country)
+        # Old fingerprints are not cached, the page asks for the new URL
+        if fingerprint != asset["fingerprint"]:
+            abort(404)
+
+        etag = f'"{asset["fingerprint"]}"'
+        headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag, "Vary": "Accept-Encoding"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=headers)
+
+        encoding = _pick_encoding(asset)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset[encoding], mimetype="application/geo+json", headers=headers)
+
+    return serve_geojson
@@ -0,0 +1,97 @@
+# utils/insight_tables.py
+
+import numpy as np
+import pandas as pd
+
+from utils.profiling import startup_step
+from utils.readonly import freeze
+
+
+class YearInsightTable:
+    """
+    Every per-year summary the temperature page shows, computed for all
+    years in one vectorized pass: annual means per label, the global mean,
+    the coldest/hottest label and the full ranking of labels by temperature.
+
+    Years are columns offset from `first_year`; labels are the rows of the
+    matrix the table was built from.
+    """
+
+    def __init__(self, matrix):
+        self.labels = matrix.labels
+        self.label_col = matrix.label_col
+        self.value_col = matrix.value_col
+        self.first_year = matrix.start_year
+        self.min_year = matrix.min_year
+        self.max_year = matrix.max_year
+
+        # (labels x years)
+        self.means = matrix.annual_means()
+        self.present = matrix.annual_presence()
+        valid = self.present & ~np.isnan(self.means)
+        self.counts = valid.sum(axis=0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.global_mean = np.where(
+                self.counts > 0, np.where(valid, self.means, 0.0).sum(axis=0) / self.counts, np.nan
+            )
+
+        # First occurrence of the extreme, like idxmin/idxmax on the frame
+        has_data = self.counts > 0
+        self.coldest = np.full(len(has_data), -1, dtype=np.int16)
+        self.hottest = np.full(len(has_data), -1, dtype=np.int16)
+        self.coldest[has_data] = np.nanargmin(np.where(valid, self.means, np.nan)[:, has_data], axis=0)
+        self.hottest[has_data] = np.nanargmax(np.where(valid, self.means, np.nan)[:, has_data], axis=0)
+
+        # (years x labels) label indices from coldest to hottest; labels
+        # without a value sort last (as NaN does in sort_values) and absent
+        # labels are dropped by ranked_frame()
+        ranking_keys = np.where(valid, self.means, np.inf).T
+        self.ranking = np.argsort(ranking_keys, axis=1, kind="stable").astype(np.int16)
+
+    def _column(self, year):
+        if not self.min_year <= year <= self.max_year:
+            return None
+        return year - self.first_year
+
+    def summary(self, year):
+        """
+        Global mean and coldest/hottest label for one year.
+
+        :return: Dict with "global_avg" (NaN without data) and "coldest"/"hottest"
+                 as {label_col: name, value_col: temperature} (None without data)
+        """
+        col = self._column(year)
+        if col is None or self.counts[col] == 0:
+            return {"global_avg": float("nan"), "coldest": None, "hottest": None}
+
+        def entry(row):
+            return {self.label_col: self.labels[row], self.value_col: self.means[row, col]}
+
+        return {
+            "global_avg": self.global_mean[col],
+            "coldest": entry(self.coldest[col]),
+            "hottest": entry(self.hottest[col]),
+        }
+
+    def year_frame(self, year):
+        """Labels present in `year` with their annual mean, in label order."""
+        col = self._column(year)
+        if col is None:
+            return pd.DataFrame({self.label_col: [], self.value_col: []})
+        rows = np.flatnonzero(self.present[:, col])
+        return pd.DataFrame({self.label_col: self.labels[rows], self.value_col: self.means[rows, col]})
+
+    def ranked_frame(self, year):
+        """Labels present in `year` sorted from coldest to hottest (missing values last)."""
+        col = self._column(year)
+        if col is None:
+            return pd.DataFrame({self.label_col: [], self.value_col: []})
+        order = self.ranking[col]
+        rows = order[self.present[order, col]]
+        return pd.DataFrame({self.label_col: self.labels[rows], self.value_col: self.means[rows, col]})
+
+
+def build_insight_table(matrix):
+    with startup_step("insight tables: all years"):
+        return freeze(YearInsightTable(matrix), "insight table")
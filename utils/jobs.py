@@ -0,0 +1,243 @@
+# utils/jobs.py
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from utils import metrics
+
+# Threads running background jobs in each worker process (0: no background
+# jobs, callbacks render heavy views inline)
+JOB_WORKERS_ENV_VAR = "CLIMATE_BACKGROUND_WORKERS"
+DEFAULT_JOB_WORKERS = 2
+# Directory of job status files and results, shared by the worker
+# processes of a host so a poll can land on any of them
+JOBS_DIR_ENV_VAR = "CLIMATE_JOBS_DIR"
+
+# Jobs whose result nobody collected are deleted after this long
+JOB_TTL = 600.0
+
+_local = threading.local()
+_managers = []
+
+
+class JobCancelled(Exception):
+    """The job was cancelled: its session changed view or left the page."""
+
+
+def report_progress(fraction, message=""):
+    """
+    Records the progress of the running background job, and raises
+    JobCancelled when it has been cancelled. Render code calls it between
+    expensive steps; outside a job it does nothing.
+
+    :param fraction: Share of the job done, 0 to 1
+    :param message: What the job is doing, shown next to the progress bar
+    """
+    job = getattr(_local, "job", None)
+    if job is not None:
+        manager, job_id = job
+        manager._progress(job_id, fraction, message)
+
+
+def in_job():
+    """True in the thread running a background job, where report_progress() applies."""
+    return getattr(_local, "job", None) is not None
+
+
+def cancel_session(session):
+    """Cancels the running job of a session in every JobManager, e.g. on navigation."""
+    for manager in _managers:
+        manager.cancel_session(session)
+
+
+class JobManager:
+    """
+    Runs slow renders in a bounded pool of background threads, so the
+    request that started one returns at once and the page polls for it.
+    Status, progress and results are files, so any worker process of the
+    host can answer the polls and cancel a job. A session (a browser tab,
+    see request_sequencing.session_id) has at most one job: submitting
+    another cancels it.
+
+    Counters: jobs.submitted, .done, .failed and .cancelled.
+    """
+
+    def __init__(self, name, workers=None, jobs_dir=None):
+        """
+        :param name: Name of the job queue, its subdirectory
+        :param workers: Threads running jobs, defaults to CLIMATE_BACKGROUND_WORKERS
+        :param jobs_dir: Directory of all job queues, defaults to
+                         CLIMATE_JOBS_DIR or climate_jobs in the temp directory
+        """
+        if workers is None:
+            workers = int(os.environ.get(JOB_WORKERS_ENV_VAR) or DEFAULT_JOB_WORKERS)
+        jobs_dir = jobs_dir or os.environ.get(JOBS_DIR_ENV_VAR) or os.path.join(tempfile.gettempdir(), "climate_jobs")
+        self.name = name
+        self.workers = workers
+        self.root = os.path.join(jobs_dir, name)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._last_prune = 0.0
+        _managers.append(self)
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.root, f"{job_id}.{suffix}")
+
+    def _session_path(self, session):
+        return os.path.join(self.root, f"session-{hashlib.sha256(session.encode()).hexdigest()[:16]}")
+
+    def _write(self, path, data, mode="w"):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, mode) as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _set_status(self, job_id, state, progress, message=""):
+        status = {"state": state, "progress": progress, "message": message, "updated": time.time()}
+        self._write(self._path(job_id, "json"), json.dumps(status))
+
+    def submit(self, session, func, *args):
+        """
+        Queues func(*args) as the session's job, cancelling its previous one.
+
+        :param session: Session id (None: the job can't be cancelled by session)
+        :return: Job id
+        """
+        os.makedirs(self.root, exist_ok=True)
+        self._prune()
+        if session is not None:
+            self.cancel_session(session)
+        job_id = uuid.uuid4().hex
+        self._set_status(job_id, "queued", 0.0, "Queued")
+        if session is not None:
+            self._write(self._session_path(session), job_id)
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix=f"jobs-{self.name}")
+            future = self._futures[job_id] = self._pool.submit(self._run, job_id, func, args)
+        future.add_done_callback(lambda _: self._forget(job_id))
+        metrics.increment("jobs.submitted")
+        return job_id
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id, func, args):
+        try:
+            self._progress(job_id, 0.0, "Starting")
+            _local.job = (self, job_id)
+            try:
+                result = func(*args)
+            finally:
+                _local.job = None
+        except JobCancelled:
+            self._set_status(job_id, "cancelled", 0.0)
+            metrics.increment("jobs.cancelled")
+            return
+        except Exception as e:
+            self._set_status(job_id, "failed", 0.0, str(e))
+            metrics.increment("jobs.failed")
+            return
+        self._write(self._path(job_id, "pkl"), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), "wb")
+        self._set_status(job_id, "done", 1.0, "Done")
+        metrics.increment("jobs.done")
+
+    def _progress(self, job_id, fraction, message):
+        if os.path.exists(self._path(job_id, "cancel")):
+            raise JobCancelled()
+        self._set_status(job_id, "running", fraction, message)
+
+    def wait(self, job_id, timeout):
+        """
+        Waits up to `timeout` seconds for a job started by this process.
+
+        :return: True when the job has finished (in any state)
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            status = self.status(job_id)
+            return status is not None and status["state"] not in ("queued", "running")
+        try:
+            future.result(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def status(self, job_id):
+        """Status dict of a job ("state", "progress", "message"), None when unknown."""
+        try:
+            with open(self._path(job_id, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def collect(self, job_id):
+        """Result of a finished job; its files are deleted."""
+        with open(self._path(job_id, "pkl"), "rb") as f:
+            result = pickle.load(f)
+        self.discard(job_id)
+        return result
+
+    def discard(self, job_id):
+        """Deletes the files of a finished job."""
+        for suffix in ("json", "pkl", "cancel"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except OSError:
+                pass
+
+    def cancel(self, job_id):
+        """
+        Cancels a job: a queued one doesn't start, a running one stops at
+        its next report_progress() call, from any worker process.
+        """
+        status = self.status(job_id)
+        if status is None or status["state"] not in ("queued", "running"):
+            return
+        self._write(self._path(job_id, "cancel"), "")
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._set_status(job_id, "cancelled", 0.0)
+            metrics.increment("jobs.cancelled")
+
+    def cancel_session(self, session):
+        """Cancels the job a session submitted last, if it is still queued or running."""
+        if session is None:
+            return
+        try:
+            with open(self._session_path(session)) as f:
+                job_id = f.read()
+            os.remove(self._session_path(session))
+        except OSError:
+            return
+        self.cancel(job_id)
+
+    def _prune(self):
+        """Deletes files of jobs older than JOB_TTL, at most once a minute per process."""
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try:
+                    if now - entry.stat().st_mtime > JOB_TTL:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
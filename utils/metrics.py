@@ -0,0 +1,55 @@
+# utils/metrics.py
+
+import json
+import threading
+
+from flask import Response
+
+# Served as JSON by register_metrics_route()
+METRICS_ROUTE = "/_metrics"
+
+_lock = threading.Lock()
+_counters = {}
+
+
+def increment(name, value=1):
+    """Adds value to a named counter (created at 0), thread-safe."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counter(name):
+    """Current value of a counter, 0 when it was never incremented."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def counters(prefix=""):
+    """Snapshot of every counter whose name starts with prefix."""
+    with _lock:
+        return {k: v for k, v in sorted(_counters.items()) if k.startswith(prefix)}
+
+
+def reset(prefix=""):
+    """Zeroes the counters whose name starts with prefix (all by default)."""
+    with _lock:
+        for name in [k for k in _counters if k.startswith(prefix)]:
+            del _counters[name]
+
+
+def format_metrics(prefix=""):
+    """Counters as aligned "name value" lines."""
+    snapshot = counters(prefix)
+    width = max((len(k) for k in snapshot), default=0)
+    return "\n".join(f"{k:<{width}} {v:>14,}" for k, v in snapshot.items())
+
+
+def register_metrics_route(server):
+    """Adds a JSON dump of every counter at /_metrics to the Flask server."""
+
+    @server.route(METRICS_ROUTE)
+    def serve_metrics():
+        return Response(json.dumps(counters()), mimetype="application/json",
+                        headers={"Cache-Control": "no-store"})
+
+    return serve_metrics
@@ -0,0 +1,118 @@
+# utils/offload.py
+
+import functools
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.graph_objects as go
+
+from utils.typed_arrays import compact_figure, typed_arrays_enabled
+
+# Processes building figures for offloaded callbacks (0 / unset: build in
+# the calling thread)
+PROCESS_POOL_ENV_VAR = "CLIMATE_PROCESS_POOL"
+
+# Imported by the fork server before it forks the pool's processes, so
+# they share one copy of the datasets these modules load (copy-on-write)
+PRELOAD_MODULES = ["pages.temperature", "pages.emissions", "pages.correlation"]
+
+# Set in the fork server's environment, so the pool's processes see it
+# from the start: they re-run the parent's main script before they run
+# anything else, and its side effects check in_pool_worker()
+POOL_WORKER_ENV_VAR = "CLIMATE_POOL_WORKER"
+
+_functions = {}
+_lock = threading.Lock()
+_pool = None
+
+
+def in_pool_worker():
+    """True in the fork server and the pool's processes."""
+    return os.environ.get(POOL_WORKER_ENV_VAR) == "1"
+
+
+def pool_size():
+    return 0 if in_pool_worker() else int(os.environ.get(PROCESS_POOL_ENV_VAR) or 0)
+
+
+def _mark_worker():
+    os.environ[POOL_WORKER_ENV_VAR] = "1"
+
+
+def get_pool():
+    """
+    The process pool, started on first use and kept for the life of the process.
+
+    Like with the "spawn" start method, every process of the pool imports
+    the parent's main script as __mp_main__ before it runs a call, so a
+    script serving the app must start the server under
+    `if __name__ == "__main__":` (index.py does). Startup side effects,
+    such as the figure cache warm-up, are skipped when in_pool_worker().
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            # A fork server instead of fork: forking a threaded server can
+            # copy locks held by other threads into the children
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            # Started with the variable set, which the pool's processes
+            # inherit; it's only in this process's environment meanwhile
+            os.environ[POOL_WORKER_ENV_VAR] = "1"
+            try:
+                multiprocessing.forkserver.ensure_running()
+            finally:
+                del os.environ[POOL_WORKER_ENV_VAR]
+            _pool = ProcessPoolExecutor(pool_size(), mp_context=context, initializer=_mark_worker)
+        return _pool
+
+
+def serialize_outputs(result):
+    """
+    Callback outputs with every Figure turned into its JSON-ready dict
+    (compacted to typed arrays first), which pickles without re-validating.
+    """
+    def serialize(value):
+        if isinstance(value, go.Figure):
+            if typed_arrays_enabled():
+                compact_figure(value)
+            return value.to_plotly_json()
+        return value
+
+    if isinstance(result, tuple):
+        return tuple(serialize(value) for value in result)
+    return serialize(result)
+
+
+def _call(name, args, kwargs):
+    return serialize_outputs(_functions[name](*args, **kwargs))
+
+
+def offloaded(when=None):
+    """
+    Decorator for the CPU-bound part of a callback: with
+    CLIMATE_PROCESS_POOL set, calls run in a persistent process pool
+    instead of holding the GIL of the worker's threads. Figures in the
+    result come back as dicts, which Dash and the figure cache accept
+    like Figures.
+
+    :param when: function(*args, **kwargs) -> bool selecting the calls to
+                 offload (default: all), e.g. only the heavy view of a callback
+    """
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        _functions[name] = func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if pool_size() <= 0 or (when is not None and not when(*args, **kwargs)):
+                return func(*args, **kwargs)
+            return get_pool().submit(_call, name, args, kwargs).result()
+
+        return wrapper
+
+    return decorator
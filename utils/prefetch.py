@@ -0,0 +1,158 @@
+# utils/prefetch.py
+
+import os
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
+
+from utils import metrics
+
+# Years ahead of the shown one rendered into the figure cache (0: off)
+PREFETCH_YEARS_ENV_VAR = "CLIMATE_PREFETCH_YEARS"
+DEFAULT_PREFETCH_YEARS = 3
+
+# Niceness of the prefetch threads (Linux schedules threads individually)
+PREFETCH_NICENESS = 10
+
+
+def _lower_priority():
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class Prefetcher:
+    """
+    Renders the views a session is likely to ask for next into a
+    FigureCache, on low-priority background threads. Every session has one
+    set of wanted views: scheduling a new set cancels the queued views the
+    session no longer wants (unless another session wants them too).
+
+    Counters: prefetch.scheduled, .cancelled, .built, .already_cached,
+    .joined (a request waited for a running prefetch) and .hits (a request
+    was served a view the prefetcher built); hits / built is the share of
+    prefetched views that were used.
+    """
+
+    def __init__(self, cache, render, workers=1, years=None):
+        """
+        :param cache: FigureCache the views are rendered into
+        :param render: function(view) -> bytes stored, e.g. a page's warm_view
+        :param workers: Prefetch threads
+        :param years: Years to prefetch ahead, defaults to CLIMATE_PREFETCH_YEARS
+        """
+        if years is None:
+            years = int(os.environ.get(PREFETCH_YEARS_ENV_VAR) or DEFAULT_PREFETCH_YEARS)
+        self.cache = cache
+        self.render = render
+        self.workers = workers
+        self.years = years
+        self._pool = None
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._wanted = {}
+        self._prefetched = set()
+
+    @property
+    def enabled(self):
+        return self.years > 0
+
+    def schedule(self, session, views):
+        """
+        Replaces the views prefetched for a session.
+
+        :param session: Session id (None: one shared session)
+        :param views: Views in priority order; [] cancels the session's prefetches
+        """
+        if not self.enabled:
+            return
+        views = [view for view in views if view not in self.cache]
+        with self._lock:
+            wanted = set(views)
+            for view in self._wanted.get(session, set()) - wanted:
+                self._release(session, view)
+            if not wanted:
+                self._wanted.pop(session, None)
+                return
+            self._wanted[session] = wanted
+            for view in views:
+                entry = self._pending.get(view)
+                if entry is None:
+                    if self._pool is None:
+                        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="prefetch",
+                                                        initializer=_lower_priority)
+                    future = self._pool.submit(self._run, view)
+                    entry = self._pending[view] = (future, set())
+                    future.add_done_callback(lambda _, view=view: self._done(view))
+                    metrics.increment("prefetch.scheduled")
+                entry[1].add(session)
+
+    def _release(self, session, view):
+        """Drops a session's interest in a view, cancels it when nobody else wants it."""
+        entry = self._pending.get(view)
+        if entry is None:
+            return
+        entry[1].discard(session)
+        if not entry[1] and entry[0].cancel():
+            metrics.increment("prefetch.cancelled")
+
+    def _done(self, view):
+        with self._lock:
+            entry = self._pending.pop(view, None)
+            for session in entry[1] if entry else ():
+                wanted = self._wanted.get(session)
+                if wanted is not None:
+                    wanted.discard(view)
+                    if not wanted:
+                        del self._wanted[session]
+
+    def _run(self, view):
+        if view in self.cache:
+            metrics.increment("prefetch.already_cached")
+            return
+        if self.render(view):
+            metrics.increment("prefetch.built")
+            with self._lock:
+                self._prefetched.add(view)
+
+    def wait(self, view, timeout=None):
+        """
+        Lets a request for a view that is being prefetched wait for it
+        instead of rendering it a second time. A view still queued is
+        cancelled: the request renders it right away instead.
+
+        :return: True when the prefetch of the view finished
+        """
+        with self._lock:
+            entry = self._pending.get(view)
+            if entry is None:
+                return False
+            future = entry[0]
+            if not future.running():
+                if future.cancel():
+                    metrics.increment("prefetch.cancelled")
+                return future.done() and not future.cancelled()
+        try:
+            future.result(timeout)
+        except (CancelledError, TimeoutError, Exception):
+            return False
+        metrics.increment("prefetch.joined")
+        return True
+
+    def join(self, timeout=None):
+        """Waits until every scheduled prefetch has finished or been cancelled."""
+        with self._lock:
+            futures = [future for future, _ in self._pending.values()]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except (CancelledError, TimeoutError, Exception):
+                pass
+
+    def served(self, view):
+        """Records that a request was served a view from the cache."""
+        with self._lock:
+            if view not in self._prefetched:
+                return
+            self._prefetched.discard(view)
+        metrics.increment("prefetch.hits")
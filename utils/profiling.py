@@ -0,0 +1,129 @@
+# utils/profiling.py
+
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Startup profiling is opt-in: tracing allocations slows the data loading
+# down noticeably, so normal boots only record wall time.
+PROFILE_ENV_VAR = "CLIMATE_PROFILE_STARTUP"
+
+_records = []
+_stack = []
+_memory_enabled = False
+
+
+def enable_memory_tracing():
+    """
+    Turns on allocation tracing for every step recorded from now on.
+    Must be called before the page modules are imported to be useful.
+    """
+    global _memory_enabled
+    _memory_enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def memory_tracing_enabled():
+    return _memory_enabled
+
+
+def startup_report_requested():
+    """True when the environment asks for a startup report at boot."""
+    return os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, NaN where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _current_rss_mb():
+    # /proc is only available on Linux; other platforms report no RSS.
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return float("nan")
+
+
+@contextmanager
+def startup_step(name):
+    """
+    Records wall time (and, when tracing is enabled, memory) for one
+    startup step. Steps may be nested; the report indents them.
+
+    :param name: Human readable label shown in the report
+    """
+    record = {"name": name, "depth": len(_stack), "seconds": 0.0,
+              "alloc_mb": None, "peak_mb": None, "rss_mb": None}
+    _records.append(record)
+    # Nested steps reset the tracemalloc peak, so each open step keeps the
+    # highest absolute peak seen by its children.
+    frame = {"child_peak": 0}
+    _stack.append(frame)
+
+    if _memory_enabled:
+        mem_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        _stack.pop()
+        if _memory_enabled:
+            mem_after, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame["child_peak"])
+            record["alloc_mb"] = (mem_after - mem_before) / 1024 ** 2
+            record["peak_mb"] = (peak - mem_before) / 1024 ** 2
+            record["rss_mb"] = _current_rss_mb()
+            if _stack:
+                _stack[-1]["child_peak"] = max(_stack[-1]["child_peak"], peak)
+
+
+def startup_records():
+    """Returns a copy of every recorded step, in the order they started."""
+    return [dict(r) for r in _records]
+
+
+def total_startup_seconds():
+    """Wall time of all top-level steps."""
+    return sum(r["seconds"] for r in _records if r["depth"] == 0)
+
+
+def format_startup_report(records=None):
+    """
+    Formats recorded steps as a fixed-width table.
+
+    :param records: Records to format, defaults to everything recorded so far
+    :return: The report as a string
+    """
+    records = startup_records() if records is None else records
+    lines = [f"{'Step':<58} {'Time (s)':>9} {'Alloc MB':>9} {'Peak MB':>9} {'RSS MB':>8}"]
+    lines.append("-" * len(lines[0]))
+    for r in records:
+        label = ("  " * r["depth"] + r["name"])[:58]
+        if r["alloc_mb"] is None:
+            mem = f"{'-':>9} {'-':>9} {'-':>8}"
+        else:
+            mem = f"{r['alloc_mb']:>9.1f} {r['peak_mb']:>9.1f} {r['rss_mb']:>8.0f}"
+        lines.append(f"{label:<58} {r['seconds']:>9.3f} {mem}")
+    lines.append("-" * len(lines[0]))
+    lines.append(f"{'Total':<58} {total_startup_seconds():>9.3f}")
+    return "\n".join(lines)
+
+
+# Pages import this module before loading any data, so tracing started here
+# covers every load step.
+if startup_report_requested():
+    enable_memory_tracing()
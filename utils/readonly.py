@@ -0,0 +1,108 @@
+# utils/readonly.py
+
+import os
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# Set CLIMATE_AUDIT_MUTATIONS=1 to check after every request that no
+# frozen dataset was modified, and to raise on pandas chained assignment
+AUDIT_ENV_VAR = "CLIMATE_AUDIT_MUTATIONS"
+
+_lock = threading.Lock()
+_datasets = {}
+
+
+class DatasetMutated(RuntimeError):
+    """A dataset shared by every thread of the process was modified."""
+
+
+def audit_enabled():
+    return os.environ.get(AUDIT_ENV_VAR, "") not in ("", "0")
+
+
+if audit_enabled():
+    # Assigning into a slice of a shared frame raises instead of warning
+    pd.set_option("mode.chained_assignment", "raise")
+
+
+def _buffers(values):
+    """NumPy buffers behind an array, Series or DataFrame (extension arrays included)."""
+    if isinstance(values, np.ndarray):
+        return [values]
+    if isinstance(values, pd.DataFrame):
+        # The block manager is internal API, but the only way to reach the
+        # arrays a frame holds without copying them
+        return [b for arr in values._mgr.arrays for b in _buffers(arr)] + _buffers(values.index)
+    if isinstance(values, (pd.Series, pd.Index)):
+        return _buffers(values.array)
+    inner = getattr(values, "_ndarray", None)
+    return [inner] if isinstance(inner, np.ndarray) else []
+
+
+def _members(obj):
+    """Array-like attributes of a dataset object (e.g. a TemperatureMatrix)."""
+    return {name: value for name, value in vars(obj).items()
+            if isinstance(value, (np.ndarray, pd.DataFrame, pd.Series))}
+
+
+def freeze(obj, name=None):
+    """
+    Makes a dataset shared across threads read-only: the NumPy buffers of
+    an array, Series or DataFrame, or of the array and frame attributes of
+    an object, become non-writeable, so writing values into them raises
+    ValueError (except object arrays, see below). Adding or replacing
+    columns and attributes isn't stopped by NumPy; with
+    CLIMATE_AUDIT_MUTATIONS=1 the dataset is registered and
+    check_datasets() detects those too.
+
+    :param name: Name of the dataset in audit errors
+    :return: The same object
+    """
+    values = [obj] if isinstance(obj, (np.ndarray, pd.DataFrame, pd.Series)) else _members(obj).values()
+    for value in values:
+        for buffer in _buffers(value):
+            # pandas' Cython string routines can't read read-only object
+            # arrays, so string columns stay writeable
+            if buffer.dtype.kind != "O":
+                buffer.flags.writeable = False
+    if audit_enabled():
+        name = name or type(obj).__name__
+        with _lock:
+            key = f"{name}#{id(obj)}"
+            _datasets[key] = (weakref.ref(obj, lambda _: _datasets.pop(key, None)), _signature(obj))
+    return obj
+
+
+def _signature(obj):
+    """What a mutation would change: shapes, columns, and the identity and flags of the buffers."""
+    if isinstance(obj, (np.ndarray, pd.DataFrame, pd.Series)):
+        columns = tuple(obj.columns) if isinstance(obj, pd.DataFrame) else None
+        buffers = tuple((id(b), b.flags.writeable) for b in _buffers(obj))
+        return obj.shape, columns, buffers
+    return {name: _signature(value) for name, value in _members(obj).items()}
+
+
+def check_datasets():
+    """Raises DatasetMutated when a dataset frozen in audit mode was modified since."""
+    with _lock:
+        datasets = list(_datasets.items())
+    for key, (ref, signature) in datasets:
+        obj = ref()
+        if obj is not None and _signature(obj) != signature:
+            raise DatasetMutated(f"{key.split('#')[0]} was modified after it was frozen")
+
+
+def register_mutation_audit(server):
+    """In audit mode, checks the frozen datasets after every request of the Flask server."""
+    if not audit_enabled():
+        return None
+
+    @server.after_request
+    def audit_datasets(response):
+        check_datasets()
+        return response
+
+    return audit_datasets
@@ -0,0 +1,75 @@
+# utils/regional_aggregates.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.readonly import freeze
+from utils.spatial import load_spatial_index
+from utils.state_data import STATE_DATA_DIR, load_state_frame, load_state_matrix
+
+
+class AreaWeightedTable:
+    """
+    Calendar-year temperatures of one country's states with area-weighted
+    national means for every year, so the weighted number is a lookup.
+
+    States are weighted by the spherical area of their GeoJSON feature;
+    states without a feature (or without data in a year) are left out of
+    that year's national mean.
+    """
+
+    def __init__(self, matrix, state_areas):
+        """
+        :param matrix: States x months TemperatureMatrix
+        :param state_areas: Area in km^2 of every matrix row, NaN for unmapped states
+        """
+        self.labels = matrix.labels
+        self.label_col = matrix.label_col
+        self.value_col = matrix.value_col
+        self.start_year = matrix.start_year
+        self.state_areas = state_areas
+
+        means = matrix.annual_means()
+        self.state_means = np.where(matrix.annual_presence(), means, np.nan)
+        weights = np.where(np.isnan(self.state_means), 0.0, np.nan_to_num(state_areas)[:, None])
+        total = weights.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.national = np.where(total > 0, (weights * np.nan_to_num(self.state_means)).sum(axis=0) / total, np.nan)
+            # Share of the mapped area that has data in each year
+            self.coverage = total / np.nansum(state_areas)
+
+    def _year_index(self, year):
+        i = year - self.start_year
+        return i if 0 <= i < len(self.national) else None
+
+    def national_mean(self, year):
+        """Area-weighted mean of the country in `year`, NaN without data."""
+        i = self._year_index(year)
+        return float(self.national[i]) if i is not None else float("nan")
+
+    def area_coverage(self, year):
+        """Share of the mapped area with data in `year` (0 to 1), NaN without mapped states."""
+        i = self._year_index(year)
+        return float(self.coverage[i]) if i is not None else float("nan")
+
+
+@lru_cache(maxsize=8)
+def load_area_weighted_table(country, data_dir=STATE_DATA_DIR):
+    """
+    AreaWeightedTable of a country's states. Areas come from the spatial
+    index (persisted by preprocessing), so no geometry is processed per
+    request. Cached per process.
+
+    :param country: Country file stem, e.g. "china"
+    """
+    matrix = load_state_matrix(country, data_dir)
+    frame = load_state_frame(country, data_dir)
+    state_ids = frame.groupby("State", observed=True)["cartodb_id"].first()
+
+    index = load_spatial_index(country)
+    areas_by_id = pd.Series(index.feature_areas, index=index.feature_ids)
+    areas_by_id = areas_by_id[~areas_by_id.index.duplicated()]
+    state_areas = state_ids.reindex(matrix.labels).map(areas_by_id).to_numpy(dtype=np.float64)
+    return freeze(AreaWeightedTable(matrix, state_areas), f"area-weighted table {country}")
@@ -0,0 +1,165 @@
+# utils/request_sequencing.py
+
+import functools
+import os
+import threading
+import time
+import uuid
+
+from dash import dcc
+from dash.exceptions import PreventUpdate
+from flask import has_request_context, request
+
+from utils import metrics
+
+# Set CLIMATE_DROP_SUPERSEDED=0 to run every queued request to completion
+SEQUENCING_ENV_VAR = "CLIMATE_DROP_SUPERSEDED"
+
+# Identifies a browser session, set on the first response without it.
+# Every tab of the browser sends the same cookie, so it's only the
+# fallback for callbacks that don't pass the page instance
+SESSION_COOKIE = "climate_session"
+
+# Store in the app layout holding an id per page load, so every browser
+# tab is its own session. Callbacks pass it as their last State.
+PAGE_INSTANCE_STORE = "page-instance"
+
+# Channels of sessions idle for longer than this are forgotten
+CHANNEL_IDLE_SECONDS = 600
+
+_registry_lock = threading.Lock()
+_channels = {}
+_last_prune = 0.0
+_local = threading.local()
+
+
+class Superseded(PreventUpdate):
+    """A newer request of the same page instance has arrived for the same callback."""
+
+
+class _Channel:
+    """Requests of one page instance (or session) for one callback, run one at a time."""
+
+    def __init__(self):
+        self.latest = 0
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+def sequencing_enabled():
+    return os.environ.get(SEQUENCING_ENV_VAR, "1") not in ("", "0")
+
+
+def register_session_cookie(server):
+    """Gives every browser session of the Flask server an id cookie."""
+
+    @server.after_request
+    def set_session_cookie(response):
+        if SESSION_COOKIE not in request.cookies:
+            response.set_cookie(SESSION_COOKIE, uuid.uuid4().hex, httponly=True, samesite="Lax")
+        return response
+
+    return set_session_cookie
+
+
+def page_instance_store():
+    """The page-instance store for the layout, with a new id (call it once per page load)."""
+    return dcc.Store(id=PAGE_INSTANCE_STORE, data=uuid.uuid4().hex)
+
+
+def _sent_page_instance():
+    """(True, id) when the current callback request passes the page-instance store as its last State."""
+    if not has_request_context():
+        return False, None
+    body = request.get_json(silent=True)
+    states = body.get("state") if isinstance(body, dict) else None
+    if states and isinstance(states[-1], dict) and states[-1].get("id") == PAGE_INSTANCE_STORE:
+        return True, states[-1].get("value")
+    return False, None
+
+
+def session_id():
+    """
+    Id of the browser tab making the current callback request: its page
+    instance when the callback passes the store, else the session cookie
+    shared by the browser's tabs. None outside requests.
+    """
+    if not has_request_context():
+        return None
+    return _sent_page_instance()[1] or request.cookies.get(SESSION_COOKIE)
+
+
+def _prune_channels(now):
+    global _last_prune
+    if now - _last_prune < 60:
+        return
+    _last_prune = now
+    for key in [k for k, c in _channels.items()
+                if now - c.last_used > CHANNEL_IDLE_SECONDS and not c.lock.locked()]:
+        del _channels[key]
+
+
+def _register(session, name):
+    """The channel of (session, callback) and the sequence number of this request."""
+    now = time.monotonic()
+    with _registry_lock:
+        _prune_channels(now)
+        channel = _channels.get((session, name))
+        if channel is None:
+            channel = _channels[(session, name)] = _Channel()
+        channel.latest += 1
+        channel.last_used = now
+        return channel, channel.latest
+
+
+def checkpoint():
+    """
+    Raises Superseded (a PreventUpdate, so Dash leaves the outputs alone)
+    when the running callback request has been superseded by a newer one
+    of the same page instance. Callbacks call it between expensive steps.
+    """
+    current = getattr(_local, "current", None)
+    if current is not None and current[0].latest != current[1]:
+        metrics.increment("sequencing.aborted")
+        raise Superseded()
+
+
+def sequenced(func):
+    """
+    Decorator for callbacks driven by sliders: requests of one browser tab
+    for the callback run one at a time, in arrival order. A request that a
+    newer one has superseded is dropped before it starts, aborted at the
+    next checkpoint() while it runs, and its result is discarded when it
+    finishes late. Only the newest request's result would be displayed.
+
+    The callback lists State(PAGE_INSTANCE_STORE, "data") last; its value
+    is taken off the arguments, so the function doesn't receive it.
+    Without it, requests are sequenced per session cookie, shared by all
+    tabs of a browser.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        sent, instance = _sent_page_instance()
+        if sent:
+            args = args[:-1]
+        session = instance or session_id()
+        if session is None or not sequencing_enabled():
+            return func(*args, **kwargs)
+
+        channel, sequence = _register(session, name)
+        metrics.increment("sequencing.requests")
+        with channel.lock:
+            if channel.latest != sequence:
+                metrics.increment("sequencing.dropped")
+                raise Superseded()
+            _local.current = (channel, sequence)
+            try:
+                result = func(*args, **kwargs)
+                checkpoint()
+                return result
+            finally:
+                _local.current = None
+
+    return wrapper
@@ -0,0 +1,155 @@
+# utils/single_flight.py
+
+import functools
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import metrics
+from utils.request_sequencing import Superseded
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; without it calls are coalesced per process
+    fcntl = None
+
+# Set CLIMATE_SINGLE_FLIGHT=0 to compute every callback invocation on its own
+SINGLE_FLIGHT_ENV_VAR = "CLIMATE_SINGLE_FLIGHT"
+# Directory shared by the worker processes of one host (e.g. gunicorn
+# workers); when set, identical calls are also coalesced across processes
+SHARED_DIR_ENV_VAR = "CLIMATE_SINGLE_FLIGHT_DIR"
+
+# A result written by another process is reused for calls that started
+# waiting on it, not kept as a cache: older results are recomputed
+SHARED_RESULT_TTL = 5.0
+
+_lock = threading.Lock()
+_in_flight = {}
+_last_prune = 0.0
+
+
+def single_flight_enabled():
+    return os.environ.get(SINGLE_FLIGHT_ENV_VAR, "1") not in ("", "0")
+
+
+def call_key(name, args, kwargs):
+    """Identifies a call by function name and JSON-encoded arguments."""
+    return json.dumps([name, args, kwargs], sort_keys=True, default=repr)
+
+
+def _read_recent(path):
+    try:
+        if time.time() - os.path.getmtime(path) > SHARED_RESULT_TTL:
+            return None
+        with open(path, "rb") as f:
+            return (pickle.load(f),)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_result(path, result):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # Unpicklable results are simply not shared
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _prune_results(directory):
+    """Deletes expired results, at most once per SHARED_RESULT_TTL per process."""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < SHARED_RESULT_TTL:
+        return
+    _last_prune = now
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.name.endswith(".pkl") and now - entry.stat().st_mtime > SHARED_RESULT_TTL:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _shared_call(directory, key, compute):
+    """
+    Runs compute() while holding a lock file for `key`, so other processes
+    making the same call wait and read the pickled result instead.
+    """
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    result_path = os.path.join(directory, f"{digest}.pkl")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{digest}.lock"), "a+b") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            shared = _read_recent(result_path)
+            if shared is not None:
+                metrics.increment("single_flight.shared")
+                return shared[0]
+            result = compute()
+            _write_result(result_path, result)
+            _prune_results(directory)
+            return result
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def single_flight(func):
+    """
+    Decorator for callbacks: concurrent calls with identical arguments
+    share one computation. The first call runs the function and every call
+    that arrives while it runs waits for and returns the same result (or
+    raises the same exception).
+
+    With CLIMATE_SINGLE_FLIGHT_DIR set, the running call also holds a lock
+    file there, so identical calls in other processes on the host wait
+    for its result too.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not single_flight_enabled():
+            return func(*args, **kwargs)
+        key = call_key(name, args, kwargs)
+
+        with _lock:
+            future = _in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = _in_flight[key] = Future()
+        metrics.increment("single_flight.calls")
+        if not leader:
+            metrics.increment("single_flight.coalesced")
+            metrics.increment(f"single_flight.coalesced.{name}")
+            try:
+                return future.result()
+            except Superseded:
+                # The leader's session moved on, this caller still wants the result
+                return wrapper(*args, **kwargs)
+
+        try:
+            directory = os.environ.get(SHARED_DIR_ENV_VAR)
+            if directory and fcntl is not None:
+                result = _shared_call(directory, key, lambda: func(*args, **kwargs))
+            else:
+                result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with _lock:
+                del _in_flight[key]
+
+    return wrapper
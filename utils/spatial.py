@@ -0,0 +1,343 @@
+# utils/spatial.py
+
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from utils.geojson import GEOJSON_DIR, feature_name, load_geojson
+from utils.readonly import freeze
+
+# Written by preprocess/build_spatial_index.py
+SPATIAL_INDEX_DIR = "data/spatial_index"
+
+# Children per R-tree node
+NODE_CAPACITY = 16
+
+# Mean Earth radius in km, for polygon areas
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _str_order(boxes, capacity):
+    """
+    Sort-Tile-Recursive packing of bounding boxes: sorts them into
+    vertical slices by x centre, then by y centre within a slice.
+
+    :param boxes: (n, 4) array of min_x, min_y, max_x, max_y
+    :param capacity: Boxes per node
+    :return: (permutation of the boxes, start of every node in that order)
+    """
+    n = len(boxes)
+    if not n:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    n_nodes = math.ceil(n / capacity)
+    slice_size = math.ceil(math.sqrt(n_nodes)) * capacity
+
+    by_x = np.argsort(cx, kind="stable")
+    perm, starts = [], []
+    for first in range(0, n, slice_size):
+        tile = by_x[first:first + slice_size]
+        perm.append(tile[np.argsort(cy[tile], kind="stable")])
+        starts.append(np.arange(first, first + len(tile), capacity))
+    return np.concatenate(perm), np.concatenate(starts)
+
+
+def ring_areas(coords, ring_offsets):
+    """
+    Spherical area in km^2 of every ring at once (Chamberlain & Duquette's
+    formula, as used by turf/d3), from concatenated lon/lat rings.
+
+    :param coords: (n, 2) lon/lat of every ring, each ring closed
+    :param ring_offsets: Start of every ring in coords, plus the total length
+    :return: Unsigned area of every ring
+    """
+    lon = np.radians(coords[:, 0])
+    sin_lat = np.sin(np.radians(coords[:, 1]))
+    # Shoelace over (lon, sin(lat)) of every edge; edges that would join
+    # two different rings are zeroed
+    terms = lon[1:] * sin_lat[:-1] - lon[:-1] * sin_lat[1:]
+    terms[ring_offsets[1:-1] - 1] = 0.0
+    terms = np.append(terms, 0.0)
+    starts = ring_offsets[:-1]
+    sums = np.add.reduceat(terms, starts) if len(starts) else np.zeros(0)
+    sums[ring_offsets[1:] - ring_offsets[:-1] < 4] = 0.0
+    return np.abs(sums) * EARTH_RADIUS_KM ** 2 / 2
+
+
+def _intersects(boxes, min_x, min_y, max_x, max_y):
+    return (boxes[:, 0] <= max_x) & (boxes[:, 2] >= min_x) & (boxes[:, 1] <= max_y) & (boxes[:, 3] >= min_y)
+
+
+def _ring_contains(ring, x, y):
+    """Even-odd ray casting of one point against one closed ring ((n, 2) array)."""
+    x1, y1 = ring[:-1, 0], ring[:-1, 1]
+    x2, y2 = ring[1:, 0], ring[1:, 1]
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(straddles & (x < cross_x)) % 2)
+
+
+def _rings_contain_many(rings, x, y):
+    """
+    Even-odd test of many points against the rings of one polygon at
+    once. With the points sorted by y, each edge is only paired with the
+    points inside its y-span, so the work grows with the number of
+    crossings instead of edges x points.
+
+    :param rings: List of closed (n, 2) rings (outer ring and holes)
+    :return: Boolean array, True for points inside
+    """
+    order = np.argsort(y, kind="stable")
+    sorted_y = y[order]
+    crossings = np.zeros(len(x), dtype=np.int64)
+    for ring in rings:
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        # Points with min(y1, y2) <= y < max(y1, y2), the same edges the
+        # scalar (y1 > y) != (y2 > y) test counts
+        lo = np.searchsorted(sorted_y, np.minimum(y1, y2), side="left")
+        hi = np.searchsorted(sorted_y, np.maximum(y1, y2), side="left")
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        edge = np.repeat(np.arange(len(x1)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        point = order[np.repeat(lo, counts) + offsets]
+        py = y[point]
+        cross_x = x1[edge] + (py - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+        crossings += np.bincount(point[x[point] < cross_x], minlength=len(x))
+    return crossings % 2 == 1
+
+
+class SpatialIndex:
+    """
+    STR-packed R-tree over the polygons of one GeoJSON, with the polygon
+    rings kept for exact point-in-polygon tests.
+
+    Entries are polygon parts (each polygon of a MultiPolygon is its own
+    entry, so islands don't inflate their feature's box). `levels` holds
+    the internal nodes bottom-up; node i of a level covers children
+    start[i]:end[i] of the level below (or of the entries).
+    """
+
+    def __init__(self, entry_boxes, entry_parts, levels, coords, ring_offsets, part_rings,
+                 part_feature, feature_ids, feature_names, feature_areas=None):
+        self.entry_boxes = entry_boxes
+        self.entry_parts = entry_parts
+        self.levels = levels
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.part_rings = part_rings
+        self.part_feature = part_feature
+        self.feature_ids = feature_ids
+        self.feature_names = feature_names
+        self.feature_areas = self.compute_feature_areas() if feature_areas is None else feature_areas
+
+    @classmethod
+    def from_geojson(cls, geojson, capacity=NODE_CAPACITY):
+        """
+        Builds the index of every Polygon / MultiPolygon feature.
+
+        :param geojson: Parsed GeoJSON FeatureCollection
+        :param capacity: Children per node
+        :return: SpatialIndex
+        """
+        rings, part_rings, part_feature = [], [0], []
+        feature_ids, feature_names = [], []
+        for i, feature in enumerate(geojson["features"]):
+            props = feature.get("properties") or {}
+            geometry = feature.get("geometry") or {}
+            feature_ids.append(props.get("cartodb_id", -1))
+            feature_names.append(feature_name(props) or "")
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            for polygon in polygons:
+                rings += [np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon]
+                part_rings.append(len(rings))
+                part_feature.append(i)
+
+        ring_offsets = np.concatenate([[0], np.cumsum([len(r) for r in rings], dtype=np.int64)])
+        coords = np.concatenate(rings) if rings else np.empty((0, 2))
+        part_rings = np.asarray(part_rings)
+        # A part's box is its outer ring's box
+        outer = [rings[r] for r in part_rings[:-1]]
+        part_boxes = np.array(
+            [[r[:, 0].min(), r[:, 1].min(), r[:, 0].max(), r[:, 1].max()] for r in outer]
+        ).reshape(-1, 4)
+
+        perm, starts = _str_order(part_boxes, capacity)
+        entry_boxes = part_boxes[perm]
+        level_boxes, levels = entry_boxes, []
+        if not len(entry_boxes):
+            # Without polygons the tree is a root without children
+            levels.append({"boxes": np.zeros((0, 4)), "start": starts, "end": starts})
+        while len(entry_boxes):
+            ends = np.append(starts[1:], len(level_boxes))
+            node_boxes = np.column_stack([
+                np.minimum.reduceat(level_boxes[:, 0], starts),
+                np.minimum.reduceat(level_boxes[:, 1], starts),
+                np.maximum.reduceat(level_boxes[:, 2], starts),
+                np.maximum.reduceat(level_boxes[:, 3], starts),
+            ])
+            if len(node_boxes) == 1:
+                levels.append({"boxes": node_boxes, "start": starts, "end": ends})
+                break
+            # Packing the next level fixes the order of this one
+            order, next_starts = _str_order(node_boxes, capacity)
+            levels.append({"boxes": node_boxes[order], "start": starts[order], "end": ends[order]})
+            level_boxes, starts = node_boxes[order], next_starts
+
+        return cls(
+            entry_boxes, perm, levels, coords, ring_offsets, part_rings,
+            np.asarray(part_feature, dtype=np.int32),
+            np.asarray(feature_ids, dtype=np.int32), np.asarray(feature_names, dtype=str),
+        )
+
+    def save(self, path):
+        """Writes the index to an .npz file (see load())."""
+        arrays = {
+            "entry_boxes": self.entry_boxes, "entry_parts": self.entry_parts,
+            "coords": self.coords, "ring_offsets": self.ring_offsets, "part_rings": self.part_rings,
+            "part_feature": self.part_feature, "feature_ids": self.feature_ids,
+            "feature_names": self.feature_names, "feature_areas": self.feature_areas,
+        }
+        for i, level in enumerate(self.levels):
+            for key, values in level.items():
+                arrays[f"level{i}_{key}"] = values
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by save()."""
+        with np.load(path, allow_pickle=False) as f:
+            n_levels = sum(1 for name in f.files if name.endswith("_boxes") and name.startswith("level"))
+            levels = [
+                {key: f[f"level{i}_{key}"] for key in ("boxes", "start", "end")} for i in range(n_levels)
+            ]
+            return cls(
+                f["entry_boxes"], f["entry_parts"], levels, f["coords"], f["ring_offsets"],
+                f["part_rings"], f["part_feature"], f["feature_ids"], f["feature_names"],
+                f["feature_areas"] if "feature_areas" in f.files else None,
+            )
+
+    def compute_feature_areas(self):
+        """Area of every feature in km^2: outer rings minus holes, summed over its polygons."""
+        areas = ring_areas(self.coords, self.ring_offsets)
+        # The first ring of every part is its outer ring, the rest are holes
+        signed = -areas
+        signed[self.part_rings[:-1]] *= -1
+        part_areas = np.add.reduceat(signed, self.part_rings[:-1]) if len(self.part_feature) else np.zeros(0)
+        return np.bincount(self.part_feature, weights=part_areas, minlength=len(self.feature_ids))
+
+    def _candidate_parts(self, min_x, min_y, max_x, max_y):
+        """Parts whose box intersects the query box, by walking the tree top-down."""
+        nodes = np.arange(len(self.levels[-1]["boxes"]))
+        for depth in range(len(self.levels) - 1, -1, -1):
+            level = self.levels[depth]
+            nodes = nodes[_intersects(level["boxes"][nodes], min_x, min_y, max_x, max_y)]
+            if not len(nodes):
+                return nodes
+            nodes = np.concatenate([np.arange(s, e) for s, e in zip(level["start"][nodes], level["end"][nodes])])
+        nodes = nodes[_intersects(self.entry_boxes[nodes], min_x, min_y, max_x, max_y)]
+        return self.entry_parts[nodes]
+
+    def part_contains(self, part, lon, lat):
+        """True when the point lies inside the part (holes excluded)."""
+        inside = False
+        for r in range(self.part_rings[part], self.part_rings[part + 1]):
+            ring = self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+            inside ^= _ring_contains(ring, lon, lat)
+        return inside
+
+    def locate(self, lon, lat):
+        """
+        Feature containing a point, e.g. to resolve a map click on the
+        server.
+
+        :return: Position of the feature in the GeoJSON, or -1 when none contains it
+        """
+        for part in self._candidate_parts(lon, lat, lon, lat):
+            if self.part_contains(part, lon, lat):
+                return int(self.part_feature[part])
+        return -1
+
+    def locate_many(self, lons, lats):
+        """
+        Vectorized locate() for many points, e.g. every row of a station
+        dataset. Points are pushed down the tree in batches, so each one
+        is only tested against the polygons whose boxes contain it.
+
+        :param lons: Longitudes
+        :param lats: Latitudes
+        :return: int32 array with the feature position of every point, -1 where none contains it
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(lons), -1, dtype=np.int32)
+        top = len(self.levels) - 1
+        stack = [(top, node, np.arange(len(lons))) for node in range(len(self.levels[top]["boxes"]))]
+        while stack:
+            depth, node, points = stack.pop()
+            level = self.levels[depth]
+            points = points[result[points] < 0]
+            box = level["boxes"][node:node + 1]
+            points = points[_intersects(box, lons[points], lats[points], lons[points], lats[points])]
+            if not len(points):
+                continue
+            if depth > 0:
+                stack += [(depth - 1, child, points) for child in range(level["start"][node], level["end"][node])]
+                continue
+            for entry in range(level["start"][node], level["end"][node]):
+                candidates = points[result[points] < 0]
+                box = self.entry_boxes[entry:entry + 1]
+                candidates = candidates[_intersects(box, lons[candidates], lats[candidates],
+                                                    lons[candidates], lats[candidates])]
+                if not len(candidates):
+                    continue
+                part = self.entry_parts[entry]
+                rings = [self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+                         for r in range(self.part_rings[part], self.part_rings[part + 1])]
+                inside = _rings_contain_many(rings, lons[candidates], lats[candidates])
+                result[candidates[inside]] = self.part_feature[part]
+        return result
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Features with a polygon whose bounding box intersects the viewport,
+        e.g. to render only visible regions. Conservative: a feature may
+        be returned when only its box, not its outline, reaches the viewport.
+
+        :return: Sorted positions of the features in the GeoJSON
+        """
+        parts = self._candidate_parts(min_lon, min_lat, max_lon, max_lat)
+        return np.unique(self.part_feature[parts])
+
+
+def index_path(country, index_dir=SPATIAL_INDEX_DIR):
+    return os.path.join(index_dir, f"{country}.npz")
+
+
+@lru_cache(maxsize=8)
+def load_spatial_index(country, index_dir=SPATIAL_INDEX_DIR, geojson_dir=GEOJSON_DIR):
+    """
+    Spatial index of a country's GeoJSON: the persisted one when
+    preprocessing wrote it, otherwise built from the GeoJSON. Cached per
+    process.
+    """
+    path = index_path(country, index_dir)
+    if os.path.exists(path):
+        index = SpatialIndex.load(path)
+    else:
+        index = SpatialIndex.from_geojson(load_geojson(country, geojson_dir))
+    return freeze(index, f"spatial index {country}")
@@ -0,0 +1,133 @@
+# utils/state_data.py
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import compact_dataframe
+from utils.readonly import freeze
+from utils.temperature_matrix import TemperatureMatrix
+
+STATE_DATA_DIR = "data/by_country_temp"
+
+# Marks a state without a GeoJSON feature in the binary files
+NO_CARTODB_ID = -1
+
+# Arrays stored in every per-country .npz file. Rows are monthly
+# measurements; "states" and "cartodb_id" are per state and indexed by
+# the row's "state" code.
+STATE_FILE_ARRAYS = (
+    "country", "states", "cartodb_id",
+    "state", "year", "month", "temperature", "uncertainty",
+)
+
+
+def country_file_stem(country):
+    """
+    File name (without extension) used for a country everywhere under
+    data/: lower case, anything but letters, digits, spaces, '_' and '-'
+    replaced by '_' (e.g. "United States" -> "united states").
+    """
+    safe = "".join(ch if ch.isalnum() or ch in " _-" else "_" for ch in country)
+    return safe.strip().lower()
+
+
+def write_state_file(path, country, states, state, year, month, temperature, uncertainty,
+                     cartodb_id=None):
+    """
+    Writes one country's monthly state temperatures in the compact binary
+    format the app loads (an uncompressed .npz of narrow typed arrays).
+
+    :param path: Output path, should end in .npz
+    :param country: Country name as written in the source data
+    :param states: State names; row codes index into this
+    :param state: Per-row state code
+    :param year: Per-row year
+    :param month: Per-row month (1-12)
+    :param temperature: Per-row average temperature
+    :param uncertainty: Per-row temperature uncertainty
+    :param cartodb_id: Per-state GeoJSON feature id, NO_CARTODB_ID when unmatched
+    """
+    if cartodb_id is None:
+        cartodb_id = np.full(len(states), NO_CARTODB_ID)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        country=np.array(country),
+        states=np.asarray(states, dtype=str),
+        cartodb_id=np.asarray(cartodb_id, dtype=np.int32),
+        state=np.asarray(state, dtype=np.int16),
+        year=np.asarray(year, dtype=np.int16),
+        month=np.asarray(month, dtype=np.int8),
+        temperature=np.asarray(temperature, dtype=np.float32),
+        uncertainty=np.asarray(uncertainty, dtype=np.float32),
+    )
+    # Readers never see a half-written file
+    os.replace(tmp_path, path)
+
+
+def read_state_file(path):
+    """Reads a file written by write_state_file() into a dict of arrays."""
+    with np.load(path, allow_pickle=False) as f:
+        return {name: f[name] for name in STATE_FILE_ARRAYS}
+
+
+def state_arrays_to_frame(arrays):
+    """
+    Expands the binary arrays into the long frame the regional view uses:
+    State, Country, year, month, AverageTemperature,
+    AverageTemperatureUncertainty and cartodb_id (float with NaN when
+    some states are unmatched, integer otherwise).
+    """
+    codes = arrays["state"]
+    cartodb_id = arrays["cartodb_id"]
+    unmatched = cartodb_id == NO_CARTODB_ID
+    # Integer ids like the CSV unless some states need NaN
+    if unmatched.any():
+        cartodb_id = cartodb_id.astype(np.float32)
+        cartodb_id[unmatched] = np.nan
+    return pd.DataFrame({
+        "AverageTemperature": arrays["temperature"],
+        "AverageTemperatureUncertainty": arrays["uncertainty"],
+        "State": pd.Categorical.from_codes(codes, categories=arrays["states"]),
+        "Country": pd.Categorical.from_codes(
+            np.zeros(len(codes), dtype=np.int8), categories=[str(arrays["country"])]
+        ),
+        "cartodb_id": cartodb_id[codes],
+        "year": arrays["year"],
+        "month": arrays["month"],
+    })
+
+
+@lru_cache(maxsize=8)
+def load_state_frame(country, data_dir=STATE_DATA_DIR):
+    """
+    Monthly state temperatures of one country, from the binary file when
+    preprocessing produced one and from the legacy CSV otherwise. Cached
+    per process and read-only (see utils/readonly.py).
+
+    :param country: Country file stem, e.g. "china" or "united states"
+    :param data_dir: Directory holding <country>.npz / <country>.csv
+    :return: DataFrame as described in state_arrays_to_frame()
+    """
+    npz_path = os.path.join(data_dir, f"{country}.npz")
+    if os.path.exists(npz_path):
+        return freeze(state_arrays_to_frame(read_state_file(npz_path)), f"state frame {country}")
+
+    df = pd.read_csv(os.path.join(data_dir, f"{country}.csv"))
+    dt = pd.to_datetime(df["dt"])
+    df["year"] = dt.dt.year
+    df["month"] = dt.dt.month
+    df = compact_dataframe(
+        df, f"{country} states", categories=["State", "Country"], drop=["dt"], register=False
+    )
+    return freeze(df, f"state frame {country}")
+
+
+@lru_cache(maxsize=8)
+def load_state_matrix(country, data_dir=STATE_DATA_DIR):
+    """States x months TemperatureMatrix of one country (see load_state_frame)."""
+    matrix = TemperatureMatrix.from_frame(load_state_frame(country, data_dir), label_col="State")
+    return freeze(matrix.build_prefix_sums(), f"state matrix {country}")
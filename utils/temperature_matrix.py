@@ -0,0 +1,249 @@
+# utils/temperature_matrix.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import float32_error, record_footprint
+from utils.profiling import startup_step
+from utils.readonly import freeze
+
+# Month 0 of every matrix is January of this year (the country data starts
+# in November 1743)
+BASE_YEAR = 1743
+
+# The source CSVs record temperatures with three decimals. Rounding the
+# float32 cells back to that precision recovers the exact float64 values
+# pandas parsed, so displayed means don't move.
+SOURCE_DECIMALS = 3
+
+
+class TemperatureMatrix:
+    """
+    Monthly temperatures as a dense (labels x months) float32 matrix.
+
+    Row i holds the series for labels[i]; column j is month j counted from
+    January of start_year. `observed` marks cells that had a row in the
+    source data (the value itself may still be NaN), which is what decides
+    whether a label shows up for a year at all.
+    """
+
+    def __init__(self, values, observed, labels, start_year=BASE_YEAR,
+                 label_col="Country", value_col="AverageTemperature", decimals=SOURCE_DECIMALS):
+        self.values = values
+        self.observed = observed
+        self.labels = labels
+        self.start_year = start_year
+        self.label_col = label_col
+        self.value_col = value_col
+        self.decimals = decimals
+        self._rows = {label: i for i, label in enumerate(labels)}
+        self._prefix_sums = None
+        self._prefix_counts = None
+
+        years_observed = observed.reshape(len(labels), -1, 12).any(axis=(0, 2))
+        first, last = np.flatnonzero(years_observed)[[0, -1]]
+        self.min_year = start_year + int(first)
+        self.max_year = start_year + int(last)
+
+    @classmethod
+    def from_frame(cls, df, label_col="Country", value_col="AverageTemperature", start_year=BASE_YEAR):
+        """
+        Builds the matrix from a long frame with year and month columns.
+
+        :param df: DataFrame with label_col, value_col, "year" and "month"
+        :param label_col: Column holding the row labels (Country or State)
+        :param value_col: Column holding the temperatures
+        :param start_year: Year of the first matrix column
+        :return: TemperatureMatrix
+        """
+        codes, labels = pd.factorize(df[label_col], sort=True)
+        months = ((df["year"].to_numpy(np.int32) - start_year) * 12
+                  + df["month"].to_numpy(np.int32) - 1)
+        if (months < 0).any():
+            raise ValueError(f"Data starts before {start_year}")
+
+        # Whole years only, so year slices never run off the end
+        n_months = (int(months.max()) // 12 + 1) * 12
+        values = np.full((len(labels), n_months), np.nan, dtype=np.float32)
+        observed = np.zeros((len(labels), n_months), dtype=bool)
+        values[codes, months] = df[value_col].to_numpy(np.float32)
+        observed[codes, months] = True
+
+        return cls(values, observed, np.asarray(labels, dtype=object), start_year, label_col, value_col)
+
+    @property
+    def nbytes(self):
+        total = self.values.nbytes + self.observed.nbytes + self.labels.nbytes
+        if self._prefix_sums is not None:
+            total += self._prefix_sums.nbytes + self._prefix_counts.nbytes
+        return total
+
+    @property
+    def years(self):
+        return np.arange(self.start_year, self.start_year + self.values.shape[1] // 12)
+
+    def month_index(self, year, month=1):
+        """Column of the given month."""
+        return (year - self.start_year) * 12 + month - 1
+
+    def row(self, label):
+        """Row of the given label; raises KeyError for unknown labels."""
+        return self._rows[label]
+
+    def year_slice(self, year):
+        """(labels x 12) view of one calendar year."""
+        start = self.month_index(year)
+        return self.values[:, start:start + 12]
+
+    def country_series(self, label):
+        """1-D view of every month for one label."""
+        return self.values[self.row(label)]
+
+    def as_float64(self, values):
+        """Upcasts float32 cells back to the values parsed from the source."""
+        values = values.astype(np.float64)
+        if self.decimals is not None:
+            np.round(values, self.decimals, out=values)
+        return values
+
+    def range_mean(self, start_month, end_month):
+        """
+        Mean of every label over months [start_month, end_month] (column
+        indices, inclusive), skipping NaNs. Labels without any value in
+        the window get NaN.
+        """
+        window = self.as_float64(self.values[:, start_month:end_month + 1])
+        sums, counts = _kahan_sum(window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def build_prefix_sums(self):
+        """
+        Precomputes running sums and counts of every row (with a leading
+        zero column), after which any window mean is two lookups per label.
+        """
+        values = self.as_float64(self.values)
+        valid = ~np.isnan(values)
+        n_labels, n_months = values.shape
+        self._prefix_sums = np.zeros((n_labels, n_months + 1))
+        self._prefix_counts = np.zeros((n_labels, n_months + 1), dtype=np.int32)
+        np.cumsum(np.where(valid, values, 0.0), axis=1, out=self._prefix_sums[:, 1:])
+        np.cumsum(valid, axis=1, out=self._prefix_counts[:, 1:])
+        return self
+
+    def window_mean(self, start_month, end_month):
+        """
+        Mean of every label over months [start_month, end_month] (column
+        indices, inclusive) from the prefix sums, in O(1) per label. The
+        window is clipped to the matrix; labels without values get NaN.
+        """
+        if self._prefix_sums is None:
+            self.build_prefix_sums()
+        n_months = self.values.shape[1]
+        start = min(max(start_month, 0), n_months)
+        end = min(max(end_month + 1, start), n_months)
+        sums = self._prefix_sums[:, end] - self._prefix_sums[:, start]
+        counts = self._prefix_counts[:, end] - self._prefix_counts[:, start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def period_mean(self, start_year, end_year):
+        """Per-label mean of every month from start_year to end_year, inclusive."""
+        return self.window_mean(self.month_index(start_year), self.month_index(end_year, 12))
+
+    def year_means(self, year):
+        """Per-label mean of one calendar year (same as groupby(label, year).mean())."""
+        start = self.month_index(year)
+        return self.range_mean(start, start + 11)
+
+    def annual_means(self):
+        """
+        (labels x years) matrix of calendar-year means for every year at
+        once, computed exactly like year_means().
+        """
+        n_labels = len(self.labels)
+        by_year = self.as_float64(self.values.reshape(-1, 12))
+        sums, counts = _kahan_sum(by_year)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return means.reshape(n_labels, -1)
+
+    def annual_presence(self):
+        """(labels x years) mask of labels with at least one row in each year."""
+        return self.observed.reshape(len(self.labels), -1, 12).any(axis=2)
+
+    def present_in_year(self, year):
+        """Boolean mask of labels with at least one row in that year."""
+        start = self.month_index(year)
+        return self.observed[:, start:start + 12].any(axis=1)
+
+    def year_frame(self, year):
+        """
+        Labels present in `year` with their annual mean, as a small
+        DataFrame shaped like one year of the old (label, year) groupby.
+        """
+        if not self.min_year <= year <= self.max_year:
+            return pd.DataFrame({self.label_col: [], self.value_col: []})
+        present = self.present_in_year(year)
+        return pd.DataFrame({
+            self.label_col: self.labels[present],
+            self.value_col: self.year_means(year)[present],
+        })
+
+    def global_yearly_means(self):
+        """
+        Mean over every value of every label per year (same as
+        groupby("year").mean() on the long frame), for years with data.
+        """
+        # (years x values) in the order the long frame lists them
+        by_year = self.values.reshape(len(self.labels), -1, 12).transpose(1, 0, 2)
+        sums, counts = _kahan_sum(self.as_float64(by_year.reshape(by_year.shape[0], -1)))
+        has_rows = self.observed.reshape(len(self.labels), -1, 12).any(axis=(0, 2))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return pd.DataFrame({"year": self.years[has_rows], self.value_col: means[has_rows]})
+
+
+def _kahan_sum(values):
+    """
+    Row-wise NaN-skipping sum and count of a 2-D float64 array, adding the
+    columns left to right with Kahan compensation like pandas' groupby
+    mean, so results match the long-frame groupby bit for bit.
+    """
+    sums = np.zeros(values.shape[0])
+    comp = np.zeros(values.shape[0])
+    counts = np.zeros(values.shape[0], dtype=np.int64)
+    for column in values.T:
+        valid = ~np.isnan(column)
+        y = np.where(valid, column - comp, 0.0)
+        t = sums + y
+        comp = np.where(valid, (t - sums) - y, comp)
+        sums = np.where(valid, t, sums)
+        counts += valid
+    return sums, counts
+
+
+@lru_cache(maxsize=None)
+def load_country_matrix(path="data/GlobalLandTemperaturesByCountry.csv"):
+    """
+    Loads the country temperature CSV once per process as a
+    TemperatureMatrix. The long frame is discarded after the matrix is built.
+    """
+    with startup_step("country matrix: read CSV"):
+        df = pd.read_csv(path)
+    with startup_step("country matrix: parse dates"):
+        dt = pd.to_datetime(df["dt"])
+        df["year"] = dt.dt.year
+        df["month"] = dt.dt.month
+    with startup_step("country matrix: build matrix"):
+        matrix = TemperatureMatrix.from_frame(df)
+    with startup_step("country matrix: prefix sums"):
+        matrix.build_prefix_sums()
+    record_footprint(
+        "country temperatures", len(df), df.memory_usage(deep=True).sum(), matrix.nbytes,
+        {"long frame": {"from": "DataFrame", "to": "float32 matrix",
+                        "max_error": float32_error(df[matrix.value_col])}},
+    )
+    return freeze(matrix, "country matrix")
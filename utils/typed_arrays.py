@@ -0,0 +1,117 @@
+# utils/typed_arrays.py
+
+import functools
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from _plotly_utils.utils import to_typed_array_spec
+
+from utils.compaction import DEFAULT_TOLERANCE
+
+# Set CLIMATE_TYPED_ARRAYS=0 to send figure data as plain JSON numbers
+TYPED_ARRAYS_ENV_VAR = "CLIMATE_TYPED_ARRAYS"
+
+# Trace properties holding per-point data. Plotly serializes NumPy arrays
+# in them as base64 typed arrays ({"dtype": ..., "bdata": ...}), which
+# plotly.js decodes without parsing one JSON number per point.
+ARRAY_PROPERTIES = (
+    "x", "y", "z", "lat", "lon", "values", "customdata",
+    "marker.color", "marker.size",
+)
+
+_INT_TYPES = (np.int8, np.int16, np.int32)
+
+# orjson (when installed) encodes figures several times faster than the
+# json module; plotly's "auto" engine would pick it too, this makes the
+# choice explicit for every Dash response
+if pio.json.config.default_engine == "auto":
+    try:
+        pio.json.config.default_engine = "orjson"
+    except ValueError:
+        pass
+
+
+def typed_arrays_enabled():
+    return os.environ.get(TYPED_ARRAYS_ENV_VAR, "1") not in ("", "0")
+
+
+def narrow_array(values, tolerance=DEFAULT_TOLERANCE):
+    """
+    The narrowest NumPy array that holds the values: float32 when every
+    value stays within tolerance (the dashboard shows at most two
+    decimals), the smallest fitting integer type for integers.
+
+    :return: NumPy array, or the values unchanged when they aren't numeric
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == "f" and arr.dtype != np.float32:
+        narrowed = arr.astype(np.float32)
+        diff = np.abs(narrowed.astype(np.float64) - arr)
+        if not np.isfinite(diff).any() or np.nanmax(diff) <= tolerance:
+            return narrowed
+        return arr.astype(np.float64, copy=False)
+    if arr.dtype.kind in "iu" and arr.size:
+        low, high = arr.min(), arr.max()
+        for dtype in _INT_TYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return arr.astype(dtype, copy=False)
+        return arr
+    if arr.dtype.kind == "f":
+        return arr
+    return values
+
+
+def typed_array(values, tolerance=DEFAULT_TOLERANCE):
+    """
+    narrow_array() as a base64 typed array spec for values sent outside a
+    Figure (e.g. in a Dash Patch), which plotly would otherwise leave as
+    JSON number lists. Values are passed through when typed arrays are off
+    or the values aren't numeric.
+    """
+    if not typed_arrays_enabled():
+        return values
+    return to_typed_array_spec(narrow_array(values, tolerance))
+
+
+def compact_figure(fig, tolerance=DEFAULT_TOLERANCE):
+    """
+    Turns the per-point numeric data of every trace into narrow NumPy
+    arrays (in place), so they are sent as base64 typed arrays.
+
+    :return: The same figure
+    """
+    for trace in fig.data:
+        for prop in ARRAY_PROPERTIES:
+            try:
+                values = trace[prop]
+            except (KeyError, ValueError):
+                continue
+            if values is None or isinstance(values, (str, dict)) or np.ndim(values) == 0:
+                continue
+            narrowed = narrow_array(values, tolerance)
+            if narrowed is not values:
+                trace[prop] = narrowed
+    return fig
+
+
+def typed_figures(func):
+    """
+    Decorator for callbacks: every Figure returned (alone or in a tuple of
+    outputs) goes through compact_figure() unless CLIMATE_TYPED_ARRAYS=0.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if not typed_arrays_enabled():
+            return result
+        if isinstance(result, go.Figure):
+            return compact_figure(result)
+        if isinstance(result, tuple):
+            return tuple(compact_figure(r) if isinstance(r, go.Figure) else r for r in result)
+        return result
+
+    return wrapper